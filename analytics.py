@@ -0,0 +1,266 @@
+"""跨运行老化结果分析: 将多个结果日志(JSONL)加载为列式NumPy数组，向量化计算各单元各脚的通过率、
+首次失败循环分布、随循环的退化趋势和异常单元，输出CSV/JSON汇总
+
+用法: python analytics.py aging_test_results/ [更多日志或目录...] --output-dir analytics --jobs 4
+不同运行中的同名单元视为不同单元，以 "运行名/单元ID" 区分。
+"""
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from config import JOURNAL_CONFIG
+from checkpoint import unit_key
+from results_journal import iter_records
+
+FEET = ('left', 'right')
+OUTLIER_Z = 3.5  # 通过率z分数或退化趋势t值低于 -OUTLIER_Z 的单元视为异常
+NO_FAILURE = np.iinfo(np.int32).max
+
+
+def find_journals(paths):
+    """展开目录，返回所有结果日志路径"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.jsonl'))))
+        else:
+            files.append(path)
+    return files
+
+
+def load_journal(path):
+    """读取一个结果日志，每条记录的每只脚为一行，返回 (单元列表, 列字典)"""
+    units = {}
+    columns = {name: [] for name in ('unit', 'foot', 'cycle', 'success', 'total', 'passed')}
+    for record in iter_records(path):
+        unit = units.setdefault(unit_key(record.get('unit')), len(units))
+        for foot_index, foot in enumerate(FEET):
+            data = record.get(foot) or {}
+            columns['unit'].append(unit)
+            columns['foot'].append(foot_index)
+            columns['cycle'].append(record['cycle'])
+            columns['success'].append(bool(data.get('success')))
+            # 轮询模式下老化失败的结果也带有计数
+            columns['total'].append(data.get('total_count', -1))
+            columns['passed'].append(data.get('pass_count', -1))
+    return list(units), columns
+
+
+class ResultSet:
+    """多个运行的列式结果: 每行为某次循环中某单元某只脚的结果
+
+    group = 单元全局序号 * 2 + 脚序号，用于各种按组聚合。
+    """
+
+    def __init__(self, runs, units, group, cycle, success, total, passed):
+        self.runs = runs  # 运行名
+        self.units = units  # [(运行名, 单元ID)]
+        self.group = group
+        self.cycle = cycle
+        self.success = success
+        self.total = total
+        self.passed = passed
+
+    @classmethod
+    def load(cls, paths, jobs=1):
+        """加载结果日志，jobs>1时在多个进程中并行解析JSON"""
+        files = find_journals(paths)
+        if jobs > 1 and len(files) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                loaded = list(executor.map(load_journal, files, chunksize=max(1, len(files) // (jobs * 4))))
+        else:
+            loaded = [load_journal(path) for path in files]
+
+        runs, units, parts = [], [], []
+        for path, (run_units, columns) in zip(files, loaded):
+            run = os.path.splitext(os.path.basename(path))[0]
+            runs.append(run)
+            offset = len(units)
+            units.extend((run, unit) for unit in run_units)
+            parts.append(((np.asarray(columns['unit'], dtype=np.int32) + offset) * 2
+                          + np.asarray(columns['foot'], dtype=np.int32),
+                          np.asarray(columns['cycle'], dtype=np.int32),
+                          np.asarray(columns['success'], dtype=bool),
+                          np.asarray(columns['total'], dtype=np.int32),
+                          np.asarray(columns['passed'], dtype=np.int32)))
+
+        arrays = [np.concatenate(column) if parts else np.empty(0, dtype=dtype)
+                  for column, dtype in zip(zip(*parts) if parts else [()] * 5,
+                                           (np.int32, np.int32, bool, np.int32, np.int32))]
+        return cls(runs, units, *arrays)
+
+    @property
+    def group_count(self):
+        return len(self.units) * len(FEET)
+
+
+def analyze(results, outlier_z=OUTLIER_Z):
+    """向量化计算各组(单元×脚)和各循环的统计量"""
+    n = results.group_count
+    order = np.lexsort((results.cycle, results.group))
+    group, cycle, success = results.group[order], results.cycle[order], results.success[order]
+    total, passed = results.total[order], results.passed[order]
+
+    # 循环成功率
+    cycles_run = np.bincount(group, minlength=n)
+    cycles_ok = np.bincount(group, weights=success, minlength=n)
+
+    # 设备最终计数: 每组最后一条带计数的记录
+    valid = total >= 0
+    vg, vc, vt, vp = group[valid], cycle[valid], total[valid], passed[valid]
+    final_total = np.zeros(n, dtype=np.int64)
+    final_pass = np.zeros(n, dtype=np.int64)
+    if vg.size:
+        last = np.flatnonzero(np.r_[vg[1:] != vg[:-1], True])
+        final_total[vg[last]] = vt[last]
+        final_pass[vg[last]] = vp[last]
+
+    # 相邻两条计数记录之间的增量即为该循环的老化次数和通过次数
+    same = vg[1:] == vg[:-1]
+    d_group, d_cycle = vg[1:][same], vc[1:][same]
+    d_total = (vt[1:] - vt[:-1])[same]
+    d_pass = (vp[1:] - vp[:-1])[same]
+
+    # 首次失败循环: 循环失败或该循环中有未通过的老化
+    fail_group = np.concatenate([group[~success], d_group[d_total > d_pass]])
+    fail_cycle = np.concatenate([cycle[~success], d_cycle[d_total > d_pass]])
+    first_failure = np.full(n, NO_FAILURE, dtype=np.int32)
+    np.minimum.at(first_failure, fail_group, fail_cycle)
+
+    # 退化趋势: 每循环通过比例对循环序号的最小二乘斜率及其t值
+    m = d_total > 0
+    x = d_cycle[m].astype(np.float64)
+    y = d_pass[m] / d_total[m]
+    g = d_group[m]
+    count = np.bincount(g, minlength=n)
+    sx, sy = np.bincount(g, x, minlength=n), np.bincount(g, y, minlength=n)
+    sxx, sxy, syy = (np.bincount(g, x * x, minlength=n), np.bincount(g, x * y, minlength=n),
+                     np.bincount(g, y * y, minlength=n))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cxx = sxx - sx * sx / count
+        cxy = sxy - sx * sy / count
+        cyy = syy - sy * sy / count
+        slope = np.where(cxx > 0, cxy / cxx, np.nan)
+        residual = np.maximum(cyy - slope * cxy, 0) / (count - 2)
+        # 残差为0时: 斜率为0(如全部通过)的t值取0，否则按方向为无穷
+        trend_t = np.where(count > 2, slope / np.sqrt(residual / cxx), np.nan)
+        trend_t = np.nan_to_num(trend_t, nan=0.0, posinf=np.inf, neginf=-np.inf)
+
+        pass_rate = np.where(final_total > 0, final_pass / final_total, np.nan)
+        cycle_success_rate = np.where(cycles_run > 0, cycles_ok / cycles_run, np.nan)
+
+        # 异常: 通过率相对整体通过率的二项分布z分数过低，或通过比例随循环显著下降
+        pooled = final_pass.sum() / final_total.sum() if final_total.sum() else np.nan
+        spread = np.sqrt(pooled * (1 - pooled) / final_total)
+        rate_z = np.where((final_total > 0) & (spread > 0), (pass_rate - pooled) / spread, 0.0)
+    outlier = (rate_z < -outlier_z) | (trend_t < -outlier_z)
+
+    # 各循环的整体通过比例
+    max_cycle = int(cycle.max()) + 1 if cycle.size else 1
+    cycle_agings = np.bincount(d_cycle, weights=d_total, minlength=max_cycle)
+    cycle_passes = np.bincount(d_cycle, weights=d_pass, minlength=max_cycle)
+    failed_first = first_failure[first_failure != NO_FAILURE]
+    first_failure_hist = np.bincount(failed_first, minlength=max_cycle)
+
+    return {
+        'cycles': cycles_run,
+        'cycle_success_rate': cycle_success_rate,
+        'total_count': final_total,
+        'pass_count': final_pass,
+        'pass_rate': pass_rate,
+        'first_failure': first_failure,
+        'rate_z': rate_z,
+        'trend_slope': slope,
+        'trend_t': trend_t,
+        'outlier': outlier,
+        'cycle_agings': cycle_agings,
+        'cycle_passes': cycle_passes,
+        'first_failure_hist': first_failure_hist,
+    }
+
+
+def _number(value, digits=6):
+    """CSV/JSON输出: NaN和无穷输出为空"""
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def write_outputs(results, stats, output_dir):
+    """写出 units.csv、cycles.csv 和 summary.json"""
+    os.makedirs(output_dir, exist_ok=True)
+
+    with open(os.path.join(output_dir, 'units.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['run', 'unit', 'foot', 'cycles', 'cycle_success_rate', 'total_count', 'pass_count',
+                         'pass_rate', 'rate_z', 'first_failure_cycle', 'trend_slope', 'trend_t', 'outlier'])
+        for index in range(results.group_count):
+            run, unit = results.units[index // 2]
+            first = stats['first_failure'][index]
+            writer.writerow([run, unit, FEET[index % 2], stats['cycles'][index],
+                             _number(stats['cycle_success_rate'][index]), stats['total_count'][index],
+                             stats['pass_count'][index], _number(stats['pass_rate'][index]),
+                             _number(stats['rate_z'][index], 3), '' if first == NO_FAILURE else first,
+                             _number(stats['trend_slope'][index], 9), _number(stats['trend_t'][index], 3),
+                             int(stats['outlier'][index])])
+
+    with open(os.path.join(output_dir, 'cycles.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['cycle', 'agings', 'passes', 'pass_ratio', 'first_failures'])
+        for cycle in range(1, len(stats['cycle_agings'])):
+            agings = stats['cycle_agings'][cycle]
+            writer.writerow([cycle, int(agings), int(stats['cycle_passes'][cycle]),
+                             _number(stats['cycle_passes'][cycle] / agings) if agings else '',
+                             int(stats['first_failure_hist'][cycle])])
+
+    failed = stats['first_failure'] != NO_FAILURE
+    outliers = np.flatnonzero(stats['outlier'])
+    summary = {
+        'runs': len(results.runs),
+        'units': len(results.units),
+        'records': int(results.group.size // 2),
+        'overall_pass_rate': _number(stats['pass_count'].sum() / stats['total_count'].sum())
+        if stats['total_count'].sum() else None,
+        'cycle_success_rate': _number(results.success.mean()) if results.success.size else None,
+        'first_failure': {
+            'never_failed': int((~failed).sum()),
+            'failed': int(failed.sum()),
+            'median_cycle': _number(np.median(stats['first_failure'][failed])) if failed.any() else None,
+            'histogram': {int(cycle): int(count) for cycle, count in enumerate(stats['first_failure_hist']) if count},
+        },
+        'outliers': [
+            {'run': results.units[index // 2][0], 'unit': results.units[index // 2][1], 'foot': FEET[index % 2],
+             'pass_rate': _number(stats['pass_rate'][index]), 'rate_z': _number(stats['rate_z'][index], 3),
+             'trend_slope': _number(stats['trend_slope'][index], 9), 'trend_t': _number(stats['trend_t'][index], 3)}
+            for index in outliers
+        ],
+    }
+    with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="跨运行老化结果分析")
+    parser.add_argument('paths', nargs='*', default=[JOURNAL_CONFIG['dir']], help="结果日志文件或目录")
+    parser.add_argument('--output-dir', default='aging_analytics', help="输出目录")
+    parser.add_argument('--outlier-z', type=float, default=OUTLIER_Z, help="异常判定阈值")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="解析结果日志的进程数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    start = time.perf_counter()
+    results = ResultSet.load(args.paths, jobs=args.jobs)
+    loaded = time.perf_counter()
+    stats = analyze(results, outlier_z=args.outlier_z)
+    summary = write_outputs(results, stats, args.output_dir)
+    logging.info(f"分析完成: {summary['runs']} 次运行, {summary['units']} 个单元, {summary['records']} 条记录, "
+                 f"异常 {len(summary['outliers'])} 个; 加载 {loaded - start:.2f}秒, "
+                 f"计算和输出 {time.perf_counter() - loaded:.2f}秒; 结果: {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
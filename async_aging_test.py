@@ -0,0 +1,571 @@
+import asyncio
+import math
+import logging
+from config import TEST_CONFIG, COMMANDS, POLL_CONFIG, RESILIENCE_CONFIG, TELEMETRY_CONFIG
+from results_journal import ResultsJournal
+from checkpoint import unit_key
+import clock
+import metrics
+import profiling
+import protocol
+import resilience
+
+
+class AsyncAgingTest:
+    """老化测试引擎(asyncio版)，通过AsyncSerialManager收发，等待期间不阻塞事件循环"""
+
+    def __init__(self, serial_manager, unit_id=None, ports=None, journal=None, journal_path=None):
+        self.serial_mgr = serial_manager  # AsyncSerialManager
+        self.unit_id = unit_id
+        # 左右脚对应的端口键，车队模式下由设备注册表提供
+        self.ports = ports or {'left': 'left', 'right': 'right'}
+        self.tag = f"[{unit_id}] " if unit_id else ""
+        self.unit_label = unit_key(unit_id)  # 运行指标中的单元标签
+        # 结果写入追加日志而不是保存在内存中；车队模式下多个单元共用一个日志，由车队负责按循环刷盘
+        self._journal = journal
+        self.journal_path = journal_path  # 自建日志的路径，断点续测时沿用原日志
+        self.owns_journal = journal is None
+        self.device_state = {}  # 各端口最近一次的设备计数
+        self.breakers = {port: resilience.CircuitBreaker(port) for port in self.ports.values()}  # 各端口的断路器
+
+    @property
+    def journal(self):
+        """结果日志，首次记录结果时创建"""
+        if self._journal is None:
+            self._journal = ResultsJournal(self.journal_path)
+        return self._journal
+
+    @property
+    def results(self):
+        """从结果日志中读取本单元的所有结果"""
+        if self._journal is None:
+            return []
+        return list(self.journal.records(unit=self.unit_id))
+
+    def record(self, result_info):
+        """将一个循环的结果写入结果日志"""
+        self.journal.append(result_info)
+        if self.owns_journal:
+            self.journal.flush()
+        for foot in ('left', 'right'):
+            data = result_info[foot]
+            if data.get('success') and 'port' in data:
+                self.device_state[data['port']] = {'total_count': data['total_count'],
+                                                   'pass_count': data['pass_count']}
+
+    def close(self):
+        """关闭自己创建的结果日志"""
+        if self.owns_journal and self._journal is not None:
+            self._journal.close()
+
+    async def run_single_cycle(self, cycle_num):
+        """执行单次老化测试循环（--profile cycle 时在cProfile下执行指定循环）"""
+        with profiling.profile_cycle(cycle_num, self.unit_id):
+            return await self._run_single_cycle(cycle_num)
+
+    async def _run_single_cycle(self, cycle_num):
+        logging.info(f"{self.tag}=== 开始第 {cycle_num} 次循环 ===")
+        cycle_start = clock.monotonic()
+
+        # 有端口断路时不收发，只保持单元的循环节奏，后台探测在此期间进行
+        if not self.available():
+            result = self.skip_cycle(cycle_num)
+            await asyncio.sleep(self.nominal_wait())
+            return result
+
+        # 轮询模式下先记录设备当前计数，作为判断本循环老化进度的基准
+        baseline = await self.query_baseline() if POLL_CONFIG['enabled'] else None
+
+        # 1-2. 发送进入老化测试命令并验证响应
+        if not await self.enter_aging(cycle_num):
+            return False, "进入老化测试失败"
+
+        # 3. 等待老化完成
+        wait_time = self.nominal_wait()
+        if baseline is not None:
+            # 轮询设备进度，最后一次查询即为本循环结果
+            logging.info(f"{self.tag}轮询老化进度 (名义时长 {wait_time}秒)...")
+            with metrics.PHASE_SECONDS.time(self.unit_label, 'wait'):
+                polled = await self.poll_aging(baseline, wait_time)
+            left_data, right_data = polled['left'], polled['right']
+        else:
+            logging.info(f"{self.tag}等待老化完成 ({wait_time}秒)...")
+
+            # 每60秒记录一次剩余时间
+            with metrics.PHASE_SECONDS.time(self.unit_label, 'wait'):
+                for elapsed in range(0, wait_time, 60):
+                    logging.info(f"{self.tag}剩余等待时间: {wait_time - elapsed}秒")
+                    await asyncio.sleep(min(60, wait_time - elapsed))
+
+            # 4-5. 获取并解析老化结果
+            left_data, right_data = await self.fetch_results()
+
+        # 6. 记录结果
+        return self.finish_cycle(cycle_num, left_data, right_data, cycle_start)
+
+    @staticmethod
+    def nominal_wait():
+        """单个循环的名义老化时长(秒)"""
+        return TEST_CONFIG['aging_duration'] * TEST_CONFIG['aging_per_cycle']
+
+    def available(self):
+        """单元的所有端口都未断路"""
+        return all(breaker.available for breaker in self.breakers.values())
+
+    def skip_cycle(self, cycle_num):
+        """有端口断路时跳过本循环: 不收发，记录跳过结果并确保断路端口在后台探测，返回 (False, 结果)"""
+        open_ports = [port for port, breaker in self.breakers.items() if not breaker.available]
+        logging.info(f"{self.tag}第{cycle_num}次循环跳过: {'、'.join(open_ports)}断路，等待探测恢复")
+        result_info = {
+            'cycle': cycle_num,
+            'unit': self.unit_id,
+            'success': False,
+            'skipped': True,
+            'timestamp': clock.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        for foot, port in self.ports.items():
+            error = "端口断路，跳过本循环" if port in open_ports else "同单元另一脚断路，跳过本循环"
+            result_info[foot] = {'success': False, 'error': error}
+        self.record(result_info)
+        metrics.CYCLES.inc(self.unit_label, 'skipped')
+        self.ensure_probes()
+        return False, result_info
+
+    def ensure_probes(self):
+        """为断路且没有探测任务的端口启动后台探测（同步接口每次调用使用新的事件循环，旧任务已结束）"""
+        loop = asyncio.get_running_loop()
+        for port, breaker in self.breakers.items():
+            if not breaker.available and (breaker.probe_task is None or breaker.probe_task.done()):
+                breaker.probe_task = loop.create_task(self.probe(port))
+
+    async def probe(self, port):
+        """断路期间按退避间隔发送结果查询命令，收到有效帧即转为半开"""
+        breaker = self.breakers[port]
+        foot = 'left' if port == self.ports['left'] else 'right'
+        delay = RESILIENCE_CONFIG['probe_interval']
+        while not breaker.available:
+            await asyncio.sleep(delay)
+            if await self.serial_mgr.probe(port, COMMANDS[f'get_result_{foot}'], RESILIENCE_CONFIG['probe_timeout']):
+                breaker.recovered()
+                return
+            delay = min(delay * 2, RESILIENCE_CONFIG['max_probe_interval'])
+
+    async def exchange(self, commands, accept, phases=('send', 'read')):
+        """发送命令并读取响应，响应未通过accept的端口按重试策略退避后重发，返回 {端口: 最后一次响应}
+
+        每个端口的最终结果记入其断路器；phases为发送和读取耗时计入的阶段。
+        """
+        send_phase, read_phase = phases
+        responses = {}
+        pending = dict(commands)
+        for attempt in range(1, resilience.attempts() + 1):
+            if attempt > 1:
+                delay = resilience.backoff_delay(attempt - 1)
+                logging.warning(f"{self.tag}{'、'.join(pending)}无有效响应，{delay:.2f}秒后第{attempt - 1}次重发")
+                for port in pending:
+                    metrics.RETRIES.inc(port)
+                with metrics.PHASE_SECONDS.time(self.unit_label, 'retry'):
+                    await asyncio.sleep(delay)
+            with metrics.PHASE_SECONDS.time(self.unit_label, send_phase):
+                await self.serial_mgr.send_commands(pending)
+            with metrics.PHASE_SECONDS.time(self.unit_label, read_phase):
+                responses.update(await self.serial_mgr.read_responses(list(pending)))
+            pending = {port: command for port, command in pending.items() if not accept(responses[port])}
+            if not pending:
+                break
+
+        for port in commands:
+            if self.breakers[port].record(port not in pending):
+                self.ensure_probes()
+        return responses
+
+    async def enter_aging(self, cycle_num):
+        """发送进入老化测试命令（左右脚并发）并验证响应，失败时记录结果并返回False"""
+        left_port, right_port = self.ports['left'], self.ports['right']
+        logging.info(f"{self.tag}发送进入老化测试命令...")
+        responses = await self.exchange({
+            left_port: COMMANDS['enter_aging_left'],
+            right_port: COMMANDS['enter_aging_right'],
+        }, self.verify_enter_aging_response)
+        left_response = responses[left_port]
+        right_response = responses[right_port]
+
+        # 使用更宽松的验证方式
+        with metrics.PHASE_SECONDS.time(self.unit_label, 'verify'):
+            verified = {}
+            for port, response in ((left_port, left_response), (right_port, right_response)):
+                with metrics.PORT_PHASE_SECONDS.time(port, 'verify'):
+                    verified[port] = self.verify_enter_aging_response(response)
+                if response and not verified[port]:
+                    metrics.REJECTED_FRAMES.inc(port)
+        left_ok, right_ok = verified[left_port], verified[right_port]
+
+        if not (left_ok and right_ok):
+            with metrics.PHASE_SECONDS.time(self.unit_label, 'log'):
+                logging.error(f"{self.tag}进入老化测试失败")
+                # 记录详细错误信息
+                left_error = self.get_response_error(left_response, left_port)
+                right_error = self.get_response_error(right_response, right_port)
+                logging.error(f"{self.tag}左脚错误: {left_error}")
+                logging.error(f"{self.tag}右脚错误: {right_error}")
+                result_info = {
+                    'cycle': cycle_num,
+                    'unit': self.unit_id,
+                    'success': False,
+                    'left': {'success': left_ok, 'error': left_error},
+                    'right': {'success': right_ok, 'error': right_error},
+                    'timestamp': clock.strftime('%Y-%m-%d %H:%M:%S')
+                }
+                self.attach_telemetry(result_info, clock.get_clock().time() - TELEMETRY_CONFIG['failure_window'])
+                self.record(result_info)
+            metrics.CYCLES.inc(self.unit_label, 'enter_failed')
+            return False
+
+        logging.info(f"{self.tag}成功进入老化测试")
+        return True
+
+    async def fetch_results(self):
+        """获取老化结果（左右脚并发）并解析，返回 (左脚结果, 右脚结果)"""
+        left_port, right_port = self.ports['left'], self.ports['right']
+        logging.info(f"{self.tag}获取老化测试结果...")
+        results = await self.exchange({
+            left_port: COMMANDS['get_result_left'],
+            right_port: COMMANDS['get_result_right'],
+        }, self.is_result, phases=('fetch', 'fetch'))
+
+        with metrics.PHASE_SECONDS.time(self.unit_label, 'parse'):
+            parsed = []
+            for port in (left_port, right_port):
+                with metrics.PORT_PHASE_SECONDS.time(port, 'parse'):
+                    parsed.append(self.parse_result(results[port], port))
+            return tuple(parsed)
+
+    def finish_cycle(self, cycle_num, left_data, right_data, cycle_start):
+        """记录一个循环的结果，返回 (是否成功, 结果)"""
+        success = left_data['success'] and right_data['success']
+        result_info = {
+            'cycle': cycle_num,
+            'unit': self.unit_id,
+            'success': success,
+            'left': left_data,
+            'right': right_data,
+            'timestamp': clock.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+        with metrics.PHASE_SECONDS.time(self.unit_label, 'log'):
+            if not success:
+                self.attach_telemetry(result_info, clock.get_clock().time() - (clock.monotonic() - cycle_start))
+            self.record(result_info)
+            if success:
+                logging.info(f"{self.tag}循环 {cycle_num} 成功 - 左脚: {left_data['pass_count']}/{left_data['total_count']}, "
+                             f"右脚: {right_data['pass_count']}/{right_data['total_count']}")
+            else:
+                logging.error(f"{self.tag}循环 {cycle_num} 失败 - 左脚: {left_data.get('error', '未知错误')}, "
+                              f"右脚: {right_data.get('error', '未知错误')}")
+
+        # 超出名义老化时长的部分即为主机和通信开销（轮询提前结束时记为0）
+        overrun = max(0.0, clock.monotonic() - cycle_start - self.nominal_wait())
+        metrics.CYCLE_OVERRUN_SECONDS.observe(overrun, self.unit_label)
+        metrics.LAST_CYCLE_OVERRUN.set(overrun, self.unit_label)
+        metrics.CYCLES.inc(self.unit_label, 'success' if success else 'failure')
+
+        return success, result_info
+
+    def attach_telemetry(self, result_info, since):
+        """失败的脚附加该端口自since(时钟时间)以来主动上报数据的摘要"""
+        for foot, port in self.ports.items():
+            data = result_info[foot]
+            if not data.get('success'):
+                summary = self.serial_mgr.telemetry.store.summary(port, since)
+                if summary:
+                    data['telemetry'] = summary
+
+    async def query_results(self):
+        """查询左右脚当前计数，返回 {脚: 解析结果}"""
+        left_port, right_port = self.ports['left'], self.ports['right']
+        await self.serial_mgr.send_commands({
+            left_port: COMMANDS['get_result_left'],
+            right_port: COMMANDS['get_result_right'],
+        })
+        responses = await self.serial_mgr.read_responses([left_port, right_port])
+        return {foot: self.parse_result(responses[port], port) for foot, port in self.ports.items()}
+
+    async def query_baseline(self):
+        """进入老化前查询设备计数，任一脚查询失败时返回None（本循环退回固定时长等待）"""
+        with metrics.PHASE_SECONDS.time(self.unit_label, 'fetch'):
+            baseline = await self.query_results()
+        for foot, data in baseline.items():
+            if not data['success']:
+                logging.warning(f"{self.tag}{foot}脚基准计数查询失败({data['error']})，本循环按固定时长等待")
+                return None
+        return baseline
+
+    async def poll_aging(self, baseline, wait_time):
+        """轮询老化进度直到双脚完成、任一脚失败或超过期限，返回 {脚: 结果}"""
+        loop = asyncio.get_running_loop()
+        poll = AgingPoll(baseline, wait_time, loop.time(), self.tag)
+        while True:
+            await asyncio.sleep(poll.next_delay(loop.time()))
+            finished = poll.update(await self.query_results(), loop.time())
+            if finished is not None:
+                return finished
+
+    def verify_enter_aging_response(self, response):
+        """验证进入老化测试的响应（更宽松的验证）"""
+        if not response:
+            return False
+
+        # 帧头可能不在开头（旧接口传入的原始数据），从帧头处解析
+        offset = protocol.find_header(response)
+        if offset < 0:
+            return False
+        try:
+            frame = protocol.decode_from(response, offset)
+        except protocol.ProtocolError:
+            return False
+
+        # 检查标准应答
+        if frame.opcode == protocol.OP_ENTER_AGING_ACK:
+            return True
+
+        # 其他格式正确的响应也视为设备已收到命令
+        logging.info(f"检测到可能的有效响应: {frame}")
+        return True
+
+    @staticmethod
+    def is_result(response):
+        """响应是否为可解析的老化结果帧"""
+        if not response:
+            return False
+        try:
+            return isinstance(protocol.decode(response), protocol.AgingResult)
+        except protocol.ProtocolError:
+            return False
+
+    def get_response_error(self, response, port):
+        """获取响应错误信息"""
+        if not response:
+            return "无响应"
+
+        # 只在出错时转换为十六进制用于记录
+        if protocol.find_header(response) >= 0:
+            return f"响应格式不匹配: {response.hex().upper()}"
+        else:
+            return f"无效响应: {response.hex().upper()}"
+
+    def parse_result(self, response, port):
+        """解析老化结果"""
+        if not response:
+            return {'success': False, 'error': '无响应'}
+
+        try:
+            frame = protocol.decode(response)
+        except protocol.ProtocolError as e:
+            error_msg = f'响应格式错误: {e}'
+            logging.error(error_msg)
+            return {'success': False, 'error': error_msg}
+        logging.info(f"解析{port}响应: {frame}", extra={'port': port})
+
+        if not isinstance(frame, protocol.AgingResult):
+            return {'success': False, 'error': f'响应类型错误: 操作码 0x{frame.opcode:02X}'}
+
+        logging.info(f"{port}解析成功: 总次数={frame.total_count}, 通过次数={frame.pass_count}",
+                     extra={'port': port})
+
+        return {
+            'success': True,
+            'total_count': frame.total_count,
+            'pass_count': frame.pass_count,
+            'port': port
+        }
+
+    async def run_complete_test(self, checkpoint=None):
+        """运行完整测试，提供检查点时每个循环后保存进度，已有进度则从下一循环继续"""
+        logging.info(f"开始老化测试，总循环次数: {TEST_CONFIG['total_cycles']}")
+
+        start_cycle, success_count = 1, 0
+        if checkpoint is not None:
+            if checkpoint.last_cycle:
+                start_cycle = checkpoint.last_cycle + 1
+                success_count = checkpoint.success_counts.get(unit_key(self.unit_id), 0)
+                logging.info(f"{self.tag}从第 {start_cycle} 次循环继续测试，已成功 {success_count} 次")
+                await self.resync(checkpoint.devices)
+            else:
+                checkpoint.start('single', self.journal.path)
+
+        for cycle in range(start_cycle, TEST_CONFIG['total_cycles'] + 1):
+            try:
+                success, result = await self.run_single_cycle(cycle)
+
+                if success:
+                    success_count += 1
+            except Exception as e:
+                self.record_exception(cycle, e)
+
+            if checkpoint is not None:
+                checkpoint.update(cycle, {unit_key(self.unit_id): success_count}, self.device_state)
+
+            # 循环间等待
+            if cycle < TEST_CONFIG['total_cycles']:
+                logging.info(f"等待 {TEST_CONFIG['wait_time']} 秒后进入下一次循环...")
+                await asyncio.sleep(TEST_CONFIG['wait_time'])
+
+        # 生成报告
+        self.generate_report(success_count)
+        if checkpoint is not None:
+            checkpoint.finish()
+
+    async def resync(self, devices):
+        """断点续测前重新同步设备状态: 查询设备当前计数并与检查点比较"""
+        if 'get_result_left' not in COMMANDS or 'get_result_right' not in COMMANDS:
+            logging.warning(f"{self.tag}未配置结果查询命令，跳过设备状态同步")
+            return
+
+        results = await self.query_results()
+
+        for foot, data in results.items():
+            port = self.ports[foot]
+            saved = devices.get(port)
+            if not data['success']:
+                logging.warning(f"{self.tag}{port}脚状态同步失败: {data['error']}",
+                                extra={'port': port})
+                continue
+            current = {'total_count': data['total_count'], 'pass_count': data['pass_count']}
+            if saved and saved != current:
+                logging.warning(f"{self.tag}{port}脚设备计数与检查点不一致: 设备 {current}, 检查点 {saved}",
+                                extra={'port': port})
+            else:
+                logging.info(f"{self.tag}{port}脚状态已同步: {current}", extra={'port': port})
+            self.device_state[port] = current
+
+    def record_exception(self, cycle, error):
+        """记录循环异常导致的失败结果"""
+        logging.error(f"{self.tag}第{cycle}次循环发生异常: {error}")
+        error_result = {'success': False, 'error': str(error)}
+        result_info = {
+            'cycle': cycle,
+            'unit': self.unit_id,
+            'success': False,
+            'left': error_result,
+            'right': error_result,
+            'timestamp': clock.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        self.record(result_info)
+        metrics.CYCLES.inc(self.unit_label, 'error')
+
+    def generate_report(self, success_count):
+        """生成测试报告"""
+        total_cycles = TEST_CONFIG['total_cycles']
+        success_rate = (success_count / total_cycles) * 100 if total_cycles > 0 else 0
+
+        logging.info(f"{self.tag}=== 测试完成 ===")
+        logging.info(f"总循环次数: {total_cycles}")
+        logging.info(f"成功次数: {success_count}")
+        logging.info(f"失败次数: {total_cycles - success_count}")
+        logging.info(f"成功率: {success_rate:.2f}%")
+
+        # 保存详细结果到文件
+        self.save_detailed_results()
+
+    def save_detailed_results(self):
+        """保存详细结果到文件"""
+        try:
+            timestamp = clock.strftime("%Y%m%d_%H%M%S")
+            suffix = f"{self.unit_id}_" if self.unit_id else ""
+            filename = f"aging_test_results_{suffix}{timestamp}.txt"
+
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write("老化测试详细结果\n")
+                f.write("=" * 50 + "\n")
+
+                # 流式读取结果日志，不把全部结果加载到内存
+                for result in self.journal.records(unit=self.unit_id):
+                    f.write(f"循环 {result['cycle']} - {result['timestamp']}\n")
+                    f.write(f"  状态: {'成功' if result['success'] else '失败'}\n")
+
+                    if result['success']:
+                        f.write(f"  左脚: 通过{result['left']['pass_count']}/总计{result['left']['total_count']}\n")
+                        f.write(f"  右脚: 通过{result['right']['pass_count']}/总计{result['right']['total_count']}\n")
+                    else:
+                        f.write(f"  左脚错误: {result['left'].get('error', '未知')}\n")
+                        f.write(f"  右脚错误: {result['right'].get('error', '未知')}\n")
+                    f.write("\n")
+
+            logging.info(f"详细结果已保存到: {filename}")
+        except Exception as e:
+            logging.error(f"保存结果文件失败: {e}")
+
+
+class AgingPoll:
+    """老化进度轮询状态: 根据每次查询结果判断是否结束，并给出下次查询的延迟
+
+    首次查询在 initial_delay 之后；无进展时间隔按 backoff 增长，有进展时按最近一次完成前的平均老化速度估计剩余时间。
+    查询间隔不会越过名义结束时刻(开始 + 次数 × 单次老化时间)，到达该时刻或只剩最后一次老化时按 interval 查询，
+    使完成后的下一次查询最多晚 interval 秒。
+    """
+
+    def __init__(self, baseline, wait_time, now, tag=""):
+        self.baseline = baseline
+        self.wait_time = wait_time
+        self.tag = tag
+        self.target = TEST_CONFIG['aging_per_cycle']
+        self.start = now
+        self.deadline = now + wait_time * POLL_CONFIG['deadline_factor']
+        self.expected_end = now + self.target * TEST_CONFIG['aging_duration']  # 名义结束时刻
+        self.delay = min(POLL_CONFIG['initial_delay'], wait_time)
+        self.progress = 0
+        self.completed_at = now  # 观察到最近一次完成的时间
+
+    def next_delay(self, now):
+        """距下次查询的时间(秒)，不超过期限"""
+        return max(0.0, min(self.delay, self.deadline - now))
+
+    def update(self, latest, now):
+        """处理一次查询结果 {脚: 解析结果}，结束时返回各脚最终结果，否则返回None"""
+        done = {}
+        for foot, data in latest.items():
+            if not data['success']:
+                continue
+            total = data['total_count'] - self.baseline[foot]['total_count']
+            passed = data['pass_count'] - self.baseline[foot]['pass_count']
+            if total > passed:
+                # 任一脚出现未通过的老化，立即结束本循环
+                error = f"老化失败: 通过{passed}/完成{total}"
+                logging.error(f"{self.tag}{foot}脚{error}")
+                latest[foot] = dict(data, success=False, error=error)
+                return latest
+            done[foot] = total
+
+        completed = min(done.values()) if len(done) == len(latest) else 0
+        logging.info(f"{self.tag}老化进度: " + ", ".join(
+            f"{foot}脚 {done.get(foot, '?')}/{self.target}" for foot in latest))
+        if completed >= self.target:
+            return latest
+
+        if now >= self.deadline:
+            for foot, data in latest.items():
+                if done.get(foot, 0) < self.target:
+                    error = data.get('error') or f"老化未在期限内完成: {done.get(foot, 0)}/{self.target}"
+                    latest[foot] = dict(data, success=False, error=error)
+            logging.error(f"{self.tag}老化超过期限 ({self.wait_time * POLL_CONFIG['deadline_factor']:.0f}秒)")
+            return latest
+
+        if completed > self.progress:
+            self.progress = completed
+            self.completed_at = now
+        if completed >= self.target - 1 or now >= self.expected_end:
+            # 最后一次老化进行中或已到名义结束时刻: 按最短间隔查询，不再退避
+            delay = POLL_CONFIG['interval']
+        elif completed:
+            # 按最近一次完成前的平均每次老化耗时估计剩余时间，等分为不超过 max_interval 的若干段
+            finish = self.completed_at + (self.completed_at - self.start) / completed * (self.target - completed)
+            remaining = max(0.0, finish - now)
+            delay = remaining / math.ceil(remaining / POLL_CONFIG['max_interval']) if remaining else 0.0
+            delay = max(POLL_CONFIG['interval'], delay)
+        else:
+            delay = max(POLL_CONFIG['interval'], min(POLL_CONFIG['max_interval'], self.delay * POLL_CONFIG['backoff']))
+        # 不越过名义结束时刻，使某次查询正好落在该时刻
+        if now < self.expected_end:
+            delay = min(delay, self.expected_end - now)
+        self.delay = delay
+        return None
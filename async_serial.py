@@ -0,0 +1,119 @@
+"""异步串口层: 供AsyncAgingTest等asyncio引擎使用的SerialManager包装
+
+引擎在asyncio上运行，底层I/O仍由线程完成，而不是asyncio的Protocol/transport: 每个串口由SerialManager的
+后台读取线程(PortReader)读取和分帧，写入通过线程池执行。等待响应时在读取线程上注册回调，
+由call_soon_threadsafe唤醒事件循环，因此等待本身不占用线程，可超时和取消。
+"""
+import asyncio
+import logging
+from config import READER_CONFIG
+from traffic_capture import TX
+import metrics
+
+
+class AsyncSerialManager:
+    """SerialManager的asyncio包装: 收发由线程完成，等待响应不占用线程，可超时和取消"""
+
+    def __init__(self, serial_manager):
+        self.serial_mgr = serial_manager
+
+    @property
+    def telemetry(self):
+        """主动上报帧的订阅和时间序列(TelemetryHub)"""
+        return self.serial_mgr.telemetry
+
+    def subscribe(self, callback, ports=None, opcodes=None):
+        """订阅主动上报帧，callback(端口, 时间, 帧)在当前事件循环中调用，返回取消订阅的函数"""
+        loop = asyncio.get_running_loop()
+        return self.serial_mgr.subscribe(lambda *args: loop.call_soon_threadsafe(callback, *args), ports, opcodes)
+
+    async def send_command(self, port, command):
+        """发送命令到指定串口（写操作在线程池中执行）"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.serial_mgr.executor, self.serial_mgr.send_command, port, command)
+
+    async def read_response(self, port, predicate=None, timeout=None):
+        """等待指定串口上次发送之后的下一个期望的响应帧（见SerialManager.response_predicate，或按predicate过滤），超时返回None"""
+        with metrics.PORT_PHASE_SECONDS.time(port, 'read'):
+            return await self._read_response(port, predicate, timeout)
+
+    async def _read_response(self, port, predicate, timeout):
+        if port not in self.serial_mgr.readers:
+            return None
+        if timeout is None:
+            timeout = READER_CONFIG['response_timeout']
+        if predicate is None:
+            predicate = self.serial_mgr.response_predicate(port)
+
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                reader = self.serial_mgr.readers[port]
+                result = await self.wait_for_frame(reader, port, predicate, timeout)
+                if result is not None or reader.alive:
+                    break
+                # 读取线程已退出: 在线程中等待重连完成（期间会重发本命令），然后在新的读取线程上重新等待
+                if not await loop.run_in_executor(None, self.serial_mgr.wait_reconnected, port, reader):
+                    break
+        except Exception as e:
+            logging.error(f"读取{port}响应失败: {e}", extra={'port': port})
+            return None
+        return self.serial_mgr.finish_read(port, result)
+
+    async def probe(self, port, command, timeout):
+        """轻量探测: 发送命令并等待任意有效帧，不影响读取位置和待重发命令，失败不记录日志"""
+        reader = self.serial_mgr.readers.get(port)
+        if reader is None or not reader.alive:
+            return False
+        seq, _ = reader.mark()
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.serial_mgr.executor, self.serial_mgr.serials[port].write, command)
+        except Exception:
+            return False
+        if self.serial_mgr.capture:
+            self.serial_mgr.capture.record(port, TX, command)
+        return await self.wait_for_frame(reader, port, None, timeout, after=seq) is not None
+
+    async def wait_for_frame(self, reader, port, predicate, timeout, after=None):
+        """通过读取线程的回调等待上次发送(或after序号)之后的帧，不占用线程"""
+        loop = asyncio.get_running_loop()
+        arrived = asyncio.Event()
+
+        def notify():
+            loop.call_soon_threadsafe(arrived.set)
+
+        seq = self.serial_mgr.marks.get(port, (0, 0))[0] if after is None else after
+        deadline = loop.time() + timeout
+        reader.add_listener(notify)
+        try:
+            while True:
+                arrived.clear()
+                result = reader.find_frame(after=seq, predicate=predicate)
+                remaining = deadline - loop.time()
+                if result is not None or not reader.alive or remaining <= 0:
+                    return result
+                try:
+                    await asyncio.wait_for(arrived.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return reader.find_frame(after=seq, predicate=predicate)
+        finally:
+            reader.remove_listener(notify)
+
+    async def send_commands(self, commands):
+        """并发向多个端口发送命令，commands为 {端口: 命令}"""
+        await asyncio.gather(*(self.send_command(port, command) for port, command in commands.items()))
+
+    async def read_responses(self, ports):
+        """并发读取多个端口的响应，返回 {端口: 响应}"""
+        responses = await asyncio.gather(*(self.read_response(port) for port in ports))
+        return dict(zip(ports, responses))
+
+    async def transact(self, requests, timeout=None):
+        """批量发送命令并等待所有响应，返回与requests对应的响应帧列表（超时为None），参见SerialManager.transact"""
+        futures = self.serial_mgr.transact(requests, timeout)
+        return await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+
+    def close_ports(self):
+        """关闭所有串口"""
+        self.serial_mgr.close_ports()
@@ -0,0 +1,80 @@
+"""帧提取基准: 对比FrameDecoder与旧的十六进制正则实现
+
+用法: python benchmarks/bench_frame_decoder.py --size-mb 4 --chunk 64
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_decoder import FrameDecoder, extract_valid_frame_hex  # noqa: E402
+
+SAMPLE_FRAMES = [
+    bytes.fromhex('55 BB FF 07 04 01 00 00 02 04 00'),
+    bytes.fromhex('55 BB FF 07 41 00 00 00 05 00 03'),
+    bytes.fromhex('55 BB FF 03 04 01 00'),
+]
+
+
+def build_capture(size, garbage_ratio, seed):
+    """生成指定大小的模拟抓包数据: 有效帧中夹杂随机噪声"""
+    rng = random.Random(seed)
+    out = bytearray()
+    frame_count = 0
+    while len(out) < size:
+        if rng.random() < garbage_ratio:
+            out += rng.randbytes(rng.randint(1, 8))
+        else:
+            out += rng.choice(SAMPLE_FRAMES)
+            frame_count += 1
+    return bytes(out), frame_count
+
+
+def chunked(data, chunk):
+    """按固定大小切分，模拟多次串口读取"""
+    return [data[i:i + chunk] for i in range(0, len(data), chunk)]
+
+
+def bench_regex(chunks):
+    """旧路径: 每次读取转十六进制字符串后正则匹配，只取最后一帧"""
+    found = 0
+    start = time.perf_counter()
+    for chunk in chunks:
+        if extract_valid_frame_hex(chunk.hex().upper(), 'bench'):
+            found += 1
+    return time.perf_counter() - start, found
+
+
+def bench_decoder(chunks):
+    """新路径: 字节级增量解码，输出所有完整帧"""
+    decoder = FrameDecoder()
+    found = 0
+    start = time.perf_counter()
+    for chunk in chunks:
+        found += len(decoder.feed(chunk))
+    return time.perf_counter() - start, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="帧提取基准测试")
+    parser.add_argument('--size-mb', type=float, default=4, help="抓包数据大小(MB)")
+    parser.add_argument('--chunk', type=int, default=64, help="每次读取的字节数")
+    parser.add_argument('--garbage', type=float, default=0.1, help="噪声片段比例")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    data, frame_count = build_capture(int(args.size_mb * 1024 * 1024), args.garbage, args.seed)
+    chunks = chunked(data, args.chunk)
+    print(f"数据: {len(data) / 1024 / 1024:.1f}MB, 读取次数: {len(chunks)}, 实际帧数: {frame_count}")
+
+    for name, func in (('regex', bench_regex), ('decoder', bench_decoder)):
+        elapsed, found = func(chunks)
+        print(f"{name:>8}: {elapsed:.3f}s, {len(data) / elapsed / 1024 / 1024:.1f}MB/s, "
+              f"提取帧数 {found} ({found / frame_count * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""进度轮询开销检查: 在虚拟时钟下分别以固定等待和进度轮询运行单设备测试，比较实际耗时相对名义时长的开销
+
+用法: python benchmarks/bench_poll_overhead.py --cycles 4 --device-aging 420
+模拟设备的单次老化时间(--device-aging)默认略短于TEST_CONFIG['aging_duration']，即设备提前完成的情形；
+轮询模式的开销不低于固定等待模式时退出码为1。
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import TEST_CONFIG, POLL_CONFIG, SIMULATION_CONFIG  # noqa: E402
+from device_simulator import ScriptedBackend  # noqa: E402
+from serial_manager import SerialManager  # noqa: E402
+from aging_test import AgingTest  # noqa: E402
+import clock  # noqa: E402
+import profiling  # noqa: E402
+
+START_TIME = 1760000000  # 固定的虚拟起始时间，两种模式的运行条件相同
+
+
+def run_overhead(poll, cycles, device_aging, seed):
+    """以指定模式运行cycles个循环，返回 (实际耗时, 名义时长) (虚拟秒)"""
+    clock.set_clock(clock.SimulatedClock(START_TIME))
+    POLL_CONFIG['enabled'] = poll
+    TEST_CONFIG['total_cycles'] = cycles
+    backend = ScriptedBackend(1, seed=seed, aging_duration=device_aging)
+    unit = backend.units()[0]
+    serial_mgr = SerialManager({'left': unit['left_port'], 'right': unit['right_port']}, opener=backend.open)
+    test = AgingTest(serial_mgr)
+    try:
+        start = clock.monotonic()
+        test.run_complete_test()
+        return clock.monotonic() - start, profiling.nominal_seconds(cycles)
+    finally:
+        test.close()
+        serial_mgr.close_ports()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="进度轮询开销检查")
+    parser.add_argument('--cycles', type=int, default=4, help="循环次数")
+    parser.add_argument('--device-aging', type=float, default=TEST_CONFIG['aging_duration'] * 0.98,
+                        help="模拟设备的单次老化时间(秒)")
+    parser.add_argument('--seed', type=int, default=SIMULATION_CONFIG['seed'])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    overheads = {}
+    with tempfile.TemporaryDirectory() as directory:
+        # 结果文件写入临时目录
+        os.chdir(directory)
+        for name, poll in (('固定等待', False), ('进度轮询', True)):
+            wall, nominal = run_overhead(poll, args.cycles, args.device_aging, args.seed)
+            overheads[name] = wall - nominal
+            print(f"{name}: 实际耗时 {wall:.1f}秒, 名义时长 {nominal:.1f}秒, 开销 {wall - nominal:.1f}秒")
+
+    if overheads['进度轮询'] >= overheads['固定等待']:
+        print("失败: 进度轮询的开销不低于固定等待")
+        sys.exit(1)
+    print("通过: 进度轮询的开销低于固定等待")
+
+
+if __name__ == "__main__":
+    main()
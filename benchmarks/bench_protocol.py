@@ -0,0 +1,64 @@
+"""协议解码基准: 对比protocol模块与旧的十六进制字符串校验/解析，输出每帧耗时
+
+用法: python benchmarks/bench_protocol.py --number 200000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import protocol  # noqa: E402
+
+ENTER_RESPONSE = bytes.fromhex('55 BB FF 07 04 01 00 00 02 04 00')
+RESULT_RESPONSE = bytes.fromhex('55 BB FF 07 41 00 00 00 05 00 03')
+
+
+def legacy_verify(response):
+    """旧路径: verify_enter_aging_response 的十六进制字符串检查"""
+    response_hex = response.hex().upper()
+    return response_hex.startswith('55BBFF03') or response_hex.startswith('55BBFF07') or '55BBFF' in response_hex
+
+
+def legacy_parse(response):
+    """旧路径: parse_result 的十六进制前缀检查和手工字节偏移"""
+    response_hex = response.hex().upper()
+    if not (response_hex.startswith('55BBFF07') or response_hex.startswith('55BBFF03')):
+        return None
+    if len(response) >= 11:
+        return (response[7] << 8) + response[8], (response[9] << 8) + response[10]
+    return None
+
+
+def protocol_verify(response):
+    """新路径: 结构化解码后按操作码判断"""
+    return protocol.decode(response).opcode == protocol.OP_ENTER_AGING_ACK
+
+
+def protocol_parse(response):
+    """新路径: 解码为AgingResult"""
+    frame = protocol.decode(response)
+    return frame.total_count, frame.pass_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="协议解码基准测试")
+    parser.add_argument('--number', type=int, default=200000, help="每项的调用次数")
+    args = parser.parse_args()
+
+    view = memoryview(bytearray(RESULT_RESPONSE))
+    cases = [
+        ('verify (hex)', lambda: legacy_verify(ENTER_RESPONSE)),
+        ('verify (protocol)', lambda: protocol_verify(ENTER_RESPONSE)),
+        ('parse (hex)', lambda: legacy_parse(RESULT_RESPONSE)),
+        ('parse (protocol)', lambda: protocol_parse(RESULT_RESPONSE)),
+        ('decode memoryview', lambda: protocol.decode(view)),
+    ]
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=args.number, repeat=3)) / args.number
+        print(f"{name:>18}: {seconds * 1e9:8.0f} ns/帧")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""主机侧串口协议栈基准: 基于device_simulator运行，结果输出为JSON便于版本间对比
+
+用法: python benchmarks/bench_serial_stack.py --units 16 --output bench_serial_stack.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import TEST_CONFIG, COMMANDS, RESPONSE_PREFIXES  # noqa: E402
+from device_simulator import spawn_simulator  # noqa: E402
+from frame_decoder import FrameDecoder, extract_valid_frame_hex  # noqa: E402
+from serial_manager import SerialManager  # noqa: E402
+from async_serial import AsyncSerialManager  # noqa: E402
+from async_aging_test import AsyncAgingTest  # noqa: E402
+from fleet import DeviceRegistry, AsyncFleetAgingTest  # noqa: E402
+from results_journal import ResultsJournal  # noqa: E402
+
+ENTER_RESPONSE = bytes.fromhex('55 BB FF 07 04 01 00 00 02 04 00')
+RESULT_RESPONSE = bytes.fromhex('55 BB FF 07 41 00 00 00 05 00 03')
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """最近秩法计算百分位数"""
+    ordered = sorted(values)
+    if not ordered:
+        return {f"p{p}": None for p in points}
+    return {f"p{p}": ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in points}
+
+
+def bench_codec(number):
+    """纯计算路径的单次调用耗时(微秒)"""
+    raw_hex = (b'\x00\x12' + ENTER_RESPONSE).hex().upper()
+    decoder = FrameDecoder()
+    engine = AsyncAgingTest(None)
+    cases = {
+        'extract_valid_frame': lambda: extract_valid_frame_hex(raw_hex, 'bench'),
+        'frame_decoder_feed': lambda: decoder.feed(ENTER_RESPONSE),
+        'verify_response': lambda: SerialManager.verify_response(None, ENTER_RESPONSE,
+                                                                 RESPONSE_PREFIXES['enter_aging']),
+        'verify_enter_aging_response': lambda: engine.verify_enter_aging_response(ENTER_RESPONSE),
+        'parse_result': lambda: engine.parse_result(RESULT_RESPONSE, 'bench'),
+    }
+    return {name: timeit.timeit(func, number=number) / number * 1e6 for name, func in cases.items()}
+
+
+def bench_frame_throughput(size):
+    """帧解码吞吐量(帧/秒)"""
+    frame = ENTER_RESPONSE + b'\x00'
+    data = frame * (size // len(frame))
+    decoder = FrameDecoder()
+    start = time.perf_counter()
+    count = 0
+    for offset in range(0, len(data), 256):
+        count += len(decoder.feed(data[offset:offset + 256]))
+    elapsed = time.perf_counter() - start
+    return {'frames': count, 'seconds': elapsed, 'frames_per_second': count / elapsed}
+
+
+def bench_transactions(serial_mgr, ports, count):
+    """往返延迟、事务吞吐量和每事务CPU时间"""
+    latencies = []
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for i in range(count):
+        port = ports[i % len(ports)]
+        command = COMMANDS['get_result_left' if port.endswith('left') else 'get_result_right']
+        start = time.perf_counter()
+        serial_mgr.send_command(port, command)
+        if serial_mgr.read_response(port) is not None:
+            latencies.append((time.perf_counter() - start) * 1000)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    return {
+        'transactions': count,
+        'responses': len(latencies),
+        'latency_ms': percentiles(latencies),
+        'transactions_per_second': count / wall,
+        'cpu_us_per_transaction': cpu / count * 1e6,
+    }
+
+
+async def run_cycles(serial_mgr, registry, cycles, on_cycle=None):
+    """以零老化时长运行若干循环，只测量主机开销"""
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = ResultsJournal(os.path.join(tmp, 'bench.jsonl'))
+        fleet = AsyncFleetAgingTest(AsyncSerialManager(serial_mgr), registry, journal=journal)
+        durations = []
+        for cycle in range(1, cycles + 1):
+            start = time.perf_counter()
+            await fleet.run_single_cycle(cycle)
+            durations.append(time.perf_counter() - start)
+            if on_cycle:
+                on_cycle(cycle)
+        fleet.close()
+    return durations
+
+
+def bench_cycle_scaling(units, unit_counts, cycles):
+    """每循环主机开销随单元数的变化"""
+    results = []
+    for count in unit_counts:
+        registry = DeviceRegistry(units[:count])
+        serial_mgr = SerialManager(registry.port_map())
+        try:
+            durations = asyncio.run(run_cycles(serial_mgr, registry, cycles))
+        finally:
+            serial_mgr.close_ports()
+        results.append({'units': count, 'cycle_seconds': percentiles(durations)})
+    return results
+
+
+def bench_memory(units, cycles, sample_every):
+    """模拟完整循环次数运行期间的内存占用"""
+    registry = DeviceRegistry(units)
+    serial_mgr = SerialManager(registry.port_map())
+    samples = []
+
+    def sample(cycle):
+        if cycle % sample_every == 0 or cycle == cycles:
+            current, peak = tracemalloc.get_traced_memory()
+            samples.append({'cycle': cycle, 'current_bytes': current, 'peak_bytes': peak})
+
+    tracemalloc.start()
+    try:
+        asyncio.run(run_cycles(serial_mgr, registry, cycles, on_cycle=sample))
+    finally:
+        tracemalloc.stop()
+        serial_mgr.close_ports()
+    return {'units': len(units), 'cycles': cycles, 'samples': samples}
+
+
+def git_revision():
+    """当前代码版本，便于对比"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="串口协议栈基准测试")
+    parser.add_argument('--units', type=int, default=16, help="模拟单元数上限")
+    parser.add_argument('--transactions', type=int, default=500, help="往返延迟测试的事务数")
+    parser.add_argument('--cycles', type=int, default=TEST_CONFIG['total_cycles'], help="内存测试的循环次数")
+    parser.add_argument('--scaling-cycles', type=int, default=5, help="扩展性测试每档的循环次数")
+    parser.add_argument('--latency', type=float, default=0.02, help="模拟设备响应延迟(秒)")
+    parser.add_argument('--output', default='bench_serial_stack.json', help="JSON结果文件")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    # 只测量主机开销: 老化和循环间等待时长置零
+    TEST_CONFIG.update(aging_duration=0, wait_time=0)
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'simulator_latency': args.latency,
+        'codec_us_per_call': bench_codec(20000),
+        'frame_throughput': bench_frame_throughput(4 * 1024 * 1024),
+    }
+
+    process, units = spawn_simulator(args.units, seed=1, latency=args.latency, jitter=args.latency / 4,
+                                     aging_duration=0)
+    try:
+        registry = DeviceRegistry(units[:1])
+        serial_mgr = SerialManager(registry.port_map())
+        try:
+            report['round_trip'] = bench_transactions(serial_mgr, list(registry.port_map()), args.transactions)
+        finally:
+            serial_mgr.close_ports()
+
+        unit_counts = sorted({1, 4, 16, 64, args.units} & set(range(1, args.units + 1)))
+        report['cycle_scaling'] = bench_cycle_scaling(units, unit_counts, args.scaling_cycles)
+        report['memory'] = bench_memory(units, args.cycles, max(1, args.cycles // 20))
+    finally:
+        process.terminate()
+        process.wait()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+from config import TEST_CONFIG, CHECKPOINT_CONFIG
+from results_journal import iter_records
+import clock
+
+DEFAULT_UNIT = 'default'  # 单设备模式下的单元键
+
+
+def unit_key(unit_id):
+    """检查点中使用的单元键"""
+    return unit_id or DEFAULT_UNIT
+
+
+class Checkpoint:
+    """运行状态检查点: 每个循环结束后原子写入JSON文件，断电或重启后可继续测试"""
+
+    def __init__(self, path=None):
+        self.path = path or CHECKPOINT_CONFIG['path']
+        self.state = {}
+
+    @classmethod
+    def load(cls, path=None):
+        """读取检查点文件"""
+        checkpoint = cls(path)
+        with open(checkpoint.path, 'r', encoding='utf-8') as f:
+            checkpoint.state = json.load(f)
+        return checkpoint
+
+    @property
+    def last_cycle(self):
+        return self.state.get('last_cycle', 0)
+
+    @property
+    def success_counts(self):
+        return self.state.get('success_counts', {})
+
+    @property
+    def unit_cycles(self):
+        """各单元已完成的循环数，仅流水线模式下各单元进度不同时记录"""
+        return self.state.get('unit_cycles')
+
+    @property
+    def devices(self):
+        return self.state.get('devices', {})
+
+    @property
+    def journal(self):
+        return self.state.get('journal')
+
+    @property
+    def completed(self):
+        return self.state.get('completed', False)
+
+    def start(self, mode, journal, units=None):
+        """开始新的测试运行"""
+        now = clock.strftime('%Y-%m-%d %H:%M:%S')
+        self.state = {
+            'mode': mode,
+            'journal': journal,
+            'units': units,
+            'test_config': dict(TEST_CONFIG),
+            'last_cycle': 0,
+            'success_counts': {},
+            'devices': {},
+            'completed': False,
+            'started_at': now,
+            'updated_at': now,
+        }
+        self.save()
+
+    def update(self, cycle, success_counts, devices, unit_cycles=None):
+        """记录已完成的循环、各单元成功次数和各端口的设备计数，unit_cycles为各单元各自完成的循环数"""
+        self.state['last_cycle'] = cycle
+        self.state['success_counts'] = dict(success_counts)
+        if unit_cycles is not None:
+            self.state['unit_cycles'] = dict(unit_cycles)
+        self.state['devices'].update(devices)
+        self.state['updated_at'] = clock.strftime('%Y-%m-%d %H:%M:%S')
+        self.save()
+
+    def finish(self):
+        """标记测试已完成"""
+        self.state['completed'] = True
+        self.state['updated_at'] = clock.strftime('%Y-%m-%d %H:%M:%S')
+        self.save()
+
+    def save(self):
+        """原子写入: 先写临时文件并fsync，再替换原文件"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def reconcile(self, unit_ids):
+        """与结果日志对账: 日志可能比检查点多写入一个循环，以所有单元都已记录的循环为准"""
+        if not self.journal or not os.path.exists(self.journal):
+            return
+        keys = [unit_key(unit_id) for unit_id in unit_ids]
+        last_cycles = dict.fromkeys(keys, 0)
+        for record in iter_records(self.journal):
+            key = unit_key(record.get('unit'))
+            if key in last_cycles:
+                last_cycles[key] = max(last_cycles[key], record['cycle'])
+        last_cycle = min(last_cycles.values()) if last_cycles else 0
+        # 流水线模式下各单元分别以自己已记录的循环为准
+        per_unit = self.unit_cycles is not None
+        targets = last_cycles if per_unit else dict.fromkeys(keys, last_cycle)
+        if per_unit:
+            if all(targets[key] <= self.unit_cycles.get(key, 0) for key in keys):
+                return
+        elif last_cycle <= self.last_cycle:
+            return
+
+        success_counts = dict.fromkeys(keys, 0)
+        devices = {}
+        for record in iter_records(self.journal):
+            key = unit_key(record.get('unit'))
+            if key not in success_counts or record['cycle'] > targets[key]:
+                continue
+            if record['success']:
+                success_counts[key] += 1
+            for foot in ('left', 'right'):
+                data = record.get(foot, {})
+                if data.get('success') and 'port' in data:
+                    devices[data['port']] = {'total_count': data['total_count'], 'pass_count': data['pass_count']}
+        logging.info(f"结果日志已记录到第 {last_cycle} 次循环，检查点为第 {self.last_cycle} 次，以结果日志为准")
+        self.update(last_cycle, success_counts, devices, targets if per_unit else None)
@@ -0,0 +1,211 @@
+import asyncio
+import concurrent.futures
+import heapq
+import itertools
+import selectors
+import threading
+import time
+
+
+class Clock:
+    """真实时钟: 所有等待和时间戳都通过时钟获取，测试时可替换为SimulatedClock"""
+    simulated = False
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def time(self):
+        return time.time()
+
+    def strftime(self, fmt):
+        """按时钟的当前时间格式化（本地时区）"""
+        return time.strftime(fmt, time.localtime(self.time()))
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait(self, condition, timeout):
+        """在已持有锁的threading.Condition上等待，超时返回False"""
+        return condition.wait(timeout)
+
+    def call_later(self, delay, callback, *args):
+        """延迟delay秒后在后台线程中调用callback"""
+        timer = threading.Timer(delay, callback, args)
+        timer.daemon = True
+        timer.start()
+
+    def executor(self, max_workers, thread_name_prefix=''):
+        """串口收发使用的线程池"""
+        return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+
+    def run(self, coroutine):
+        """在新的事件循环中运行协程（同步接口的入口）"""
+        return asyncio.run(coroutine)
+
+
+class SimulatedClock(Clock):
+    """虚拟时钟: 等待不占用真实时间，时间直接前进到下一个事件或等待期限
+
+    事件循环的定时器、线程条件等待和call_later都由同一虚拟时间驱动，线程池调用在调用线程中直接执行，
+    配合脚本串口后端(device_simulator.ScriptedBackend)运行时没有后台线程参与收发，结果与执行速度无关。
+    """
+    simulated = True
+
+    def __init__(self, start_time=None):
+        self.now = 0.0  # 虚拟单调时间(秒)
+        self.epoch = time.time() if start_time is None else start_time  # 虚拟单调时间0对应的Unix时间
+        self.timers = []  # (到期时间, 序号, 回调, 参数)
+        self.sequence = itertools.count()
+        self.lock = threading.RLock()
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.epoch + self.now
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def wait(self, condition, timeout):
+        """前进到下一个事件或等待期限，由调用方重新检查条件"""
+        self.step(timeout)
+        return True
+
+    def call_later(self, delay, callback, *args):
+        """虚拟时间到达 now + delay 时在推进时钟的线程中调用callback"""
+        with self.lock:
+            heapq.heappush(self.timers, (self.now + max(0.0, delay), next(self.sequence), callback, args))
+
+    def next_event(self):
+        """最早的待执行回调时间，没有则返回None"""
+        with self.lock:
+            return self.timers[0][0] if self.timers else None
+
+    def advance(self, seconds):
+        """前进seconds秒，按时间顺序执行期间到期的回调"""
+        target = self.now + max(0.0, seconds)
+        while True:
+            when = self.next_event()
+            if when is None or when > target:
+                break
+            self.run_due(when)
+        self.now = max(self.now, target)
+
+    def step(self, timeout):
+        """前进到下一个回调或 now + timeout 中较早者；没有回调也没有期限时等待将永不结束"""
+        when = self.next_event()
+        if timeout is not None and (when is None or when > self.now + timeout):
+            self.now += max(0.0, timeout)
+        elif when is not None:
+            self.run_due(when)
+        else:
+            raise RuntimeError("虚拟时钟上没有待执行的事件，等待永远不会结束")
+
+    def run_due(self, when):
+        """把时间设为when并执行所有到期的回调"""
+        self.now = max(self.now, when)
+        while True:
+            with self.lock:
+                if not self.timers or self.timers[0][0] > self.now:
+                    return
+                _, _, callback, args = heapq.heappop(self.timers)
+            callback(*args)
+
+    def executor(self, max_workers, thread_name_prefix=''):
+        return InlineExecutor()
+
+    def run(self, coroutine):
+        with asyncio.Runner(loop_factory=lambda: VirtualEventLoop(self)) as runner:
+            return runner.run(coroutine)
+
+
+class InlineExecutor(concurrent.futures.Executor):
+    """在调用线程中直接执行的线程池替代品，返回已完成的Future"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class VirtualSelector:
+    """包装真实selector: 没有就绪事件时不阻塞，而是把虚拟时钟前进到事件循环的下一个定时器"""
+
+    def __init__(self, selector, clock):
+        self.selector = selector
+        self.clock = clock
+
+    def select(self, timeout=None):
+        events = self.selector.select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None and self.clock.next_event() is None:
+            # 事件循环上没有定时器: 只能等待其他线程的通知
+            return self.selector.select(None)
+        self.clock.step(timeout)
+        return self.selector.select(0)
+
+    def __getattr__(self, name):
+        return getattr(self.selector, name)
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    """由虚拟时钟驱动的事件循环: asyncio.sleep、wait_for等立即完成，loop.time()返回虚拟时间"""
+
+    def __init__(self, clock):
+        super().__init__(VirtualSelector(selectors.DefaultSelector(), clock))
+        self.clock = clock
+
+    def time(self):
+        return self.clock.monotonic()
+
+    def run_in_executor(self, executor, func, *args):
+        """线程池调用在事件循环线程中直接执行，保证执行顺序确定"""
+        future = self.create_future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+_clock = Clock()
+
+
+def get_clock():
+    """当前使用的时钟"""
+    return _clock
+
+
+def set_clock(clock):
+    """替换全局时钟，需在打开串口和创建日志之前调用"""
+    global _clock
+    _clock = clock
+
+
+def monotonic():
+    return _clock.monotonic()
+
+
+def strftime(fmt):
+    return _clock.strftime(fmt)
+
+
+def sleep(seconds):
+    _clock.sleep(seconds)
+
+
+def run(coroutine):
+    return _clock.run(coroutine)
+
+
+def stamp_record(record):
+    """日志过滤器: 用时钟时间作为记录时间，虚拟时钟下日志时间戳与真实运行一致"""
+    created = _clock.time()
+    record.created = created
+    record.msecs = (created - int(created)) * 1000
+    return True
@@ -6,6 +6,172 @@ SERIAL_CONFIG = {
     'timeout': 5
 }
 
+# 多设备(车队)配置: 每个单元包含一对左右脚串口
+FLEET_CONFIG = {
+    'units': [
+        {'unit_id': 'Device1', 'left_port': 'COM26', 'right_port': 'COM28'},
+    ],
+    'max_workers': 64,  # 并发收发串口的最大线程数
+}
+
+# 后台读取线程配置
+READER_CONFIG = {
+    'max_frames': 256,  # 每个端口环形缓冲区保留的帧数
+    'max_raw_bytes': 65536,  # 每个端口保留的原始字节数
+    'response_timeout': 3,  # 等待响应帧的截止时间(秒)
+}
+
+# 运行日志配置（log_manager.py）
+LOG_CONFIG = {
+    'dir': 'aging_test_logs',  # 日志目录
+    'level': 'INFO',  # 每条命令和响应帧的十六进制日志为DEBUG级别，排查链路问题时改为 'DEBUG'
+    'format': '%(asctime)s - %(levelname)s - %(message)s',
+    'max_bytes': 50 * 1024 * 1024,  # 按大小轮转的单个文件上限，为0时不按大小轮转
+    'rotate_when': None,  # 按时间轮转，如 'midnight'、'H'；设置后忽略max_bytes
+    'backup_count': 20,  # 保留的历史文件数
+    'compress': True,  # 轮转后的历史文件用gzip压缩
+    'console': True,  # 同时输出到控制台
+    'per_device': False,  # 每个端口额外写一份独立日志（车队模式建议开启）
+}
+
+# 运行日志索引（log_indexer.py）: 增量解析日志目录，按循环、端口、事件类型建立SQLite索引
+LOG_INDEX_CONFIG = {
+    'db_path': 'aging_log_index.sqlite',
+    'batch_size': 5000,  # 每批插入的事件数
+}
+
+# 主动上报帧(telemetry.py): 设备在命令响应之外上报的状态、温度、电量等帧，按端口存入内存固定的多级降采样时间序列，
+# 老化失败时把失败期间的上报数据摘要写入结果，便于关联分析
+TELEMETRY_CONFIG = {
+    'tiers': ((10, 360), (300, 288), (3600, 168)),  # (桶宽度秒, 桶数): 1小时内10秒、1天内5分钟、7天内1小时精度
+    'names': {},  # 操作码 -> 名称，例如 {0x50: 'temperature'}，未配置的显示为 opXX
+    'failure_window': 600,  # 进入老化失败时关联此前多少秒的上报数据
+}
+
+# 串口流量抓包配置（traffic_capture.py），回放工具见 traffic_replay.py
+CAPTURE_CONFIG = {
+    'enabled': False,  # 记录每个收发数据块
+    'dir': 'aging_test_captures',
+    'flush_interval': 1.0,  # 写入磁盘的最长间隔(秒)
+}
+
+# 串口自动发现(port_discovery.py): 并行探测所有串口识别左右脚，结果按USB序列号和VID:PID缓存
+DISCOVERY_CONFIG = {
+    'cache_path': 'device_map.json',
+    'vid_pid': [],  # 只探测这些USB适配器，如 ['1A86:7523']，空列表表示探测全部串口
+    'unit_prefix': 'Unit',  # 新发现单元的ID前缀
+    'probe_timeout': 0.5,  # 单次探测等待响应的时间(秒)
+    'probe_attempts': 2,
+}
+
+# 冒烟探测(probe.py / main.py): 并行向所有单元发送命令，期限内收到期望的响应帧即通过
+PROBE_CONFIG = {
+    'command': 'get_result',  # 结果查询不改变设备状态；enter_aging 会让设备进入老化
+    'timeout': 1.0,  # 每只脚的探测期限(秒)
+    'attempts': 2,  # 期限内最多发送次数，没有响应时均匀重发
+}
+
+# 链路压力测试(stress_test.py): 逐级提高每个串口的命令速率并切换波特率，找出吞吐和出错的拐点
+STRESS_CONFIG = {
+    'baudrates': [9600, 19200, 38400, 57600, 115200],  # 依次测试的波特率(设备需工作在同一波特率)
+    'command': 'get_result',  # 压力命令，结果查询不改变设备状态
+    'start_rate': 5.0,  # 每个串口的起始命令速率(条/秒)
+    'rate_step': 1.5,  # 每级速率的倍数
+    'max_rate': 2000.0,  # 速率上限(条/秒)
+    'duration': 2.0,  # 每级持续发送的时间(秒)
+    'timeout': 0.5,  # 单条命令等待响应的期限(秒)
+    'settle': 0.3,  # 每级结束和切换波特率后的等待(秒)，让迟到的响应不计入下一级
+    # 一级满足以下全部条件才算健康，第一个不健康的级别之前的速率为拐点
+    'max_error_rate': 0.005,  # 帧错误率(损坏+丢失)上限
+    'min_efficiency': 0.9,  # 实际吞吐不低于目标速率的比例
+    'max_p99': 0.25,  # p99响应延迟上限(秒)
+    'headroom': 0.8,  # 推荐速率 = 拐点速率 × headroom
+    'output': 'stress_report.json',
+    # --simulate 时模拟器的线路参数(见SIMULATOR_CONFIG)
+    'simulator': {'latency': 0.005, 'jitter': 0.002, 'wire_timing': 1, 'command_time': 0.004,
+                  'rx_buffer': 64, 'max_baudrate': 57600},
+}
+
+# 串口连接监控: USB串口适配器重新枚举后按USB序列号重新打开
+SUPERVISOR_CONFIG = {
+    'enabled': True,
+    'check_interval': 0.5,  # 检查读取线程的间隔(秒)
+    'initial_backoff': 0.2,  # 首次重连失败后的等待(秒)，之后每次加倍
+    'max_backoff': 10,  # 重连等待上限(秒)
+    'reconnect_wait': 15,  # 读取响应时等待重连完成的最长时间(秒)
+    'probe_timeout': 2,  # 就绪探测的最长时间(秒)，超时后仍继续
+    'probe_interval': 0.2,  # 就绪探测的重发间隔(秒)
+}
+
+# 运行指标配置（metrics.py），以Prometheus文本格式通过HTTP提供
+METRICS_CONFIG = {
+    'enabled': False,
+    'host': '127.0.0.1',
+    'port': 9108,
+}
+
+# 性能分析配置（profiling.py）: main_controller --profile cycle|run 在cProfile下运行一个循环或整个测试
+PROFILE_CONFIG = {
+    'cycle': 1,  # --profile cycle 时分析的循环序号
+    'output': 'aging_profile.prof',  # cProfile统计文件，可用 python -m pstats 查看
+    'top': 25,  # 日志中列出的函数数(按累计耗时)
+    'top_ports': 10,  # 开销报告中列出的端口数(按耗时)
+}
+
+# 结果日志配置: 每个循环的结果追加写入JSON Lines文件
+JOURNAL_CONFIG = {
+    'dir': 'aging_test_results',  # 结果文件目录
+    'batch_size': 64,  # 缓冲的记录数达到该值时写入磁盘
+    'fsync': True,  # 写入后调用fsync，断电也不丢失已提交的循环
+}
+
+# 检查点配置: 每个循环结束后保存运行状态，用于 --resume 断点续测
+CHECKPOINT_CONFIG = {
+    'path': 'aging_test_results/checkpoint.json',
+}
+
+# 重试与断路(resilience.py): 进入老化和结果查询命令没有有效响应时按指数退避加随机抖动重发；
+# 端口连续失败后断路，所属单元暂停收发(循环记为跳过)，后台低频探测，恢复后下一循环试运行
+RESILIENCE_CONFIG = {
+    'enabled': True,
+    'attempts': 3,  # 每条命令最多发送次数(含首次)
+    'backoff': 0.2,  # 首次重发前的等待(秒)，之后每次加倍
+    'max_backoff': 2.0,  # 重发等待上限(秒)
+    'jitter': 0.5,  # 等待时间随机缩短的最大比例，避免多个单元同时重发
+    'failure_threshold': 2,  # 连续多少次命令失败(重试后仍无有效响应)后断路
+    'probe_interval': 5.0,  # 断路后首次探测的间隔(秒)，之后每次加倍
+    'max_probe_interval': 60.0,  # 探测间隔上限(秒)
+    'probe_timeout': 0.5,  # 探测等待响应的时间(秒)
+}
+
+# 本地设备模拟器配置（device_simulator.py）
+SIMULATOR_CONFIG = {
+    'latency': 0.02,  # 响应延迟(秒)
+    'jitter': 0.01,  # 延迟抖动(秒)，在 ±jitter 内均匀分布
+    'garbage_rate': 0.0,  # 响应前插入随机字节的概率
+    'split_rate': 0.0,  # 响应被拆成两段发送的概率
+    'split_delay': 0.005,  # 拆分后两段之间的间隔(秒)
+    'drop_rate': 0.0,  # 不响应的概率
+    'short_ack_rate': 0.0,  # 以7字节帧应答进入老化命令的概率
+    'pass_rate': 1.0,  # 每次老化通过的概率
+    'aging_duration': None,  # 模拟的单次老化时间(秒)，None表示使用TEST_CONFIG['aging_duration']
+    'telemetry_interval': 0.0,  # 主动上报遥测帧(温度、电量)的间隔(秒)，0表示不上报
+    # 线路模型(压力测试用，默认关闭): pty本身没有速率限制，也不会出错
+    'wire_timing': 0.0,  # 1表示按主机设置的波特率计算响应的传输时间，同一串口的响应依次发送
+    'command_time': 0.0,  # 设备处理每条命令的时间(秒)，命令依次处理
+    'rx_buffer': 0,  # 设备接收缓冲区(字节)，未处理完的命令超过时丢弃新到的字节，0表示不限
+    'max_baudrate': 0,  # 可靠传输的最高波特率，0表示不限
+    'overspeed_error_rate': 0.01,  # 超过max_baudrate时每个响应字节出错的概率，波特率每翻一倍增加一份
+}
+
+# 时间压缩模式(clock.py): main_controller --simulate 使用虚拟时钟和脚本串口后端(按SIMULATOR_CONFIG)，
+# 完整的测试计划在数秒内运行完毕，用于CI回归测试控制流程
+SIMULATION_CONFIG = {
+    'units': 1,  # 虚拟单元数，大于1时按车队模式运行
+    'seed': 0,  # 随机种子，固定时每次运行的结果相同
+    'start_time': None,  # 虚拟时钟起始时间(Unix时间戳)，固定时日志时间戳也相同；None表示当前时间
+}
+
 # 测试参数
 TEST_CONFIG = {
     'total_cycles': 203,  # 总循环次数
@@ -14,6 +180,23 @@ TEST_CONFIG = {
     'wait_time': 5,  # 等待时间(秒)
 }
 
+# 自适应进度轮询: 老化期间查询设备计数，双脚完成即进入下一循环，任一脚老化失败立即结束
+POLL_CONFIG = {
+    'enabled': False,
+    'initial_delay': 430,  # 进入老化后首次查询的延迟(秒)，略大于单次老化时间
+    'interval': 15,  # 最短查询间隔(秒)
+    'backoff': 2.0,  # 查询无进展时间隔的增长倍数
+    'max_interval': 300,  # 最长查询间隔(秒)
+    'deadline_factor': 1.5,  # 超过名义老化时长的该倍数仍未完成则判定失败
+}
+
+# 流水线调度: 各单元独立推进，错开命令发送时间
+SCHEDULER_CONFIG = {
+    'stagger': 2.0,  # 相邻单元首次进入老化的间隔(秒)
+    'max_in_flight': 16,  # 同时进行串口收发的单元数上限
+    'progress_interval': 60,  # 进度报告间隔(秒)
+}
+
 # 命令定义（根据您的文档）
 COMMANDS = {
     # 进入老化测试命令
@@ -21,8 +204,8 @@ COMMANDS = {
     'enter_aging_right': bytes.fromhex('55 AA FF 02 09 00'),  # 右脚进入老化
 
     # 获取老化结果命令
-    # 'get_result_left': bytes.fromhex('55 AA FF 02 41 01'),  # 获取左脚结果
-    # 'get_result_right': bytes.fromhex('55 AA FF 02 41 00'),  # 获取右脚结果
+    'get_result_left': bytes.fromhex('55 AA FF 02 41 01'),  # 获取左脚结果
+    'get_result_right': bytes.fromhex('55 AA FF 02 41 00'),  # 获取右脚结果
 }
 
 # 预期响应前缀（简化验证逻辑）
@@ -0,0 +1,442 @@
+"""本地设备模拟器: 通过伪终端(pty)模拟老化测试眼镜，用于无硬件调试和负载测试
+
+用法: python device_simulator.py --units 64 --latency 0.02 --drop-rate 0.01
+启动后在一行内打印与 FLEET_CONFIG['units'] 相同格式的端口配置(JSON)，Ctrl-C 退出。
+不需要真实串口的场合(如CI)可以使用 ScriptedBackend: 同样的设备模型，不经过pty和线程，配合虚拟时钟运行。
+
+注意: pyserial在POSIX上使用select()，文件描述符超过1024时会失败。模拟大量设备时
+应通过 spawn_simulator() 在独立进程中运行模拟器，不要与被测主机程序共用一个进程。
+"""
+import argparse
+import collections
+import heapq
+import json
+import logging
+import math
+import os
+import random
+import selectors
+import struct
+import subprocess
+import sys
+import termios
+import threading
+import time
+import tty
+import serial
+from config import TEST_CONFIG, SIMULATOR_CONFIG, SERIAL_CONFIG
+from protocol import (COMMAND, COMMAND_HEADER, RESPONSE_HEADER, FOOT_FLAGS, OP_ENTER_AGING, OP_ENTER_AGING_ACK,
+                      OP_GET_RESULT, RESULT_COUNTS)
+import clock
+
+SCRIPTED_PREFIX = 'scripted://'  # 脚本后端的串口名前缀
+OP_TELEMETRY = 0x50  # 模拟的主动上报帧操作码: 数据为温度(0.1°C)和电量(%)
+TELEMETRY_VALUES = struct.Struct('>hH')
+TTY_BAUDRATES = {getattr(termios, f"B{rate}"): rate
+                 for rate in (1200, 2400, 4800, 9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600)
+                 if hasattr(termios, f"B{rate}")}
+
+
+class VirtualDevice:
+    """单个虚拟脚: 维护老化计数并按协议生成响应"""
+
+    def __init__(self, unit_id, foot, rng, options):
+        self.unit_id = unit_id
+        self.foot = foot
+        self.rng = rng
+        self.options = options
+        self.buffer = bytearray()
+        self.total_count = 0
+        self.pass_count = 0
+        self.aging = collections.deque()  # 进行中的老化: (完成时间, 是否通过)
+        self.battery = 100
+        self.commands_received = 0
+        self.master = self.slave = None
+        self.path = None
+        # 线路模型状态
+        self.baudrate = SERIAL_CONFIG['baudrate']  # 主机当前设置的波特率
+        self.busy_until = 0.0  # 最后一条已接收命令处理完成的时间
+        self.backlog = collections.deque()  # 未处理完的命令: (处理完成时间, 字节数)
+        self.tx_free = 0.0  # 发送线路空闲的时间
+        self.overruns = 0  # 接收缓冲区溢出丢弃的字节数
+
+    def open_pty(self):
+        """创建伪终端，主机程序通过从端(path)访问本设备"""
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        self.path = os.ttyname(self.slave)
+
+    def receive(self, data, now):
+        """按接收缓冲区和命令处理时间接收数据，返回 [(处理完成的延迟, 响应)]"""
+        command_time = self.options['command_time']
+        rx_buffer = int(self.options['rx_buffer'])
+        if not command_time and not rx_buffer:
+            return [(0.0, response) for response in self.feed(data)]
+
+        while self.backlog and self.backlog[0][0] <= now:
+            self.backlog.popleft()
+        if rx_buffer:
+            allowed = max(0, rx_buffer - sum(size for _, size in self.backlog))
+            if len(data) > allowed:
+                # 溢出: 超出缓冲区的字节丢失，残缺的命令与后续数据拼接后可能被误解析
+                self.overruns += len(data) - allowed
+                data = data[:allowed]
+        responses = []
+        for response in self.feed(data):
+            self.busy_until = max(now, self.busy_until) + command_time
+            self.backlog.append((self.busy_until, COMMAND.size))
+            responses.append((self.busy_until - now, response))
+        return responses
+
+    def transmit(self, now, chunks):
+        """按线路特性发送 [(延迟, 数据)]: 超过max_baudrate时随机翻转比特；启用wire_timing时按波特率依次传输，
+        延迟改为传输完成的时间"""
+        max_baudrate = self.options['max_baudrate']
+        error_rate = 0.0
+        if max_baudrate and self.baudrate > max_baudrate:
+            error_rate = self.options['overspeed_error_rate'] * math.log2(self.baudrate / max_baudrate)
+        result = []
+        for delay, data in chunks:
+            if error_rate:
+                data = bytes(byte ^ (1 << self.rng.randrange(8)) if self.rng.random() < error_rate else byte
+                             for byte in data)
+            if self.options['wire_timing']:
+                # 每字节10位(起始位、8数据位、停止位)
+                self.tx_free = max(now + delay, self.tx_free) + len(data) * 10 / self.baudrate
+                delay = self.tx_free - now
+            result.append((delay, data))
+        return result
+
+    def feed(self, data):
+        """解析收到的命令字节，返回待发送的响应列表"""
+        self.buffer += data
+        responses = []
+        while True:
+            start = self.buffer.find(COMMAND_HEADER)
+            if start < 0:
+                del self.buffer[:max(0, len(self.buffer) - 2)]
+                break
+            if start + 4 > len(self.buffer):
+                del self.buffer[:start]
+                break
+            end = start + 4 + self.buffer[start + 3]
+            if end > len(self.buffer):
+                del self.buffer[:start]
+                break
+            command = bytes(self.buffer[start:end])
+            del self.buffer[:end]
+            self.commands_received += 1
+            response = self.handle(command)
+            if response is not None:
+                responses.append(response)
+        return responses
+
+    def handle(self, command):
+        """处理一条完整命令，返回响应帧，不认识的命令返回None"""
+        opcode = command[4] if len(command) > 4 else None
+        foot_flag = FOOT_FLAGS[self.foot]
+
+        if opcode == OP_ENTER_AGING:
+            # 一次进入老化命令对应 aging_per_cycle 次老化，依次进行，每次完成后计数
+            duration = self.options['aging_duration']
+            if duration is None:
+                duration = TEST_CONFIG['aging_duration']
+            finish = max(clock.monotonic(), self.aging[-1][0] if self.aging else 0)
+            for _ in range(TEST_CONFIG['aging_per_cycle']):
+                finish += duration
+                self.aging.append((finish, self.rng.random() < self.options['pass_rate']))
+            self.settle()
+            if self.rng.random() < self.options['short_ack_rate']:
+                return RESPONSE_HEADER + bytes([0x03, OP_ENTER_AGING_ACK, foot_flag, 0x00])
+            return RESPONSE_HEADER + bytes([0x07, OP_ENTER_AGING_ACK, foot_flag, 0x00, 0x00, 0x02, 0x04, 0x00])
+
+        if opcode == OP_GET_RESULT:
+            self.settle()
+            return RESPONSE_HEADER + bytes([0x07, OP_GET_RESULT, foot_flag, 0x00]) + \
+                RESULT_COUNTS.pack(self.total_count, self.pass_count)
+
+        return None
+
+    def telemetry(self):
+        """生成一帧主动上报数据，老化期间温度升高、电量缓慢下降"""
+        self.settle()
+        aging = bool(self.aging)
+        if aging and self.rng.random() < 0.05:
+            self.battery = max(0, self.battery - 1)
+        temperature = 250 + (120 if aging else 0) + self.rng.randint(-10, 10)
+        return RESPONSE_HEADER + bytes([0x07, OP_TELEMETRY, FOOT_FLAGS[self.foot], 0x00]) + \
+            TELEMETRY_VALUES.pack(temperature, self.battery)
+
+    def settle(self):
+        """结算已到完成时间的老化"""
+        now = clock.monotonic()
+        while self.aging and self.aging[0][0] <= now:
+            _, passed = self.aging.popleft()
+            self.total_count += 1
+            if passed:
+                self.pass_count += 1
+
+    def close(self):
+        """关闭pty"""
+        for fd in (self.master, self.slave):
+            if fd is None:
+                continue
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class DeviceSimulator:
+    """模拟器: 单线程select驱动所有虚拟设备，可扩展到数百个设备"""
+
+    def __init__(self, units=1, unit_prefix='SIM', seed=None, **options):
+        self.options = dict(SIMULATOR_CONFIG, **options)
+        self.rng = random.Random(seed)
+        self.devices = {}  # (unit_id, foot) -> VirtualDevice
+        self.pending = []  # 待发送的响应: (发送时间, 序号, 设备, 数据)
+        self.sequence = 0
+        self.selector = selectors.DefaultSelector()
+        self.wakeup_r, self.wakeup_w = os.pipe()
+        self.selector.register(self.wakeup_r, selectors.EVENT_READ, None)
+        self.stopped = threading.Event()
+        self.thread = None
+
+        raise_fd_limit(units * 4 + 64)
+        for index in range(1, units + 1):
+            unit_id = f"{unit_prefix}{index:03d}"
+            for foot in FOOT_FLAGS:
+                device = VirtualDevice(unit_id, foot, self.rng, self.options)
+                device.open_pty()
+                self.devices[(unit_id, foot)] = device
+                self.selector.register(device.master, selectors.EVENT_READ, device)
+
+    def units(self):
+        """返回与 FLEET_CONFIG['units'] 相同格式的单元列表"""
+        unit_ids = dict.fromkeys(unit_id for unit_id, _ in self.devices)
+        return [{'unit_id': unit_id,
+                 'left_port': self.devices[(unit_id, 'left')].path,
+                 'right_port': self.devices[(unit_id, 'right')].path} for unit_id in unit_ids]
+
+    def start(self):
+        """启动模拟器线程"""
+        interval = self.options['telemetry_interval']
+        if interval > 0:
+            now = time.monotonic()
+            for device in self.devices.values():
+                self.push(now + interval * self.rng.random(), device, None)
+        self.thread = threading.Thread(target=self.run, name='device-simulator', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """停止模拟器并关闭所有pty"""
+        self.stopped.set()
+        os.write(self.wakeup_w, b'\0')
+        if self.thread:
+            self.thread.join()
+        for device in self.devices.values():
+            device.close()
+        os.close(self.wakeup_r)
+        os.close(self.wakeup_w)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def schedule(self, device, response, delay=0.0):
+        """按配置的延迟、抖动、丢包、噪声、拆帧和线路模型安排响应，delay为设备处理命令的时间"""
+        now = time.monotonic()
+        chunks = [(delay + latency, data) for latency, data in plan_response(self.rng, self.options, response)]
+        for latency, data in device.transmit(now, chunks):
+            self.push(now + latency, device, data)
+
+    def push(self, when, device, data):
+        """加入发送队列"""
+        self.sequence += 1
+        heapq.heappush(self.pending, (when, self.sequence, device, data))
+
+    def run(self):
+        """事件循环: 读取命令并按时间顺序发送响应"""
+        while not self.stopped.is_set():
+            timeout = None
+            if self.pending:
+                timeout = max(0.0, self.pending[0][0] - time.monotonic())
+            for key, _ in self.selector.select(timeout):
+                device = key.data
+                if device is None:
+                    os.read(self.wakeup_r, 64)
+                    continue
+                try:
+                    data = os.read(device.master, 4096)
+                except (BlockingIOError, OSError):
+                    continue
+                if self.options['wire_timing'] or self.options['max_baudrate']:
+                    device.baudrate = TTY_BAUDRATES.get(termios.tcgetattr(device.slave)[5], device.baudrate)
+                for delay, response in device.receive(data, time.monotonic()):
+                    self.schedule(device, response, delay)
+
+            now = time.monotonic()
+            while self.pending and self.pending[0][0] <= now:
+                when, _, device, data = heapq.heappop(self.pending)
+                if data is None:
+                    # 主动上报: 发送一帧并安排下一次
+                    data = device.telemetry()
+                    self.push(when + self.options['telemetry_interval'], device, None)
+                try:
+                    os.write(device.master, data)
+                except (BlockingIOError, OSError) as e:
+                    logging.warning(f"模拟器向{device.unit_id}_{device.foot}写入失败: {e}")
+
+
+def plan_response(rng, options, response):
+    """按配置的延迟、抖动、丢包、噪声和拆帧把一个响应拆成 [(延迟, 数据)]，丢包时返回空列表"""
+    if rng.random() < options['drop_rate']:
+        return []
+    delay = max(0.0, options['latency'] + rng.uniform(-options['jitter'], options['jitter']))
+    if rng.random() < options['garbage_rate']:
+        response = rng.randbytes(rng.randint(1, 8)) + response
+    if len(response) > 1 and rng.random() < options['split_rate']:
+        cut = rng.randint(1, len(response) - 1)
+        return [(delay, response[:cut]), (delay + options['split_delay'], response[cut:])]
+    return [(delay, response)]
+
+
+class ScriptedSerial:
+    """脚本后端的串口对象: 实现SerialManager和PortReader用到的pyserial接口，响应通过时钟回调推送给读取器"""
+
+    def __init__(self, backend, device, port):
+        self.backend = backend
+        self.device = device
+        self.port = port
+        self.is_open = True
+        self.on_data = None  # PortReader.on_data
+
+    @property
+    def baudrate(self):
+        return self.device.baudrate
+
+    @baudrate.setter
+    def baudrate(self, value):
+        self.device.baudrate = value
+
+    def attach_reader(self, callback):
+        """由PortReader.start调用，代替读取线程"""
+        self.on_data = callback
+        interval = self.backend.options['telemetry_interval']
+        if interval > 0:
+            clock.get_clock().call_later(interval * self.backend.rng.random(), self.push_telemetry)
+
+    def push_telemetry(self):
+        """主动上报一帧并安排下一次，串口关闭后停止"""
+        if not self.is_open:
+            return
+        self.deliver(self.device.telemetry())
+        clock.get_clock().call_later(self.backend.options['telemetry_interval'], self.push_telemetry)
+
+    def write(self, data):
+        if not self.is_open:
+            raise serial.PortNotOpenError()
+        now = clock.monotonic()
+        for delay, response in self.device.receive(bytes(data), now):
+            chunks = [(delay + latency, chunk)
+                      for latency, chunk in plan_response(self.backend.rng, self.backend.options, response)]
+            for latency, chunk in self.device.transmit(now, chunks):
+                clock.get_clock().call_later(latency, self.deliver, chunk)
+        return len(data)
+
+    def deliver(self, data):
+        """响应到达"""
+        if self.is_open and self.on_data is not None:
+            self.on_data(data)
+
+    def close(self):
+        self.is_open = False
+
+
+class ScriptedBackend:
+    """脚本串口后端: 与DeviceSimulator相同的设备模型和响应特性，但不使用pty和线程
+
+    作为 SerialManager(opener=backend.open) 使用。响应按模拟延迟通过时钟的call_later送达，
+    配合clock.SimulatedClock时整个测试在单线程中按虚拟时间执行，固定seed时结果和日志可重复。
+    """
+
+    def __init__(self, units=1, unit_prefix='SIM', seed=None, **options):
+        self.options = dict(SIMULATOR_CONFIG, **options)
+        self.rng = random.Random(seed)
+        self.devices = {}  # (unit_id, foot) -> VirtualDevice
+        for index in range(1, units + 1):
+            unit_id = f"{unit_prefix}{index:03d}"
+            for foot in FOOT_FLAGS:
+                self.devices[(unit_id, foot)] = VirtualDevice(unit_id, foot, self.rng, self.options)
+
+    def units(self):
+        """返回与 FLEET_CONFIG['units'] 相同格式的单元列表"""
+        unit_ids = dict.fromkeys(unit_id for unit_id, _ in self.devices)
+        return [{'unit_id': unit_id,
+                 'left_port': f"{SCRIPTED_PREFIX}{unit_id}_left",
+                 'right_port': f"{SCRIPTED_PREFIX}{unit_id}_right"} for unit_id in unit_ids]
+
+    def open(self, port_name):
+        """打开串口名对应的虚拟设备"""
+        unit_id, _, foot = port_name[len(SCRIPTED_PREFIX):].rpartition('_')
+        device = self.devices.get((unit_id, foot))
+        if not port_name.startswith(SCRIPTED_PREFIX) or device is None:
+            raise serial.SerialException(f"脚本后端中没有串口 {port_name}")
+        return ScriptedSerial(self, device, port_name)
+
+
+def raise_fd_limit(required):
+    """数百个设备需要大量文件描述符，必要时提高软限制"""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY and soft < required:
+            target = required if hard == resource.RLIM_INFINITY else min(required, hard)
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    except (ImportError, ValueError, OSError) as e:
+        logging.warning(f"无法提高文件描述符限制: {e}")
+
+
+def spawn_simulator(units, seed=None, **options):
+    """在子进程中启动模拟器，返回 (进程, 单元列表)"""
+    command = [sys.executable, os.path.abspath(__file__), '--units', str(units)]
+    if seed is not None:
+        command += ['--seed', str(seed)]
+    for name, value in options.items():
+        command += [f"--{name.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line:
+        process.wait()
+        raise RuntimeError(f"模拟器启动失败，退出码: {process.returncode}")
+    return process, json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="老化测试设备模拟器")
+    parser.add_argument('--units', type=int, default=1, help="虚拟单元数(每个单元左右两个串口)")
+    parser.add_argument('--prefix', default='SIM', help="单元ID前缀")
+    parser.add_argument('--seed', type=int, default=None)
+    for name, value in SIMULATOR_CONFIG.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, default=value)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    options = {name: getattr(args, name) for name in SIMULATOR_CONFIG}
+    simulator = DeviceSimulator(args.units, unit_prefix=args.prefix, seed=args.seed, **options).start()
+    print(json.dumps(simulator.units()), flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from config import TEST_CONFIG, FLEET_CONFIG
+from async_serial import AsyncSerialManager
+from async_aging_test import AsyncAgingTest
+from results_journal import ResultsJournal
+from checkpoint import unit_key
+import clock
+
+FEET = ('left', 'right')
+
+
+class DeviceRegistry:
+    """设备注册表: 以 (单元ID, 脚) 为键管理串口"""
+
+    def __init__(self, units=None):
+        self.devices = {}  # (unit_id, foot) -> 串口名
+        for unit in (FLEET_CONFIG['units'] if units is None else units):
+            self.register(unit['unit_id'], unit['left_port'], unit['right_port'])
+
+    def register(self, unit_id, left_port, right_port):
+        """注册一个单元的左右脚串口"""
+        if (unit_id, 'left') in self.devices:
+            raise ValueError(f"重复的单元ID: {unit_id}")
+        self.devices[(unit_id, 'left')] = left_port
+        self.devices[(unit_id, 'right')] = right_port
+
+    @staticmethod
+    def port_key(unit_id, foot):
+        """生成SerialManager中使用的端口键"""
+        return f"{unit_id}_{foot}"
+
+    def unit_ids(self):
+        """按注册顺序返回所有单元ID"""
+        return list(dict.fromkeys(unit_id for unit_id, _ in self.devices))
+
+    def unit_ports(self, unit_id):
+        """返回单元左右脚的端口键"""
+        return {foot: self.port_key(unit_id, foot) for foot in FEET}
+
+    def units(self):
+        """返回与 FLEET_CONFIG['units'] 相同格式的单元列表"""
+        return [{'unit_id': unit_id,
+                 'left_port': self.devices[(unit_id, 'left')],
+                 'right_port': self.devices[(unit_id, 'right')]} for unit_id in self.unit_ids()]
+
+    def port_map(self):
+        """返回 {端口键: 串口名}，用于初始化SerialManager"""
+        return {self.port_key(unit_id, foot): port for (unit_id, foot), port in self.devices.items()}
+
+
+class AsyncFleetAgingTest:
+    """车队老化测试(asyncio版): 一个事件循环并发驱动所有单元，耗时不随设备数线性增长"""
+
+    def __init__(self, serial_manager, registry, journal=None):
+        self.serial_mgr = serial_manager  # AsyncSerialManager
+        self.registry = registry
+        # 所有单元共用一个结果日志，每个循环结束后统一刷盘
+        self.journal = journal or ResultsJournal()
+        self.units = {
+            unit_id: AsyncAgingTest(serial_manager, unit_id=unit_id, ports=registry.unit_ports(unit_id),
+                                    journal=self.journal)
+            for unit_id in registry.unit_ids()
+        }
+
+    async def run_single_cycle(self, cycle_num):
+        """并发执行所有单元的单次循环，返回 {单元ID: 是否成功}"""
+        outcomes = await asyncio.gather(
+            *(test.run_single_cycle(cycle_num) for test in self.units.values()),
+            return_exceptions=True
+        )
+        result = {}
+        for (unit_id, test), outcome in zip(self.units.items(), outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, BaseException):
+                test.record_exception(cycle_num, outcome)
+                result[unit_id] = False
+            else:
+                result[unit_id] = outcome[0]
+        self.journal.flush()
+        return result
+
+    async def run_complete_test(self, checkpoint=None):
+        """运行完整的车队测试，提供检查点时每个循环后保存进度，已有进度则从下一循环继续"""
+        total_cycles = TEST_CONFIG['total_cycles']
+        logging.info(f"开始车队老化测试，单元数: {len(self.units)}，总循环次数: {total_cycles}")
+
+        start_cycle = 1
+        success_counts = dict.fromkeys(self.units, 0)
+        if checkpoint is not None:
+            if checkpoint.last_cycle:
+                start_cycle = checkpoint.last_cycle + 1
+                for unit_id in self.units:
+                    success_counts[unit_id] = checkpoint.success_counts.get(unit_key(unit_id), 0)
+                logging.info(f"从第 {start_cycle} 次循环继续车队测试")
+                await asyncio.gather(*(test.resync(checkpoint.devices) for test in self.units.values()))
+            else:
+                checkpoint.start('fleet', self.journal.path, self.registry.units())
+
+        for cycle in range(start_cycle, total_cycles + 1):
+            start = clock.monotonic()
+            outcome = await self.run_single_cycle(cycle)
+            for unit_id, success in outcome.items():
+                if success:
+                    success_counts[unit_id] += 1
+            logging.info(f"第 {cycle} 次循环完成: {sum(outcome.values())}/{len(outcome)} 个单元成功, "
+                         f"耗时 {clock.monotonic() - start:.1f}秒")
+
+            if checkpoint is not None:
+                devices = {}
+                for test in self.units.values():
+                    devices.update(test.device_state)
+                checkpoint.update(cycle, {unit_key(unit_id): count for unit_id, count in success_counts.items()},
+                                  devices)
+
+            if cycle < total_cycles:
+                logging.info(f"等待 {TEST_CONFIG['wait_time']} 秒后进入下一次循环...")
+                await asyncio.sleep(TEST_CONFIG['wait_time'])
+
+        for unit_id, test in self.units.items():
+            test.generate_report(success_counts[unit_id])
+        if checkpoint is not None:
+            checkpoint.finish()
+
+    def close(self):
+        """关闭结果日志"""
+        self.journal.close()
+
+
+class FleetAgingTest:
+    """同步接口: 对AsyncFleetAgingTest的薄封装"""
+
+    def __init__(self, serial_manager, registry, journal=None):
+        self.serial_mgr = serial_manager
+        self.engine = AsyncFleetAgingTest(AsyncSerialManager(serial_manager), registry, journal=journal)
+
+    def run_single_cycle(self, cycle_num):
+        """并发执行所有单元的单次循环"""
+        return clock.run(self.engine.run_single_cycle(cycle_num))
+
+    def run_complete_test(self, checkpoint=None):
+        """运行完整的车队测试"""
+        clock.run(self.engine.run_complete_test(checkpoint))
+
+    def close(self):
+        """关闭结果日志"""
+        self.engine.close()
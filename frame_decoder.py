@@ -0,0 +1,82 @@
+import logging
+import re
+
+# 响应帧格式: 55 BB FF <长度> <数据...>，长度字节表示其后的数据字节数
+FRAME_HEADER = b'\x55\xBB\xFF'
+FRAME_LENGTHS = (0x03, 0x07)  # 7字节帧 / 11字节帧
+HEADER_SIZE = len(FRAME_HEADER) + 1
+MAX_FRAME_SIZE = HEADER_SIZE + max(FRAME_LENGTHS)
+
+# 完整帧: 数据区内不允许出现帧头，否则视为被截断的帧，从新帧头处重新同步
+_NOT_HEADER = rb'(?:(?!\x55\xBB\xFF).)'
+FRAME_PATTERN = re.compile(
+    rb'\x55\xBB\xFF(?:' + rb'|'.join(
+        re.escape(bytes([length])) + _NOT_HEADER + rb'{%d}' % length for length in FRAME_LENGTHS
+    ) + rb')',
+    re.S
+)
+# 位于缓冲区末尾、可能在后续读取中补全的帧前缀
+PARTIAL_PATTERN = re.compile(
+    rb'\x55(?:\xBB(?:\xFF(?:[' + bytes(FRAME_LENGTHS) + rb'].*)?)?)?\Z',
+    re.S
+)
+
+
+class FrameDecoder:
+    """增量式字节帧解码器，跨多次读取保持状态，输出所有完整帧"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.frames_decoded = 0  # 已解出的帧数
+        self.bytes_discarded = 0  # 因不属于任何帧而丢弃的字节数
+
+    def reset(self):
+        """清空未完成的数据"""
+        self.bytes_discarded += len(self.buffer)
+        self.buffer.clear()
+
+    def feed(self, data):
+        """输入新读取的字节，返回本次解出的完整帧列表（按到达顺序）"""
+        buf = self.buffer
+        buf += data
+        frames = FRAME_PATTERN.findall(buf)
+
+        # 最后一帧之后的数据中，只保留可能被后续读取补全的帧前缀
+        end = 0
+        if frames:
+            end = buf.rfind(frames[-1]) + len(frames[-1])
+        partial = PARTIAL_PATTERN.search(buf, max(end, len(buf) - MAX_FRAME_SIZE + 1))
+        keep_from = partial.start() if partial else len(buf)
+
+        self.bytes_discarded += keep_from - sum(map(len, frames))
+        self.frames_decoded += len(frames)
+        del buf[:keep_from]
+        return frames
+
+
+def extract_valid_frame_hex(hex_data, port):
+    """从十六进制字符串中提取有效的响应帧（旧的正则实现，保留用于兼容和基准对比）"""
+    # 可能的响应帧模式
+    patterns = [
+        r'55BBFF07[0-9A-F]{12}',  # 11字节完整帧
+        r'55BBFF03[0-9A-F]{6}',  # 7字节帧
+    ]
+
+    for pattern in patterns:
+        matches = re.findall(pattern, hex_data)
+        if matches:
+            # 返回最后一个匹配（最新响应）
+            return matches[-1]
+
+    # 如果没有找到完整帧，尝试查找帧头
+    if '55BBFF' in hex_data:
+        # 查找最后一个55BBFF的位置
+        last_index = hex_data.rfind('55BBFF')
+        if last_index != -1:
+            # 尝试提取从帧头开始的22个字符（11字节）
+            if last_index + 22 <= len(hex_data):
+                potential_frame = hex_data[last_index:last_index + 22]
+                logging.info(f"{port}脚提取的潜在帧: {potential_frame}")
+                return potential_frame
+
+    return None
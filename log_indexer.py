@@ -0,0 +1,280 @@
+"""运行日志索引: 逐行流式解析 aging_test_logs 中的日志（包括轮转后的.gz文件），
+将循环、发送的命令、原始响应、提取的帧、无响应和错误写入SQLite索引，每次只解析新增的内容
+
+用法:
+    python log_indexer.py index [--dir aging_test_logs]
+    python log_indexer.py query --kind no_response --foot right --min-cycle 150 --runs
+    python log_indexer.py sql "SELECT kind, COUNT(*) FROM events GROUP BY kind"
+
+文件以首行内容识别而不是文件名，日志轮转改名或压缩后从上次的位置继续，不会重复索引。
+按端口拆分的日志(per_device)与主日志内容重复，不索引。
+发送的命令、原始响应和提取的帧为DEBUG级别日志，LOG_CONFIG['level']为 'DEBUG' 时运行的日志中才有。
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from config import LOG_CONFIG, LOG_INDEX_CONFIG
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT UNIQUE,  -- 运行名和首行的SHA1，轮转改名后不变
+    path TEXT,
+    run TEXT,  -- 设备ID_启动时间
+    size INTEGER,
+    mtime REAL,
+    offset INTEGER,  -- 已解析到的位置（解压后的字节数）
+    lines INTEGER,
+    state TEXT  -- 解析状态（各单元当前循环），追加内容时继续使用
+);
+CREATE TABLE IF NOT EXISTS events (
+    file_id INTEGER,
+    line INTEGER,
+    ts TEXT,
+    level TEXT,
+    unit TEXT,
+    foot TEXT,
+    cycle INTEGER,
+    kind TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS events_kind ON events (kind, foot, cycle);
+CREATE INDEX IF NOT EXISTS events_unit ON events (unit, cycle);
+CREATE INDEX IF NOT EXISTS events_file ON events (file_id, line);
+"""
+
+LOG_NAME = re.compile(r'^aging_test_(?P<device>.+)_(?P<stamp>\d{8}_\d{6})\.log')
+LINE = re.compile(r'^(?P<ts>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) - (?P<level>[A-Z]+) - (?P<message>.*)$')
+TAG = re.compile(r'^\[(?P<unit>[^\]]+)\] ')
+CYCLE_START = re.compile(r'=== 开始第 (?P<cycle>\d+) 次循环 ===$')
+CYCLE_RESULT = re.compile(r'循环 (?P<cycle>\d+) (?P<result>成功|失败) - ')
+PORT_EVENT = re.compile(r'^向?(?P<port>[^\s:\]]+?)脚(?P<event>原始响应|提取的有效帧|发送命令|重发未完成的命令|无响应|未找到有效帧)'
+                        r'(?:: (?P<data>[0-9A-F]+))?$')
+
+PORT_KINDS = {
+    '原始响应': 'raw',
+    '提取的有效帧': 'frame',
+    '发送命令': 'command',
+    '重发未完成的命令': 'resend',
+    '无响应': 'no_response',
+    '未找到有效帧': 'no_frame',
+}
+LEVEL_KINDS = {'ERROR': 'error', 'CRITICAL': 'error', 'WARNING': 'warning'}
+
+
+def split_port(port):
+    """端口键 -> (单元ID, 脚)，单设备模式的端口键就是 'left'/'right'"""
+    for foot in ('left', 'right'):
+        if port == foot:
+            return None, foot
+        if port.endswith('_' + foot):
+            return port[:-len(foot) - 1], foot
+    return port, None
+
+
+def parse_line(message, level, cycles):
+    """解析一条日志消息，更新各单元当前循环，返回 (单元, 脚, 循环, 类型, 数据)，无需索引时返回None"""
+    match = PORT_EVENT.match(message)
+    if match:
+        unit, foot = split_port(match['port'])
+        return unit, foot, cycles.get(unit), PORT_KINDS[match['event']], match['data']
+
+    unit = None
+    tag = TAG.match(message)
+    if tag:
+        unit = tag['unit']
+        message = message[tag.end():]
+
+    match = CYCLE_START.match(message)
+    if match:
+        cycles[unit] = int(match['cycle'])
+        return unit, None, cycles[unit], 'cycle_start', None
+
+    match = CYCLE_RESULT.match(message)
+    if match:
+        kind = 'cycle_ok' if match['result'] == '成功' else 'cycle_failed'
+        return unit, None, int(match['cycle']), kind, message[match.end():]
+
+    kind = LEVEL_KINDS.get(level)
+    if kind:
+        return unit, None, cycles.get(unit), kind, message
+    return None
+
+
+def open_log(path):
+    """以二进制方式打开日志，.gz文件流式解压"""
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def read_fingerprint(path, run):
+    """返回运行名和首行的SHA1，首行尚未写完时返回None"""
+    with open_log(path) as f:
+        first = f.readline(4096)
+    if not first.endswith(b'\n'):
+        return None
+    return hashlib.sha1(run.encode('utf-8') + b'\n' + first).hexdigest()
+
+
+class LogIndex:
+    """SQLite日志索引"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or LOG_INDEX_CONFIG['db_path']
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def update(self, log_dir=None):
+        """索引目录中新增的日志内容，返回 (解析的文件数, 新增事件数)"""
+        log_dir = log_dir or LOG_CONFIG['dir']
+        known = {path: (size, mtime) for path, size, mtime in
+                 self.conn.execute('SELECT path, size, mtime FROM files')}
+        files = events = 0
+        for name in sorted(os.listdir(log_dir)):
+            match = LOG_NAME.match(name)
+            if not match or match['device'].endswith(('_left', '_right')):
+                continue
+            path = os.path.join(log_dir, name)
+            stat = os.stat(path)
+            if known.get(path) == (stat.st_size, stat.st_mtime):
+                continue
+            added = self.index_file(path, f"{match['device']}_{match['stamp']}", stat)
+            if added is not None:
+                files += 1
+                events += added
+        return files, events
+
+    def index_file(self, path, run, stat):
+        """从上次的位置继续解析一个日志文件，返回新增事件数，文件为空时返回None"""
+        fingerprint = read_fingerprint(path, run)
+        if fingerprint is None:
+            return None
+        row = self.conn.execute('SELECT id, offset, lines, state FROM files WHERE fingerprint = ?',
+                                (fingerprint,)).fetchone()
+        with self.conn:
+            # 路径已被轮转后的新文件使用，旧记录改为新路径
+            self.conn.execute('UPDATE files SET path = NULL WHERE path = ?', (path,))
+            if row is None:
+                file_id = self.conn.execute(
+                    'INSERT INTO files (fingerprint, path, run, offset, lines, state) VALUES (?, ?, ?, 0, 0, ?)',
+                    (fingerprint, path, run, '{}')).lastrowid
+                offset, line_no, cycles = 0, 0, {}
+            else:
+                file_id, offset, line_no, state = row
+                cycles = {None if key == '' else key: value for key, value in json.loads(state).items()}
+
+        batch, added = [], 0
+        batch_size = LOG_INDEX_CONFIG['batch_size']
+        with open_log(path) as f, self.conn:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break  # 最后一行还没写完，下次继续
+                offset += len(raw)
+                line_no += 1
+                match = LINE.match(raw.decode('utf-8', errors='replace').rstrip('\r\n'))
+                if not match:
+                    continue  # 异常堆栈等续行
+                event = parse_line(match['message'], match['level'], cycles)
+                if event is None:
+                    continue
+                batch.append((file_id, line_no, match['ts'], match['level']) + event)
+                if len(batch) >= batch_size:
+                    self.insert(batch)
+                    added += len(batch)
+                    batch = []
+            self.insert(batch)
+            added += len(batch)
+            state = json.dumps({'' if key is None else key: value for key, value in cycles.items()})
+            self.conn.execute('UPDATE files SET path = ?, size = ?, mtime = ?, offset = ?, lines = ?, state = ? '
+                              'WHERE id = ?', (path, stat.st_size, stat.st_mtime, offset, line_no, state, file_id))
+        return added
+
+    def insert(self, rows):
+        self.conn.executemany('INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    @staticmethod
+    def where(kind=None, unit=None, foot=None, min_cycle=None, max_cycle=None, run=None):
+        """生成查询条件的WHERE子句和参数"""
+        conditions, params = [], []
+        for column, operator, value in (('e.kind', '=', kind), ('e.unit', '=', unit), ('e.foot', '=', foot),
+                                        ('e.cycle', '>', min_cycle), ('e.cycle', '<=', max_cycle),
+                                        ('f.run', '=', run)):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+        return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+    def query(self, limit=None, **conditions):
+        """按条件查询事件，返回 [(运行, 单元, 脚, 循环, 时间, 类型, 数据)]"""
+        where, params = self.where(**conditions)
+        sql = ('SELECT f.run, e.unit, e.foot, e.cycle, e.ts, e.kind, e.data FROM events e '
+               f'JOIN files f ON e.file_id = f.id{where} ORDER BY f.run, e.file_id, e.line')
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        return self.conn.execute(sql, params).fetchall()
+
+    def runs(self, **conditions):
+        """满足条件的运行列表"""
+        where, params = self.where(**conditions)
+        sql = f'SELECT DISTINCT f.run FROM events e JOIN files f ON e.file_id = f.id{where} ORDER BY f.run'
+        return [run for run, in self.conn.execute(sql, params)]
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="运行日志索引")
+    parser.add_argument('--db', default=LOG_INDEX_CONFIG['db_path'], help="索引数据库")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    index_parser = commands.add_parser('index', help="索引新增的日志")
+    index_parser.add_argument('--dir', default=LOG_CONFIG['dir'], help="日志目录")
+
+    query_parser = commands.add_parser('query', help="查询事件")
+    query_parser.add_argument('--kind', choices=sorted(set(PORT_KINDS.values()) | set(LEVEL_KINDS.values())
+                                                       | {'cycle_start', 'cycle_ok', 'cycle_failed'}))
+    query_parser.add_argument('--unit')
+    query_parser.add_argument('--foot', choices=['left', 'right'])
+    query_parser.add_argument('--min-cycle', type=int, help="循环序号大于此值")
+    query_parser.add_argument('--max-cycle', type=int, help="循环序号不大于此值")
+    query_parser.add_argument('--run')
+    query_parser.add_argument('--limit', type=int, default=1000)
+    query_parser.add_argument('--runs', action='store_true', help="只列出满足条件的运行")
+
+    sql_parser = commands.add_parser('sql', help="执行SQL查询")
+    sql_parser.add_argument('statement')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    index = LogIndex(args.db)
+    try:
+        if args.command == 'index':
+            start = time.perf_counter()
+            files, events = index.update(args.dir)
+            logging.info(f"索引完成: 解析 {files} 个文件，新增 {events} 个事件，耗时 {time.perf_counter() - start:.2f}秒")
+        elif args.command == 'query':
+            conditions = dict(kind=args.kind, unit=args.unit, foot=args.foot, min_cycle=args.min_cycle,
+                              max_cycle=args.max_cycle, run=args.run)
+            if args.runs:
+                print('\n'.join(index.runs(**conditions)))
+            else:
+                for row in index.query(limit=args.limit, **conditions):
+                    print(' | '.join('' if value is None else str(value) for value in row))
+        else:
+            for row in index.conn.execute(args.statement):
+                print(' | '.join('' if value is None else str(value) for value in row))
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,30 +5,127 @@
 # @FileName: log_manager.py
 # @Email: wangfu_zhang@ggec.com.cn
 # ==================================================
+import atexit
+import gzip
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+import shutil
+import threading
+from config import LOG_CONFIG
+import clock
 
+_listener = None  # 后台写日志的QueueListener
+_queue_handler = None
+
+
+def _gzip_namer(name):
+    """轮转文件名追加.gz"""
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    """轮转时压缩旧日志（在后台线程中执行，不影响串口收发）"""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def create_file_handler(log_file):
+    """按配置创建可轮转的文件日志处理器"""
+    if LOG_CONFIG['rotate_when']:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            log_file, when=LOG_CONFIG['rotate_when'], backupCount=LOG_CONFIG['backup_count'], encoding='utf-8')
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_CONFIG['max_bytes'], backupCount=LOG_CONFIG['backup_count'], encoding='utf-8')
+    if LOG_CONFIG['compress']:
+        handler.namer = _gzip_namer
+        handler.rotator = _gzip_rotator
+    handler.setFormatter(logging.Formatter(LOG_CONFIG['format']))
+    return handler
+
+
+class DeviceLogRouter(logging.Handler):
+    """按端口分发日志: 带port属性的记录额外写入该端口自己的日志文件"""
+
+    def __init__(self, log_dir, device_id, timestamp):
+        super().__init__()
+        self.log_dir = log_dir
+        self.device_id = device_id
+        self.timestamp = timestamp
+        self.handlers = {}
+        self.handlers_lock = threading.Lock()
+
+    def emit(self, record):
+        port = getattr(record, 'port', None)
+        if port is None:
+            return
+        with self.handlers_lock:
+            handler = self.handlers.get(port)
+            if handler is None:
+                name = str(port).replace(os.sep, '_')
+                log_file = os.path.join(self.log_dir, f"aging_test_{self.device_id}_{name}_{self.timestamp}.log")
+                handler = self.handlers[port] = create_file_handler(log_file)
+        handler.handle(record)
+
+    def close(self):
+        with self.handlers_lock:
+            for handler in self.handlers.values():
+                handler.close()
+            self.handlers.clear()
+        super().close()
+
+
+def setup_logging(device_id="Device1", per_device=None):
+    """设置日志系统: 业务线程只把记录放入队列，文件和控制台输出由后台线程完成"""
+    global _listener, _queue_handler
+    stop_logging()
 
-def setup_logging(device_id="Device1"):
-    """设置日志系统"""
     # 创建日志目录
-    log_dir = "aging_test_logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+    log_dir = LOG_CONFIG['dir']
+    os.makedirs(log_dir, exist_ok=True)
 
-    # 生成日志文件名 - 现在正确使用 device_id
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # 生成日志文件名
+    timestamp = clock.strftime("%Y%m%d_%H%M%S")
     log_file = os.path.join(log_dir, f"aging_test_{device_id}_{timestamp}.log")
 
-    # 配置日志
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file, encoding='utf-8'),
-            logging.StreamHandler()  # 同时输出到控制台
-        ]
-    )
-
-    return log_file
\ No newline at end of file
+    handlers = [create_file_handler(log_file)]
+    if LOG_CONFIG['console']:
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(LOG_CONFIG['format']))
+        handlers.append(console)
+    if LOG_CONFIG['per_device'] if per_device is None else per_device:
+        handlers.append(DeviceLogRouter(log_dir, device_id, timestamp))
+
+    log_queue = queue.SimpleQueue()  # 无界队列，写入永不阻塞
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    if clock.get_clock().simulated:
+        _queue_handler.addFilter(clock.stamp_record)  # 日志时间使用虚拟时间
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(_queue_handler)
+    root.setLevel(LOG_CONFIG['level'])
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return log_file
+
+
+def stop_logging():
+    """停止后台日志线程，写完队列中剩余的记录"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+atexit.register(stop_logging)
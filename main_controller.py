@@ -1,26 +1,60 @@
+import argparse
 import logging
-import time
+from log_manager import setup_logging, stop_logging
 from serial_manager import SerialManager
 from aging_test import AgingTest
-from config import TEST_CONFIG
+from fleet import DeviceRegistry, FleetAgingTest
+from pipeline_scheduler import PipelineScheduler
+from port_discovery import discover_units
+from checkpoint import Checkpoint
+from results_journal import ResultsJournal
+from traffic_capture import TrafficCapture
+from metrics import MetricsServer
+from device_simulator import ScriptedBackend
+import clock
+import profiling
+import resilience
+from config import TEST_CONFIG, CHECKPOINT_CONFIG, METRICS_CONFIG, POLL_CONFIG, SIMULATION_CONFIG
 
 
-def setup_logging():
-    """设置日志"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(f"aging_test_{time.strftime('%Y%m%d_%H%M%S')}.log", encoding='utf-8'),
-            logging.StreamHandler()
-        ]
-    )
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="AI眼镜老化测试系统")
+    parser.add_argument('--fleet', action='store_true', help="车队模式: 按FLEET_CONFIG并发测试多个单元")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="流水线模式: 车队中各单元独立推进、错开发送(按SCHEDULER_CONFIG)")
+    parser.add_argument('--discover', action='store_true',
+                        help="车队模式下自动发现串口(按DISCOVERY_CONFIG，优先使用设备缓存)，代替FLEET_CONFIG['units']")
+    parser.add_argument('--resume', nargs='?', const=CHECKPOINT_CONFIG['path'], metavar='CHECKPOINT',
+                        help="从检查点继续上次中断的测试(默认读取CHECKPOINT_CONFIG['path'])")
+    parser.add_argument('--capture', action='store_true', help="将所有串口收发数据记录到二进制抓包文件")
+    parser.add_argument('--poll', action='store_true',
+                        help="老化期间轮询设备进度，双脚完成即进入下一循环(等同于POLL_CONFIG['enabled'])")
+    parser.add_argument('--metrics', nargs='?', type=int, const=METRICS_CONFIG['port'], metavar='PORT',
+                        help="在本地HTTP端口提供Prometheus格式的运行指标(默认METRICS_CONFIG['port'])")
+    parser.add_argument('--profile', nargs='?', choices=['cycle', 'run'], const='run',
+                        help="在cProfile下运行: cycle 只分析PROFILE_CONFIG['cycle']指定的循环，run(默认) 分析整个测试")
+    parser.add_argument('--simulate', nargs='?', type=int, const=SIMULATION_CONFIG['units'], metavar='UNITS',
+                        help="时间压缩模式: 虚拟时钟+脚本串口后端，不连接硬件，完整测试在数秒内完成(按SIMULATION_CONFIG)")
+    return parser.parse_args()
 
 
 def main():
     """主函数"""
+    args = parse_args()
+    backend = None
+    if args.simulate:
+        # 虚拟时钟必须在创建日志、结果日志和打开串口之前设置
+        clock.set_clock(clock.SimulatedClock(SIMULATION_CONFIG['start_time']))
+        backend = ScriptedBackend(args.simulate, seed=SIMULATION_CONFIG['seed'])
+        resilience.seed(SIMULATION_CONFIG['seed'])
     try:
-        setup_logging()
+        setup_logging("Fleet" if args.fleet or args.pipeline or args.discover or (args.simulate or 0) > 1
+                      else "Device1")
+        if args.poll:
+            POLL_CONFIG['enabled'] = True
+        if args.profile:
+            profiling.enable(args.profile)
 
         # 显示测试信息
         total_time_hours = (TEST_CONFIG['total_cycles'] *
@@ -32,13 +66,60 @@ def main():
         logging.info(f"每次循环老化次数: {TEST_CONFIG['aging_per_cycle']}")
         logging.info(f"单次老化时间: {TEST_CONFIG['aging_duration']}秒")
         logging.info(f"预计总时间: {total_time_hours:.2f}小时")
+        if POLL_CONFIG['enabled']:
+            logging.info("进度轮询已启用: 设备提前完成时进入下一循环")
+
+        if args.metrics or METRICS_CONFIG['enabled']:
+            metrics_server = MetricsServer(port=args.metrics).start()
+
+        # 新测试创建检查点，断点续测时读取检查点并沿用原结果日志
+        if args.resume:
+            checkpoint = Checkpoint.load(args.resume)
+            if checkpoint.completed:
+                logging.info(f"检查点 {args.resume} 对应的测试已完成，无需继续")
+                return
+            pipeline_mode = checkpoint.state.get('mode') == 'pipeline'
+            fleet_mode = pipeline_mode or checkpoint.state.get('mode') == 'fleet'
+            units = checkpoint.state.get('units')
+            logging.info(f"从检查点继续测试: {args.resume}，已完成 {checkpoint.last_cycle} 次循环")
+        else:
+            checkpoint = Checkpoint()
+            pipeline_mode = args.pipeline
+            fleet_mode = args.fleet or args.pipeline or args.discover or (args.simulate or 0) > 1
+            if backend is not None:
+                units = backend.units()
+            else:
+                units = discover_units() if args.discover else None
 
         # 初始化串口和测试
-        serial_mgr = SerialManager()
-        aging_test = AgingTest(serial_mgr)
+        capture = TrafficCapture() if args.capture else None
+        if fleet_mode:
+            registry = DeviceRegistry(units)
+            unit_ids = registry.unit_ids()
+            logging.info(f"车队模式: {len(unit_ids)} 个单元")
+            serial_mgr = SerialManager(registry.port_map(), capture=capture, opener=backend.open if backend else None)
+            journal = ResultsJournal(checkpoint.journal) if args.resume else None
+            if pipeline_mode:
+                aging_test = PipelineScheduler(serial_mgr, registry, journal=journal)
+            else:
+                aging_test = FleetAgingTest(serial_mgr, registry, journal=journal)
+        else:
+            unit_ids = [None]
+            port_map = None
+            if backend is not None:
+                unit = backend.units()[0]
+                port_map = {'left': unit['left_port'], 'right': unit['right_port']}
+            serial_mgr = SerialManager(port_map, capture=capture, opener=backend.open if backend else None)
+            aging_test = AgingTest(serial_mgr, journal_path=checkpoint.journal if args.resume else None)
+
+        if args.resume:
+            checkpoint.reconcile(unit_ids)
 
-        # 运行测试
-        aging_test.run_complete_test()
+        # 运行测试，结束后报告实际耗时相对名义时长的开销
+        start = clock.monotonic()
+        with profiling.profile_run():
+            aging_test.run_complete_test(checkpoint)
+        profiling.log_overhead_report(clock.monotonic() - start)
 
     except KeyboardInterrupt:
         logging.info("用户中断测试")
@@ -46,9 +127,14 @@ def main():
         logging.error(f"测试错误: {e}")
     finally:
         # 清理资源
+        if 'aging_test' in locals():
+            aging_test.close()
         if 'serial_mgr' in locals():
             serial_mgr.close_ports()
+        if 'metrics_server' in locals():
+            metrics_server.stop()
         logging.info("测试结束")
+        stop_logging()
 
 
 if __name__ == "__main__":
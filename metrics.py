@@ -0,0 +1,212 @@
+"""进程内运行指标: 计数器、仪表和直方图，按端口/单元分标签，以Prometheus文本格式通过HTTP提供
+
+用法: 开启 METRICS_CONFIG['enabled'] 或 main_controller --metrics，然后抓取 http://127.0.0.1:9108/metrics
+"""
+import bisect
+import contextlib
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import METRICS_CONFIG
+import clock
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PHASE_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 600, 1800, 3600)
+OVERRUN_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 600)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """指标基类，标签值按定义顺序以位置参数传入"""
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    """只增计数器"""
+    kind = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def totals(self):
+        """各标签组合的当前值"""
+        with self.lock:
+            return dict(self.values)
+
+    def render(self):
+        with self.lock:
+            items = list(self.values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in items]
+
+
+class Gauge(Counter):
+    """可设置的当前值"""
+    kind = 'gauge'
+
+    def set(self, value, *label_values):
+        with self.lock:
+            self.values[label_values] = value
+
+
+class Histogram(Metric):
+    """直方图: 各桶计数、总和与次数"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            state = self.values.get(label_values)
+            if state is None:
+                state = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def totals(self):
+        """各标签组合的 (总和, 次数)"""
+        with self.lock:
+            return {key: (total, count) for key, (_, total, count) in self.values.items()}
+
+    @contextlib.contextmanager
+    def time(self, *label_values):
+        """统计with块的耗时(秒)"""
+        start = clock.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(clock.monotonic() - start, *label_values)
+
+    def render(self):
+        with self.lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self.values.items()]
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus文本格式"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# 串口层
+COMMANDS_SENT = REGISTRY.counter('aging_commands_sent_total', "Commands written to the port", ('port',))
+SEND_ERRORS = REGISTRY.counter('aging_send_errors_total', "Failed command writes", ('port',))
+SEND_SECONDS = REGISTRY.histogram('aging_send_seconds', "Time spent in send_command", ('port',))
+RESPONSE_SECONDS = REGISTRY.histogram('aging_response_seconds', "Latency from command write to response frame",
+                                      ('port',))
+NO_RESPONSE = REGISTRY.counter('aging_no_response_total', "Reads that received no bytes before the deadline",
+                               ('port',))
+FRAME_NOT_FOUND = REGISTRY.counter('aging_frame_not_found_total', "Reads that received bytes but no valid frame",
+                                   ('port',))
+DISCONNECTS = REGISTRY.counter('aging_port_disconnects_total', "Ports whose reader stopped unexpectedly", ('port',))
+RECONNECTS = REGISTRY.counter('aging_port_reconnects_total', "Successful port reconnects", ('port',))
+RETRIES = REGISTRY.counter('aging_command_retries_total', "Commands resent after no acceptable response", ('port',))
+BREAKER_TRIPS = REGISTRY.counter('aging_breaker_trips_total', "Times a port's circuit breaker opened", ('port',))
+BREAKER_OPEN = REGISTRY.gauge('aging_breaker_open', "1 while the port's circuit breaker is open", ('port',))
+
+# 老化流程
+REJECTED_FRAMES = REGISTRY.counter('aging_enter_rejected_total',
+                                   "Responses rejected by verify_enter_aging_response", ('port',))
+CYCLES = REGISTRY.counter('aging_cycles_total', "Completed cycles by result", ('unit', 'result'))
+PHASE_SECONDS = REGISTRY.histogram('aging_cycle_phase_seconds', "Duration of run_single_cycle phases",
+                                   ('unit', 'phase'), buckets=PHASE_BUCKETS)
+PORT_PHASE_SECONDS = REGISTRY.histogram('aging_port_phase_seconds', "Per-port time spent in cycle phases",
+                                        ('port', 'phase'), buckets=PHASE_BUCKETS)
+CYCLE_OVERRUN_SECONDS = REGISTRY.histogram('aging_cycle_overrun_seconds',
+                                           "Cycle duration beyond the nominal aging time", ('unit',),
+                                           buckets=OVERRUN_BUCKETS)
+LAST_CYCLE_OVERRUN = REGISTRY.gauge('aging_last_cycle_overrun_seconds', "Overrun of the most recent cycle",
+                                    ('unit',))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 抓取请求不写入运行日志
+
+
+class MetricsServer:
+    """后台HTTP服务，提供 /metrics"""
+
+    def __init__(self, host=None, port=None):
+        self.server = ThreadingHTTPServer((host or METRICS_CONFIG['host'], port or METRICS_CONFIG['port']),
+                                          _MetricsHandler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name='metrics-server', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        logging.info(f"运行指标服务: http://{host}:{port}/metrics")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
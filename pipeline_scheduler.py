@@ -0,0 +1,261 @@
+import asyncio
+import collections
+import heapq
+import itertools
+import logging
+from config import TEST_CONFIG, POLL_CONFIG, SCHEDULER_CONFIG
+from async_serial import AsyncSerialManager
+from async_aging_test import AsyncAgingTest, AgingPoll
+from results_journal import ResultsJournal
+from checkpoint import unit_key
+import clock
+import metrics
+import profiling
+
+# 单元状态: 到期后执行的下一步
+ENTER = 'enter'  # 进入老化（轮询模式下先查询基准计数）
+POLL = 'poll'  # 查询老化进度
+FETCH = 'fetch'  # 名义老化时长结束后获取结果
+DONE = 'done'
+
+
+class UnitPipeline:
+    """单个单元的状态机: enter → (poll ... | fetch) → 循环间等待 → enter ..."""
+
+    def __init__(self, test):
+        self.test = test  # AsyncAgingTest
+        self.cycle = 1  # 当前循环
+        self.completed = 0  # 已完成的循环数
+        self.success_count = 0
+        self.state = ENTER
+        self.due = 0.0  # 下一步的执行时间(事件循环时间)
+        self.active = False  # 是否正在串口收发
+        self.cycle_start = None
+        self.wait_start = None  # 进入老化完成的时间，用于统计等待阶段
+        self.poll = None  # 轮询模式下本循环的AgingPoll
+
+
+class AsyncPipelineScheduler:
+    """流水线调度器: 各单元独立推进，由共享的优先队列按时间驱动
+
+    与车队模式不同，单元之间不按循环同步: 慢单元或失败单元不会拖住其他单元。首次进入老化按 stagger 错开，
+    同时收发的单元数不超过 max_in_flight，避免所有单元在循环边界同时向总线发送命令。
+    """
+
+    def __init__(self, serial_manager, registry, journal=None):
+        self.serial_mgr = serial_manager  # AsyncSerialManager
+        self.registry = registry
+        self.journal = journal or ResultsJournal()
+        self.pipelines = {
+            unit_id: UnitPipeline(AsyncAgingTest(serial_manager, unit_id=unit_id,
+                                                 ports=registry.unit_ports(unit_id), journal=self.journal))
+            for unit_id in registry.unit_ids()
+        }
+        self.timers = []  # 优先队列: (到期时间, 序号, 单元ID)
+        self.sequence = itertools.count()
+        self.checkpoint = None
+
+    def schedule(self, pipeline, state, when):
+        """安排单元在指定时间执行下一步"""
+        pipeline.state = state
+        pipeline.due = when
+        heapq.heappush(self.timers, (when, next(self.sequence), pipeline.test.unit_id))
+
+    async def step(self, pipeline):
+        """执行单元当前状态对应的一步串口操作，并安排下一步"""
+        loop = asyncio.get_running_loop()
+        test = pipeline.test
+        pipeline.active = True
+        try:
+            if pipeline.state == ENTER:
+                logging.info(f"{test.tag}=== 开始第 {pipeline.cycle} 次循环 ===")
+                profiling.begin_cycle(pipeline.cycle, test.unit_id)
+                pipeline.cycle_start = clock.monotonic()
+                if not test.available():
+                    # 有端口断路: 跳过本循环，不占用收发名额，按名义时长保持节奏等待后台探测
+                    test.skip_cycle(pipeline.cycle)
+                    self.complete(pipeline, False, delay=test.nominal_wait())
+                    return
+                baseline = await test.query_baseline() if POLL_CONFIG['enabled'] else None
+                if not await test.enter_aging(pipeline.cycle):
+                    self.complete(pipeline, False)
+                    return
+                wait_time = test.nominal_wait()
+                pipeline.wait_start = loop.time()
+                if baseline is not None:
+                    pipeline.poll = AgingPoll(baseline, wait_time, loop.time(), test.tag)
+                    self.schedule(pipeline, POLL, loop.time() + pipeline.poll.next_delay(loop.time()))
+                else:
+                    self.schedule(pipeline, FETCH, loop.time() + wait_time)
+
+            elif pipeline.state == POLL:
+                finished = pipeline.poll.update(await test.query_results(), loop.time())
+                if finished is None:
+                    self.schedule(pipeline, POLL, loop.time() + pipeline.poll.next_delay(loop.time()))
+                else:
+                    metrics.PHASE_SECONDS.observe(loop.time() - pipeline.wait_start, test.unit_label, 'wait')
+                    success, _ = test.finish_cycle(pipeline.cycle, finished['left'], finished['right'],
+                                                   pipeline.cycle_start)
+                    self.complete(pipeline, success)
+
+            elif pipeline.state == FETCH:
+                # 等待阶段包括调度延迟: 到期后未能立即执行的时间也是主机开销
+                metrics.PHASE_SECONDS.observe(loop.time() - pipeline.wait_start, test.unit_label, 'wait')
+                left_data, right_data = await test.fetch_results()
+                success, _ = test.finish_cycle(pipeline.cycle, left_data, right_data, pipeline.cycle_start)
+                self.complete(pipeline, success)
+
+        except Exception as e:
+            test.record_exception(pipeline.cycle, e)
+            self.complete(pipeline, False)
+        finally:
+            pipeline.active = False
+
+    def complete(self, pipeline, success, delay=0.0):
+        """单元完成一个循环: 保存进度，安排下一循环(delay + 循环间等待之后)或结束"""
+        profiling.end_cycle(pipeline.cycle, pipeline.test.unit_id)
+        if success:
+            pipeline.success_count += 1
+        pipeline.completed = pipeline.cycle
+        pipeline.poll = None
+        self.journal.flush()
+        self.save_checkpoint()
+
+        if pipeline.cycle < TEST_CONFIG['total_cycles']:
+            pipeline.cycle += 1
+            self.schedule(pipeline, ENTER, asyncio.get_running_loop().time() + delay + TEST_CONFIG['wait_time'])
+        else:
+            pipeline.state = DONE
+            pipeline.test.generate_report(pipeline.success_count)
+
+    def save_checkpoint(self):
+        """检查点记录各单元各自完成的循环数，last_cycle为所有单元都已完成的循环"""
+        if self.checkpoint is None:
+            return
+        devices = {}
+        for pipeline in self.pipelines.values():
+            devices.update(pipeline.test.device_state)
+        self.checkpoint.update(
+            min(pipeline.completed for pipeline in self.pipelines.values()),
+            {unit_key(unit_id): pipeline.success_count for unit_id, pipeline in self.pipelines.items()},
+            devices,
+            {unit_key(unit_id): pipeline.completed for unit_id, pipeline in self.pipelines.items()}
+        )
+
+    async def resume(self, checkpoint):
+        """从检查点恢复各单元的进度并同步设备状态"""
+        unit_cycles = checkpoint.unit_cycles or {}
+        for unit_id, pipeline in self.pipelines.items():
+            key = unit_key(unit_id)
+            pipeline.completed = unit_cycles.get(key, checkpoint.last_cycle)
+            pipeline.cycle = pipeline.completed + 1
+            pipeline.success_count = checkpoint.success_counts.get(key, 0)
+            logging.info(f"{pipeline.test.tag}从第 {pipeline.cycle} 次循环继续测试，已成功 {pipeline.success_count} 次")
+        await asyncio.gather(*(pipeline.test.resync(checkpoint.devices) for pipeline in self.pipelines.values()
+                               if pipeline.completed < TEST_CONFIG['total_cycles']))
+
+    async def run_complete_test(self, checkpoint=None):
+        """运行完整测试，提供检查点时每个单元完成一个循环后保存进度"""
+        total_cycles = TEST_CONFIG['total_cycles']
+        logging.info(f"开始流水线老化测试，单元数: {len(self.pipelines)}，每单元循环次数: {total_cycles}")
+
+        self.checkpoint = checkpoint
+        if checkpoint is not None:
+            if checkpoint.last_cycle or checkpoint.unit_cycles:
+                await self.resume(checkpoint)
+            else:
+                checkpoint.start('pipeline', self.journal.path, self.registry.units())
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        pending = [pipeline for pipeline in self.pipelines.values() if pipeline.cycle <= total_cycles]
+        for pipeline in self.pipelines.values():
+            if pipeline.cycle > total_cycles:
+                pipeline.state = DONE
+        for index, pipeline in enumerate(pending):
+            self.schedule(pipeline, ENTER, start + index * SCHEDULER_CONFIG['stagger'])
+
+        reporter = asyncio.create_task(self.report_progress())
+        running = set()
+        try:
+            while self.timers or running:
+                now = loop.time()
+                while self.timers and self.timers[0][0] <= now and len(running) < SCHEDULER_CONFIG['max_in_flight']:
+                    _, _, unit_id = heapq.heappop(self.timers)
+                    running.add(asyncio.create_task(self.step(self.pipelines[unit_id])))
+
+                timeout = None
+                if self.timers and len(running) < SCHEDULER_CONFIG['max_in_flight']:
+                    timeout = max(0.0, self.timers[0][0] - now)
+                if running:
+                    done, running = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+                else:
+                    await asyncio.sleep(timeout)
+        finally:
+            reporter.cancel()
+            for task in running:
+                task.cancel()
+
+        self.report()
+        logging.info(f"流水线老化测试完成，耗时 {loop.time() - start:.1f}秒")
+        if checkpoint is not None:
+            checkpoint.finish()
+
+    def progress(self):
+        """返回各单元进度 {单元ID: {...}}"""
+        now = asyncio.get_running_loop().time()
+        return {
+            unit_id: {
+                'cycle': pipeline.cycle,
+                'completed': pipeline.completed,
+                'success_count': pipeline.success_count,
+                'state': pipeline.state,
+                'active': pipeline.active,
+                'due_in': None if pipeline.state == DONE or pipeline.active else max(0.0, pipeline.due - now),
+            }
+            for unit_id, pipeline in self.pipelines.items()
+        }
+
+    async def report_progress(self):
+        """按 progress_interval 定期报告进度"""
+        while True:
+            await asyncio.sleep(SCHEDULER_CONFIG['progress_interval'])
+            self.report()
+
+    def report(self):
+        """记录整体和各单元的进度"""
+        total_cycles = TEST_CONFIG['total_cycles']
+        progress = self.progress()
+        completed = sum(item['completed'] for item in progress.values())
+        states = collections.Counter('active' if item['active'] else item['state'] for item in progress.values())
+        logging.info(f"流水线进度: {completed}/{len(progress) * total_cycles} 个循环已完成, 状态分布: {dict(states)}")
+        for unit_id, item in progress.items():
+            if item['state'] == DONE:
+                status = "已完成"
+            elif item['active']:
+                status = f"{item['state']}进行中"
+            else:
+                status = f"{item['due_in']:.0f}秒后{item['state']}"
+            logging.info(f"[{unit_id}] 循环 {item['completed']}/{total_cycles}, 成功 {item['success_count']}, {status}")
+
+    def close(self):
+        """关闭结果日志"""
+        self.journal.close()
+
+
+class PipelineScheduler:
+    """同步接口: 对AsyncPipelineScheduler的薄封装"""
+
+    def __init__(self, serial_manager, registry, journal=None):
+        self.serial_mgr = serial_manager
+        self.engine = AsyncPipelineScheduler(AsyncSerialManager(serial_manager), registry, journal=journal)
+
+    def run_complete_test(self, checkpoint=None):
+        """运行完整的流水线测试"""
+        clock.run(self.engine.run_complete_test(checkpoint))
+
+    def close(self):
+        """关闭结果日志"""
+        self.engine.close()
@@ -0,0 +1,218 @@
+"""串口自动发现: 枚举串口并并行探测，识别左右脚并配对为单元，结果缓存到 DISCOVERY_CONFIG['cache_path']
+
+用法: python port_discovery.py [--refresh] [--ports COM3 COM4 ...]
+输出与 FLEET_CONFIG['units'] 相同格式的单元列表(JSON)。
+
+识别方式: 向每个串口依次发送左脚和右脚的结果查询命令，只有一只脚的查询得到有效响应(操作码正确且响应帧第6字节的
+脚标志01左/00右与查询的脚相同)时，串口识别为该脚；两只脚都有有效响应时无法判定，不参与配对。
+协议中没有单元ID，新设备按USB位置(同一集线器)和端口名顺序将左右脚配对；配对结果写入缓存，
+如有错误可直接编辑缓存文件中的 unit_id，之后启动时只需验证缓存。
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import serial
+from serial.tools import list_ports
+from config import SERIAL_CONFIG, FLEET_CONFIG, DISCOVERY_CONFIG, COMMANDS
+from frame_decoder import FrameDecoder
+import protocol
+
+
+def port_key(info):
+    """缓存键: USB串口使用 VID:PID:序列号，其他串口使用设备名"""
+    if info.vid is not None and info.serial_number:
+        return f"{info.vid:04X}:{info.pid:04X}:{info.serial_number}"
+    return info.device
+
+
+def list_candidates(devices=None):
+    """列出待探测的串口 [{'key', 'device', 'location'}]，devices为None时枚举本机串口"""
+    infos = {info.device: info for info in list_ports.comports()}
+    if devices is None:
+        wanted = {item.upper() for item in DISCOVERY_CONFIG['vid_pid']}
+        devices = [device for device, info in infos.items()
+                   if not wanted or (info.vid is not None and f"{info.vid:04X}:{info.pid:04X}" in wanted)]
+    candidates = []
+    for device in devices:
+        info = infos.get(device)
+        candidates.append({
+            'key': port_key(info) if info else device,
+            'device': device,
+            'location': info.location if info else None,
+        })
+    return candidates
+
+
+def query_foot(ser, decoder, foot):
+    """发送一只脚的结果查询命令，期限内收到操作码正确且脚标志与查询相同的响应帧返回True"""
+    command = COMMANDS[f'get_result_{foot}']
+    expected = protocol.response_opcode(command)
+    ser.write(command)
+    deadline = time.monotonic() + DISCOVERY_CONFIG['probe_timeout']
+    while time.monotonic() < deadline:
+        for frame in decoder.feed(ser.read(ser.in_waiting or 1)):
+            try:
+                response = protocol.decode(frame)
+            except protocol.ProtocolError:
+                continue
+            if response.opcode == expected and response.foot == foot:
+                return True
+    return False
+
+
+def probe_foot(device):
+    """探测单个串口，返回 'left'/'right'，无应答、无法判定或无法打开返回None"""
+    try:
+        ser = serial.Serial(port=device, baudrate=SERIAL_CONFIG['baudrate'], timeout=0.05)
+    except Exception as e:
+        logging.debug(f"无法打开{device}: {e}")
+        return None
+    try:
+        ser.reset_input_buffer()
+        decoder = FrameDecoder()
+        for _ in range(DISCOVERY_CONFIG['probe_attempts']):
+            feet = [foot for foot in protocol.FOOT_FLAGS if query_foot(ser, decoder, foot)]
+            if len(feet) == 1:
+                return feet[0]
+            if feet:
+                logging.warning(f"{device}对左右脚的查询都有有效响应，无法判定左右脚")
+                return None
+        return None
+    except Exception as e:
+        logging.debug(f"探测{device}失败: {e}")
+        return None
+    finally:
+        ser.close()
+
+
+def probe_all(candidates):
+    """并行探测，返回 {缓存键: 脚}，无应答的串口不在结果中"""
+    if not candidates:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(FLEET_CONFIG['max_workers'], len(candidates)))) as executor:
+        feet = executor.map(probe_foot, [candidate['device'] for candidate in candidates])
+        return {candidate['key']: foot for candidate, foot in zip(candidates, feet) if foot}
+
+
+def load_cache(path=None):
+    """读取设备缓存 {缓存键: {'unit_id', 'foot', 'device'}}"""
+    path = path or DISCOVERY_CONFIG['cache_path']
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache, path=None):
+    """原子写入设备缓存"""
+    path = path or DISCOVERY_CONFIG['cache_path']
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def build_units(candidates, cache):
+    """按缓存中的unit_id组装单元列表，缺少一只脚的单元跳过"""
+    devices = {candidate['key']: candidate['device'] for candidate in candidates}
+    units = {}
+    for key, entry in cache.items():
+        if key in devices and entry['unit_id']:
+            units.setdefault(entry['unit_id'], {})[entry['foot']] = devices[key]
+    result = []
+    for unit_id in sorted(units):
+        feet = units[unit_id]
+        if 'left' in feet and 'right' in feet:
+            result.append({'unit_id': unit_id, 'left_port': feet['left'], 'right_port': feet['right']})
+        else:
+            logging.warning(f"单元{unit_id}只发现了{'/'.join(feet)}脚，已跳过")
+    return result
+
+
+def assign_units(candidates, feet, cache):
+    """为新发现的串口分配单元ID: 左右脚分别按 (USB位置, 设备名) 排序后依次配对"""
+    new = [candidate for candidate in candidates if candidate['key'] in feet and candidate['key'] not in cache]
+    order = sorted(new, key=lambda candidate: (candidate['location'] or '', candidate['device']))
+    lefts = [candidate for candidate in order if feet[candidate['key']] == 'left']
+    rights = [candidate for candidate in order if feet[candidate['key']] == 'right']
+    if len(lefts) != len(rights):
+        logging.warning(f"新发现左脚{len(lefts)}个、右脚{len(rights)}个，多出的串口不参与配对")
+
+    used = {entry['unit_id'] for entry in cache.values() if entry['unit_id']}
+    index = 0
+    for left, right in zip(lefts, rights):
+        index += 1
+        while f"{DISCOVERY_CONFIG['unit_prefix']}{index:03d}" in used:
+            index += 1
+        unit_id = f"{DISCOVERY_CONFIG['unit_prefix']}{index:03d}"
+        for candidate in (left, right):
+            cache[candidate['key']] = {'unit_id': unit_id, 'foot': feet[candidate['key']],
+                                       'device': candidate['device']}
+        logging.info(f"新单元{unit_id}: 左脚={left['device']}, 右脚={right['device']}")
+
+
+def verify_cache(candidates, cache):
+    """所有串口都在缓存中时只探测缓存中的设备并核对左右脚，核对通过返回True
+
+    缓存中记为无设备的串口（上次无应答）不再探测，新接入的设备需要 --refresh 或出现新串口时才会被发现。
+    """
+    if not candidates or any(candidate['key'] not in cache for candidate in candidates):
+        return False
+    known = [candidate for candidate in candidates if cache[candidate['key']]['foot']]
+    feet = probe_all(known)
+    mismatched = [candidate['device'] for candidate in known
+                  if feet.get(candidate['key']) != cache[candidate['key']]['foot']]
+    if mismatched:
+        logging.warning(f"设备缓存与探测结果不一致: {', '.join(mismatched)}，重新发现")
+        return False
+    return True
+
+
+def discover_units(devices=None, cache_path=None, refresh=False):
+    """发现并返回与 FLEET_CONFIG['units'] 相同格式的单元列表，优先使用并验证缓存"""
+    start = time.monotonic()
+    candidates = list_candidates(devices)
+    cache = {} if refresh else load_cache(cache_path)
+
+    if verify_cache(candidates, cache):
+        units = build_units(candidates, cache)
+        logging.info(f"设备缓存验证通过: {len(units)} 个单元，耗时 {time.monotonic() - start:.2f}秒")
+        return units
+
+    feet = probe_all(candidates)
+    # 探测结果与缓存不一致的串口（例如左右脚适配器互换）视为新设备重新配对
+    for key in [key for key, entry in cache.items() if key in feet and feet[key] != entry['foot']]:
+        del cache[key]
+    assign_units(candidates, feet, cache)
+    for candidate in candidates:
+        if candidate['key'] in cache:
+            cache[candidate['key']]['device'] = candidate['device']
+        elif candidate['key'] not in feet:
+            # 无应答的串口记为无设备，下次启动时不再探测
+            cache[candidate['key']] = {'unit_id': None, 'foot': None, 'device': candidate['device']}
+    save_cache(cache, cache_path)
+
+    units = build_units([candidate for candidate in candidates if candidate['key'] in feet], cache)
+    logging.info(f"串口发现完成: 探测 {len(candidates)} 个串口，{len(feet)} 个应答，{len(units)} 个单元，"
+                 f"耗时 {time.monotonic() - start:.2f}秒")
+    return units
+
+
+def main():
+    parser = argparse.ArgumentParser(description="串口自动发现")
+    parser.add_argument('--ports', nargs='+', help="只探测指定串口(默认枚举本机所有串口)")
+    parser.add_argument('--cache', default=DISCOVERY_CONFIG['cache_path'], help="设备缓存文件")
+    parser.add_argument('--refresh', action='store_true', help="忽略缓存重新探测")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    units = discover_units(args.ports, cache_path=args.cache, refresh=args.refresh)
+    print(json.dumps(units, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
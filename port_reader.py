@@ -0,0 +1,147 @@
+import collections
+import logging
+import threading
+from config import READER_CONFIG
+from frame_decoder import FrameDecoder
+from traffic_capture import RX
+import clock
+
+
+class PortReader(threading.Thread):
+    """后台读取线程: 持续读取串口数据，解码后存入有界环形缓冲区"""
+
+    def __init__(self, port, ser, capture=None, telemetry=None):
+        super().__init__(name=f"reader-{port}", daemon=True)
+        self.port = port
+        self.ser = ser
+        self.capture = capture  # 可选的TrafficCapture
+        self.telemetry = telemetry  # 可选的TelemetryHub，接收主动上报帧
+        self.decoder = FrameDecoder()
+        self.frames = collections.deque(maxlen=READER_CONFIG['max_frames'])  # (序号, 到达时间, 帧)
+        self.raw = bytearray()  # 最近收到的原始字节
+        self.frame_seq = 0  # 最新一帧的序号
+        self.bytes_received = 0  # 累计收到的字节数
+        self.error = None  # 读取线程退出时的异常
+        self.listeners = []  # 收到新帧或线程退出时调用的回调
+        self.condition = threading.Condition()
+        self.stopped = threading.Event()
+
+    def start(self):
+        """启动读取线程；脚本串口(device_simulator.ScriptedSerial)直接推送数据，不需要线程"""
+        attach = getattr(self.ser, 'attach_reader', None)
+        if attach is not None:
+            attach(self.on_data)
+            return
+        super().start()
+
+    def run(self):
+        """读取循环: 有数据就读，不做固定延时"""
+        while not self.stopped.is_set():
+            try:
+                data = self.ser.read(self.ser.in_waiting or 1)
+            except Exception as e:
+                if not self.stopped.is_set():
+                    logging.error(f"{self.port}脚读取线程异常: {e}", extra={'port': self.port})
+                    self.error = e
+                break
+            if data:
+                self.on_data(data)
+
+        with self.condition:
+            self.condition.notify_all()
+        self.notify_listeners()
+
+    def on_data(self, data):
+        """处理收到的数据块"""
+        if self.capture:
+            self.capture.record(self.port, RX, data)
+        # 每个数据块都经过这里: 十六进制转换只在开启DEBUG时进行
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug(f"{self.port}脚原始响应: {data.hex().upper()}", extra={'port': self.port})
+        frames = self.decoder.feed(data)
+        now = clock.monotonic()
+
+        with self.condition:
+            self.bytes_received += len(data)
+            self.raw += data
+            overflow = len(self.raw) - READER_CONFIG['max_raw_bytes']
+            if overflow > 0:
+                del self.raw[:overflow]
+            for frame in frames:
+                self.frame_seq += 1
+                self.frames.append((self.frame_seq, now, frame))
+            if frames:
+                self.condition.notify_all()
+        if frames:
+            if self.telemetry:
+                self.telemetry.publish(self.port, frames)
+            self.notify_listeners()
+
+    def add_listener(self, callback):
+        """注册回调，在读取线程中收到新帧时调用"""
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """注销回调"""
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def notify_listeners(self):
+        """通知所有回调"""
+        for callback in list(self.listeners):
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"{self.port}脚帧回调异常: {e}", extra={'port': self.port})
+
+    def mark(self):
+        """返回当前位置 (帧序号, 字节数)，用于只等待此后到达的数据"""
+        with self.condition:
+            return self.frame_seq, self.bytes_received
+
+    def frames_after(self, seq):
+        """返回序号大于seq的所有缓冲帧"""
+        with self.condition:
+            return [(s, frame) for s, _, frame in self.frames if s > seq]
+
+    def find_frame(self, after=0, predicate=None):
+        """不等待: 返回已缓冲的序号大于after且满足predicate的第一帧，没有则返回None"""
+        with self.condition:
+            for seq, _, frame in self.frames:
+                if seq > after and (predicate is None or predicate(frame)):
+                    return seq, frame
+            return None
+
+    @property
+    def alive(self):
+        """读取线程是否仍在工作"""
+        return not self.stopped.is_set() and self.error is None
+
+    def wait_for_frame(self, after=0, predicate=None, timeout=None):
+        """等待序号大于after且满足predicate的下一帧，返回 (序号, 帧)，超时返回None"""
+        deadline = None if timeout is None else clock.monotonic() + timeout
+        with self.condition:
+            while True:
+                result = self.find_frame(after, predicate)
+                if result is not None:
+                    return result
+                if not self.alive:
+                    return None
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - clock.monotonic()
+                    if remaining <= 0:
+                        return None
+                clock.get_clock().wait(self.condition, remaining)
+
+    def stop(self):
+        """停止读取线程"""
+        self.stopped.set()
+        if hasattr(self.ser, 'cancel_read'):
+            try:
+                self.ser.cancel_read()
+            except Exception:
+                pass
+        with self.condition:
+            self.condition.notify_all()
+        self.notify_listeners()
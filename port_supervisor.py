@@ -0,0 +1,106 @@
+import logging
+import threading
+from serial.tools import list_ports
+from config import SUPERVISOR_CONFIG
+import metrics
+
+
+def usb_serial_number(device):
+    """返回串口设备对应USB适配器的序列号，非USB串口或找不到时返回None"""
+    for info in list_ports.comports():
+        if info.device == device:
+            return info.serial_number
+    return None
+
+
+def find_device(serial_number):
+    """按USB序列号查找当前的串口设备名（适配器重新枚举后COM号可能变化）"""
+    if not serial_number:
+        return None
+    for info in list_ports.comports():
+        if info.serial_number == serial_number:
+            return info.device
+    return None
+
+
+class PortSupervisor(threading.Thread):
+    """连接监控线程: 发现读取线程退出的串口后按退避间隔重新打开，恢复后重发未完成的命令"""
+
+    def __init__(self, serial_manager):
+        super().__init__(name='port-supervisor', daemon=True)
+        self.serial_mgr = serial_manager
+        self.usb_ids = {}  # 端口键 -> USB序列号
+        self.reconnecting = set()  # 正在重连的端口键
+        self.condition = threading.Condition()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+
+    def register(self, port):
+        """记录端口当前设备的USB序列号，用于重连时定位"""
+        serial_number = usb_serial_number(self.serial_mgr.port_map[port])
+        if serial_number:
+            self.usb_ids[port] = serial_number
+
+    def wake(self):
+        """立即检查一次（例如写入失败时）"""
+        self.wakeup.set()
+
+    def run(self):
+        """定期检查所有读取线程"""
+        while not self.stopped.is_set():
+            self.wakeup.wait(SUPERVISOR_CONFIG['check_interval'])
+            self.wakeup.clear()
+            if self.stopped.is_set():
+                break
+            for port, reader in list(self.serial_mgr.readers.items()):
+                if reader.alive:
+                    continue
+                with self.condition:
+                    if port in self.reconnecting:
+                        continue
+                    self.reconnecting.add(port)
+                threading.Thread(target=self.reconnect, args=(port,), name=f"reconnect-{port}", daemon=True).start()
+
+    def reconnect(self, port):
+        """按退避间隔重新打开串口，直到成功或监控停止"""
+        logging.warning(f"{port}脚连接断开，开始重连", extra={'port': port})
+        metrics.DISCONNECTS.inc(port)
+        delay = SUPERVISOR_CONFIG['initial_backoff']
+        attempt = 0
+        try:
+            while not self.stopped.is_set():
+                attempt += 1
+                device = find_device(self.usb_ids.get(port)) or self.serial_mgr.port_map[port]
+                try:
+                    ser = self.serial_mgr.open_port(device)
+                except Exception as e:
+                    logging.info(f"{port}脚第{attempt}次重连失败({device}): {e}，{delay:.1f}秒后重试",
+                                 extra={'port': port})
+                    self.stopped.wait(delay)
+                    delay = min(delay * 2, SUPERVISOR_CONFIG['max_backoff'])
+                    continue
+
+                self.serial_mgr.replace_port(port, ser, device)
+                logging.info(f"{port}脚已重连: {device}，第{attempt}次尝试", extra={'port': port})
+                metrics.RECONNECTS.inc(port)
+                return
+        finally:
+            with self.condition:
+                self.reconnecting.discard(port)
+                self.condition.notify_all()
+
+    def wait_reconnected(self, port, old_reader, timeout):
+        """等待端口完成重连（读取线程已替换且未完成的命令已重发），超时返回False"""
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: self.stopped.is_set() or (self.serial_mgr.readers.get(port) is not old_reader
+                                                   and port not in self.reconnecting),
+                timeout
+            ) and not self.stopped.is_set()
+
+    def stop(self):
+        """停止监控"""
+        self.stopped.set()
+        self.wakeup.set()
+        with self.condition:
+            self.condition.notify_all()
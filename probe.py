@@ -0,0 +1,154 @@
+"""冒烟探测: 上机前并行检查所有单元的左右脚串口，打印每个单元的通过/失败表
+
+用法: python probe.py [--units units.json | --discover] [--command get_result|enter_aging] [--timeout 1.0]
+      python main.py [同上]
+单元列表默认取 FLEET_CONFIG['units']，也可使用 port_discovery.py 或 device_simulator.py 输出的JSON。
+所有串口同时打开和发送，每只脚收到期望的响应帧(操作码和脚标志都正确)即结束，否则到期判定失败。
+默认发送结果查询命令，不改变设备状态。全部通过时退出码为0，否则为1。
+为了启动快，pyserial和协议模块在开始探测时才导入。
+"""
+import argparse
+import json
+import sys
+import time
+import unicodedata
+from config import FLEET_CONFIG, SERIAL_CONFIG, PROBE_CONFIG
+
+FEET = ('left', 'right')
+
+
+def probe_port(device, foot, command, expected, timeout, attempts):
+    """打开串口并发送命令，等待期望操作码且脚标志正确的响应帧，返回 (是否通过, 耗时秒, 说明)"""
+    import serial
+    import protocol
+    from frame_decoder import FrameDecoder
+
+    start = time.monotonic()
+    deadline = start + timeout
+    try:
+        ser = serial.Serial(port=device, baudrate=SERIAL_CONFIG['baudrate'], timeout=0)
+    except Exception as e:
+        return False, time.monotonic() - start, f"无法打开: {e}"
+    try:
+        ser.reset_input_buffer()
+        decoder = FrameDecoder()
+        received = 0
+        next_send = start
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if now >= next_send:
+                # 无响应时在期限内均匀重发
+                ser.write(command)
+                next_send = now + timeout / attempts
+            ser.timeout = min(deadline, next_send) - now
+            data = ser.read(ser.in_waiting or 1)
+            received += len(data)
+            for frame in decoder.feed(data):
+                try:
+                    response = protocol.decode(frame)
+                except protocol.ProtocolError:
+                    continue
+                if response.opcode != expected:
+                    continue
+                if response.foot != foot:
+                    return False, time.monotonic() - start, f"脚标志为{response.foot}，左右脚可能接反"
+                return True, time.monotonic() - start, ""
+        if received:
+            return False, time.monotonic() - start, f"收到{received}字节但没有期望的响应帧"
+        return False, time.monotonic() - start, "无响应"
+    except Exception as e:
+        return False, time.monotonic() - start, f"通信错误: {e}"
+    finally:
+        ser.close()
+
+
+def probe_units(units, command_name=None, timeout=None, attempts=None):
+    """并行探测所有单元，返回 {单元ID: {脚: (是否通过, 耗时秒, 说明)}}"""
+    from concurrent.futures import ThreadPoolExecutor
+    from config import COMMANDS
+    import protocol
+
+    command_name = command_name or PROBE_CONFIG['command']
+    timeout = timeout or PROBE_CONFIG['timeout']
+    attempts = attempts or PROBE_CONFIG['attempts']
+    jobs = []
+    for unit in units:
+        for foot in FEET:
+            command = COMMANDS[f"{command_name}_{foot}"]
+            jobs.append((unit['unit_id'], foot, unit[f"{foot}_port"], command, protocol.response_opcode(command)))
+    if not jobs:
+        return {}
+
+    # 每个串口一个线程: 打开、等待都是阻塞调用，同时进行才能在一个期限内完成
+    with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix='probe') as executor:
+        futures = [executor.submit(probe_port, device, foot, command, expected, timeout, attempts)
+                   for _, foot, device, command, expected in jobs]
+        results = {}
+        for (unit_id, foot, *_), future in zip(jobs, futures):
+            results.setdefault(unit_id, {})[foot] = future.result()
+    return results
+
+
+def _ljust(text, width):
+    """按显示宽度左对齐（中文字符占两列）"""
+    return text + ' ' * (width - sum(2 if unicodedata.east_asian_width(char) in 'WF' else 1 for char in text))
+
+
+def format_table(units, results):
+    """生成通过/失败表和失败原因（文本行列表）"""
+    width = max([len('单元') * 2] + [len(unit['unit_id']) for unit in units]) + 2
+    lines = [_ljust('单元', width) + _ljust('左脚', 12) + _ljust('右脚', 12) + '结果']
+    failures = []
+    for unit in units:
+        unit_id = unit['unit_id']
+        cells = []
+        for foot in FEET:
+            ok, elapsed, reason = results[unit_id][foot]
+            cells.append(f"{'OK' if ok else 'FAIL':<4} {elapsed * 1000:>4.0f}ms")
+            if not ok:
+                failures.append(f"  {unit_id} {'左脚' if foot == 'left' else '右脚'}({unit[f'{foot}_port']}): {reason}")
+        passed = all(results[unit_id][foot][0] for foot in FEET)
+        lines.append(_ljust(unit_id, width) + ''.join(f"{cell:<12}" for cell in cells) + ('通过' if passed else '失败'))
+    if failures:
+        lines.append("失败原因:")
+        lines.extend(failures)
+    return lines
+
+
+def load_units(args):
+    """按命令行参数取得单元列表"""
+    if args.units:
+        if args.units == '-':
+            return json.load(sys.stdin)
+        with open(args.units, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    if args.discover:
+        from port_discovery import discover_units
+        return discover_units()
+    return FLEET_CONFIG['units']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上机前冒烟探测: 并行检查所有单元的串口")
+    parser.add_argument('--units', metavar='FILE',
+                        help="单元列表JSON文件(与FLEET_CONFIG['units']格式相同)，- 表示从标准输入读取")
+    parser.add_argument('--discover', action='store_true', help="使用串口自动发现的结果(按DISCOVERY_CONFIG)")
+    parser.add_argument('--command', choices=['get_result', 'enter_aging'], default=PROBE_CONFIG['command'],
+                        help="探测命令，enter_aging 会让设备进入老化")
+    parser.add_argument('--timeout', type=float, default=PROBE_CONFIG['timeout'], help="每只脚的探测期限(秒)")
+    args = parser.parse_args()
+
+    units = load_units(args)
+    start = time.monotonic()
+    results = probe_units(units, args.command, args.timeout)
+    for line in format_table(units, results):
+        print(line)
+    passed = sum(all(results[unit['unit_id']][foot][0] for foot in FEET) for unit in units)
+    print(f"{passed}/{len(units)} 个单元通过，耗时 {time.monotonic() - start:.2f}秒")
+    sys.exit(0 if passed == len(units) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""性能分析: cProfile开关，以及运行结束时主机开销相对名义时长的报告（按阶段和端口分解）
+
+用法: python main_controller.py --profile cycle  # 分析 PROFILE_CONFIG['cycle'] 指定的循环
+      python main_controller.py --profile run    # 分析整个测试
+各阶段耗时始终通过 metrics.PHASE_SECONDS / PORT_PHASE_SECONDS 记录，报告不需要开启性能分析。
+cProfile只统计调用它的线程（事件循环线程），串口读取线程和线程池中的写操作不在统计结果中。
+"""
+import contextlib
+import cProfile
+import io
+import logging
+import pstats
+import unicodedata
+from config import TEST_CONFIG, PROFILE_CONFIG
+import metrics
+
+UNIT_PHASES = ('send', 'read', 'verify', 'retry', 'wait', 'fetch', 'parse', 'log')
+PORT_PHASES = ('send', 'read', 'verify', 'parse')
+
+_mode = None  # None、'cycle' 或 'run'
+_profiler = None
+_owner = None  # 正在分析的循环所属的单元
+_cycle_done = False
+
+
+def enable(mode):
+    """开启性能分析: 'cycle' 分析一个循环，'run' 分析整个测试"""
+    global _mode
+    _mode = mode
+
+
+def _start():
+    global _profiler
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+
+
+def _stop(label):
+    """停止分析，保存统计文件并把耗时最多的函数写入日志"""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    profiler.disable()
+    profiler.dump_stats(PROFILE_CONFIG['output'])
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(PROFILE_CONFIG['top'])
+    logging.info(f"{label}的性能分析已保存到 {PROFILE_CONFIG['output']}\n{stream.getvalue()}")
+
+
+def begin_cycle(cycle_num, owner=None):
+    """--profile cycle 时开始分析指定循环
+
+    车队模式下多个单元同时执行同一循环，只由最先进入的单元开始和结束（同一时刻只能有一个cProfile），
+    统计结果包含这段时间内事件循环中所有单元的操作。
+    """
+    global _owner
+    if _mode != 'cycle' or _cycle_done or _profiler is not None or cycle_num != PROFILE_CONFIG['cycle']:
+        return
+    _owner = owner
+    _start()
+
+
+def end_cycle(cycle_num, owner=None):
+    """结束由同一单元开始的循环分析"""
+    global _owner, _cycle_done
+    if _mode != 'cycle' or _profiler is None or _owner != owner:
+        return
+    _owner = None
+    _cycle_done = True
+    _stop(f"{f'[{owner}] ' if owner else ''}第{cycle_num}次循环")
+
+
+@contextlib.contextmanager
+def profile_cycle(cycle_num, owner=None):
+    """在with块中分析一个循环"""
+    begin_cycle(cycle_num, owner)
+    try:
+        yield
+    finally:
+        end_cycle(cycle_num, owner)
+
+
+@contextlib.contextmanager
+def profile_run():
+    """--profile run 时分析with块（整个测试）"""
+    if _mode != 'run':
+        yield
+        return
+    _start()
+    try:
+        yield
+    finally:
+        _stop("整个测试")
+
+
+def _pad(text, width, left=False):
+    """按显示宽度对齐（中文字符占两列）"""
+    text = str(text)
+    fill = width - sum(2 if unicodedata.east_asian_width(char) in 'WF' else 1 for char in text)
+    return text + ' ' * fill if left else ' ' * fill + text
+
+
+def nominal_seconds(cycles, aged=None):
+    """按配置计算一个单元运行cycles个循环的名义时长: aged个循环(默认全部)的老化时长加循环间等待
+
+    进入老化失败或异常的循环没有老化等待，不计老化时长；循环间等待在除最后一个以外的每个循环后都会执行。
+    """
+    aging = TEST_CONFIG['aging_duration'] * TEST_CONFIG['aging_per_cycle']
+    if aged is None:
+        aged = cycles
+    return aged * aging + max(cycles - 1, 0) * TEST_CONFIG['wait_time']
+
+
+def overhead_report(wall_seconds):
+    """根据本进程记录的阶段耗时生成开销报告（文本行列表）
+
+    主机开销 = 实际耗时 - 名义时长（按名义时长最长的单元）。send/read/verify/retry/fetch/parse/log 全部计入开销，
+    wait 只有超出名义老化时长的部分计入；各单元并发执行，阶段耗时按单元平均。
+    名义老化时长只计入实际进入老化等待的循环(wait阶段)和因断路跳过、按名义时长等待的循环。
+    """
+    unit_cycles = {}
+    unit_aged = {}
+    for (unit, result), value in metrics.CYCLES.totals().items():
+        unit_cycles[unit] = unit_cycles.get(unit, 0) + value
+        if result == 'skipped':
+            unit_aged[unit] = unit_aged.get(unit, 0) + value
+    if not unit_cycles:
+        return ["本次运行没有完成的循环"]
+
+    aging = TEST_CONFIG['aging_duration'] * TEST_CONFIG['aging_per_cycle']
+    phases = metrics.PHASE_SECONDS.totals()
+    for (unit, phase), (_, count) in phases.items():
+        if phase == 'wait':
+            unit_aged[unit] = unit_aged.get(unit, 0) + count
+    units = len(unit_cycles)
+    nominal, unit = max((nominal_seconds(cycles, unit_aged.get(unit, 0)), unit)
+                        for unit, cycles in unit_cycles.items())
+    cycles = unit_cycles[unit]
+    overhead = wall_seconds - nominal
+
+    lines = [
+        "=== 主机开销分析 ===",
+        f"实际耗时: {wall_seconds:.1f}秒, 名义时长: {nominal:.1f}秒 ({cycles} 个循环，"
+        f"其中 {unit_aged.get(unit, 0)} 个经过老化等待), "
+        f"主机开销: {overhead:.1f}秒 ({overhead / nominal * 100 if nominal else 0:.1f}%)",
+        f"各阶段耗时 (按 {units} 个单元平均):",
+        f"  {_pad('阶段', 8, left=True)}{_pad('合计(秒)', 12)}{_pad('每循环(毫秒)', 14)}{_pad('计入开销(秒)', 14)}",
+    ]
+    attributed = 0.0
+    for phase in UNIT_PHASES:
+        total = sum(value for (_, name), (value, _) in phases.items() if name == phase) / units
+        count = sum(count for (_, name), (_, count) in phases.items() if name == phase) / units
+        cost = total - count * aging if phase == 'wait' else total
+        attributed += cost
+        lines.append(f"  {phase:<8}{total:>12.2f}{total / cycles * 1000:>14.1f}{cost:>14.2f}")
+    lines.append(f"  {_pad('其他', 34, left=True)}{overhead - attributed:>14.2f}  (调度、错开启动、循环间等待误差等)")
+
+    ports = {}
+    for (port, phase), (value, _) in metrics.PORT_PHASE_SECONDS.totals().items():
+        ports.setdefault(port, {})[phase] = value
+    if ports:
+        ranked = sorted(ports.items(), key=lambda item: -sum(item[1].values()))
+        lines.append("各端口耗时(秒):")
+        lines.append(f"  {_pad('端口', 16, left=True)}" + "".join(f"{phase:>10}" for phase in PORT_PHASES))
+        for port, values in ranked[:PROFILE_CONFIG['top_ports']]:
+            lines.append(f"  {port:<16}" + "".join(f"{values.get(phase, 0):>10.2f}" for phase in PORT_PHASES))
+        if len(ranked) > PROFILE_CONFIG['top_ports']:
+            lines.append(f"  ... 其余 {len(ranked) - PROFILE_CONFIG['top_ports']} 个端口")
+    return lines
+
+
+def log_overhead_report(wall_seconds):
+    """将开销报告写入日志"""
+    for line in overhead_report(wall_seconds):
+        logging.info(line)
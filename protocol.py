@@ -0,0 +1,156 @@
+"""老化测试协议编解码: 基于struct直接在bytes/memoryview上解析，不做十六进制字符串转换
+
+命令帧: 55 AA FF <长度> <操作码> <脚标志>
+响应帧: 55 BB FF <长度> <操作码> <脚标志> <状态> [<数据>]
+长度字节为其后的字节数。协议没有校验和字段，只能通过帧头和长度校验帧的完整性。
+"""
+import struct
+from operator import itemgetter
+from config import COMMANDS
+from frame_decoder import FRAME_HEADER as RESPONSE_HEADER
+
+COMMAND_HEADER = b'\x55\xAA\xFF'
+
+FOOT_FLAGS = {'left': 0x01, 'right': 0x00}  # 命令和响应中的左右脚标志
+FOOT_BY_FLAG = {flag: foot for foot, flag in FOOT_FLAGS.items()}
+
+OP_ENTER_AGING = 0x09
+OP_ENTER_AGING_ACK = 0x04
+OP_GET_RESULT = 0x41
+RESPONSE_OPCODES = {OP_ENTER_AGING: OP_ENTER_AGING_ACK, OP_GET_RESULT: OP_GET_RESULT}  # 命令 -> 响应操作码
+
+COMMAND = struct.Struct('>3sBBB')  # 帧头, 长度, 操作码, 脚标志
+SHORT_FRAME = struct.Struct('>3sBBBB')  # 帧头, 长度, 操作码, 脚标志, 状态
+LONG_FRAME = struct.Struct('>3sBBBBHH')  # 另加两个16位数据，结果响应中为总次数和通过次数
+RESULT_COUNTS = struct.Struct('>HH')
+LENGTH_OFFSET = len(COMMAND_HEADER) + 1  # 长度字节之后的偏移
+
+
+class ProtocolError(ValueError):
+    """帧格式错误"""
+
+
+class ResponseFrame(tuple):
+    """响应帧: 由struct解包结果直接构造的只读元组，按字段名访问
+
+    继承tuple并设置空__slots__，构造只有一次C层调用，不创建实例字典。
+    """
+    __slots__ = ()
+
+    header = property(itemgetter(0))
+    length = property(itemgetter(1))
+    opcode = property(itemgetter(2))
+    flag = property(itemgetter(3))
+    status = property(itemgetter(4))
+
+    @property
+    def foot(self):
+        """'left'/'right'，未知标志时为原始数值"""
+        return FOOT_BY_FLAG.get(self[3], self[3])
+
+    def __repr__(self):
+        return f"{type(self).__name__}(opcode=0x{self[2]:02X}, foot={self.foot}, status={self[4]})"
+
+
+class EnterAgingAck(ResponseFrame):
+    """进入老化应答，7字节短应答没有附加数据"""
+    __slots__ = ()
+
+    @property
+    def detail(self):
+        return (self[5] << 16) | self[6] if len(self) > 5 else None
+
+
+class AgingResult(ResponseFrame):
+    """老化结果"""
+    __slots__ = ()
+
+    total_count = property(itemgetter(5))
+    pass_count = property(itemgetter(6))
+
+    def __repr__(self):
+        return f"AgingResult(foot={self.foot}, status={self[4]}, total={self[5]}, pass={self[6]})"
+
+
+class Command:
+    """预编译的命令"""
+    __slots__ = ('name', 'data', 'opcode', 'foot', 'response_opcode')
+
+    def __init__(self, name, data):
+        header, length, opcode, flag = decode_command(data)
+        self.name = name
+        self.data = bytes(data)
+        self.opcode = opcode
+        self.foot = FOOT_BY_FLAG.get(flag, flag)
+        self.response_opcode = RESPONSE_OPCODES.get(opcode)
+
+    def __repr__(self):
+        return f"Command({self.name}, opcode=0x{self.opcode:02X}, foot={self.foot})"
+
+
+def decode_command(data):
+    """校验并解析命令帧，返回 (帧头, 长度, 操作码, 脚标志)"""
+    view = memoryview(data)
+    if len(view) < COMMAND.size:
+        raise ProtocolError(f"命令长度不足: {len(view)}字节")
+    fields = COMMAND.unpack_from(view)
+    if fields[0] != COMMAND_HEADER:
+        raise ProtocolError("命令帧头错误")
+    if len(view) != LENGTH_OFFSET + fields[1]:
+        raise ProtocolError(f"命令长度字节({fields[1]})与实际长度({len(view)}字节)不符")
+    return fields
+
+
+def response_opcode(command):
+    """命令对应的响应操作码: 配置的命令直接查预编译的COMMAND_TABLE；其他命令现场解析，未知命令或格式错误返回None"""
+    entry = COMMAND_TABLE.get(command if isinstance(command, bytes) else bytes(command))
+    if entry is not None:
+        return entry.response_opcode
+    try:
+        return RESPONSE_OPCODES.get(decode_command(command)[2])
+    except ProtocolError:
+        return None
+
+
+def build_command_table(commands=None):
+    """由COMMANDS生成 {命令字节: Command}，格式错误的命令在启动时即报错"""
+    return {bytes(data): Command(name, data) for name, data in (COMMANDS if commands is None else commands).items()}
+
+
+_UNPACK = {SHORT_FRAME.size: SHORT_FRAME.unpack, LONG_FRAME.size: LONG_FRAME.unpack}
+_FRAME_TYPES = {OP_ENTER_AGING_ACK: EnterAgingAck, OP_GET_RESULT: AgingResult}
+FRAME_OPCODES = {frame_type: opcode for opcode, frame_type in _FRAME_TYPES.items()}  # 响应类型 -> 操作码
+_new_frame = tuple.__new__
+
+
+def decode(data):
+    """解析一个完整响应帧（bytes/bytearray/memoryview），返回ResponseFrame子类实例，格式错误抛出ProtocolError"""
+    unpack = _UNPACK.get(len(data))
+    if unpack is None:
+        raise ProtocolError(f"响应长度错误: {len(data)}字节")
+    fields = unpack(data)
+    if fields[0] != RESPONSE_HEADER:
+        raise ProtocolError("响应帧头错误")
+    if fields[1] != len(data) - LENGTH_OFFSET:
+        raise ProtocolError(f"长度字节({fields[1]})与实际长度({len(data)}字节)不符")
+    if fields[2] == OP_GET_RESULT and len(data) != LONG_FRAME.size:
+        raise ProtocolError(f"结果响应长度错误: {len(data)}字节")
+    return _new_frame(_FRAME_TYPES.get(fields[2], ResponseFrame), fields)
+
+
+def decode_from(data, offset=0):
+    """解析从offset开始的响应帧，按长度字节截取（不复制数据），忽略其后的数据"""
+    if len(data) < offset + LENGTH_OFFSET:
+        raise ProtocolError(f"响应长度不足: {len(data) - offset}字节")
+    end = offset + LENGTH_OFFSET + data[offset + LENGTH_OFFSET - 1]
+    if len(data) < end:
+        raise ProtocolError(f"响应不完整: 需要{end - offset}字节，实际{len(data) - offset}字节")
+    return decode(memoryview(data)[offset:end])
+
+
+def find_header(data):
+    """返回响应帧头在数据中的位置，没有则返回-1"""
+    return data.find(RESPONSE_HEADER)
+
+
+COMMAND_TABLE = build_command_table()
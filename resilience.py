@@ -0,0 +1,76 @@
+import logging
+import random
+from config import RESILIENCE_CONFIG
+import metrics
+
+CLOSED = 'closed'  # 正常收发
+OPEN = 'open'  # 断路: 暂停收发，后台探测
+HALF_OPEN = 'half_open'  # 探测已恢复，下一次收发为试运行
+
+_rng = random.Random()
+
+
+def seed(value):
+    """固定重试抖动的随机种子（时间压缩模式下保证结果可重复）"""
+    _rng.seed(value)
+
+
+def attempts():
+    """每条命令最多发送的次数"""
+    return RESILIENCE_CONFIG['attempts'] if RESILIENCE_CONFIG['enabled'] else 1
+
+
+def backoff_delay(retry):
+    """第retry次重发前的等待(秒): 指数退避，随机缩短最多jitter比例"""
+    delay = min(RESILIENCE_CONFIG['backoff'] * 2 ** (retry - 1), RESILIENCE_CONFIG['max_backoff'])
+    return delay * (1 - RESILIENCE_CONFIG['jitter'] * _rng.random())
+
+
+class CircuitBreaker:
+    """单个端口的断路器
+
+    连续 failure_threshold 次命令失败后断路(open)，所属单元暂停收发并由后台探测；探测收到有效帧后半开(half_open)，
+    下一次命令成功即恢复(closed)，失败则立即重新断路。状态变化只记录一次日志，断路期间不重复报错。
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self.state = CLOSED
+        self.failures = 0  # 连续失败次数
+        self.probe_task = None  # 断路期间的后台探测任务
+
+    @property
+    def available(self):
+        """是否允许收发"""
+        return self.state != OPEN
+
+    def record(self, ok):
+        """记录一次命令结果，返回是否因此断路"""
+        if not RESILIENCE_CONFIG['enabled']:
+            return False
+        if ok:
+            if self.state == HALF_OPEN:
+                logging.info(f"{self.port}脚试运行成功，断路器关闭", extra={'port': self.port})
+            self.state = CLOSED
+            self.failures = 0
+            return False
+
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= RESILIENCE_CONFIG['failure_threshold']:
+            self.trip()
+            return True
+        return False
+
+    def trip(self):
+        """断路"""
+        self.state = OPEN
+        metrics.BREAKER_TRIPS.inc(self.port)
+        metrics.BREAKER_OPEN.set(1, self.port)
+        logging.warning(f"{self.port}脚连续{self.failures}次无有效响应，断路: 所属单元暂停收发，后台探测恢复",
+                        extra={'port': self.port})
+
+    def recovered(self):
+        """后台探测收到有效帧: 半开，下一次命令为试运行"""
+        self.state = HALF_OPEN
+        metrics.BREAKER_OPEN.set(0, self.port)
+        logging.info(f"{self.port}脚探测已恢复，下一循环试运行", extra={'port': self.port})
@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+import threading
+from config import JOURNAL_CONFIG
+import clock
+
+
+class ResultsJournal:
+    """追加写入的结果日志(JSON Lines): 批量写入并fsync，内存占用与循环次数无关"""
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(JOURNAL_CONFIG['dir'], exist_ok=True)
+            path = os.path.join(JOURNAL_CONFIG['dir'], f"aging_results_{clock.strftime('%Y%m%d_%H%M%S')}.jsonl")
+        self.path = path
+        self.pending = []  # 尚未写入磁盘的记录
+        self.lock = threading.Lock()
+        # 断点续测时沿用的原日志中已有的 (单元, 循环)
+        # 日志按批写入，中断时一个循环可能只有部分单元已写入；续测从所有单元都已记录的循环之后开始，
+        # 已写入的单元会重跑该循环，其结果不再重复写入
+        self.recorded = set()
+        if os.path.exists(path):
+            self.recorded = {(record.get('unit'), record.get('cycle')) for record in iter_records(path)}
+        self.file = open(path, 'a', encoding='utf-8')
+        logging.info(f"结果日志: {path}")
+
+    def append(self, record):
+        """追加一条记录，缓冲区满时写入磁盘；原日志中已有的 (单元, 循环) 不再写入"""
+        if (record.get('unit'), record.get('cycle')) in self.recorded:
+            logging.info(f"结果日志中已有单元 {record.get('unit')} 第 {record.get('cycle')} 次循环的记录，保留原记录")
+            return
+        with self.lock:
+            self.pending.append(json.dumps(record, ensure_ascii=False))
+            if len(self.pending) >= JOURNAL_CONFIG['batch_size']:
+                self._flush_locked()
+
+    def flush(self):
+        """将缓冲的记录写入磁盘"""
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self.pending or self.file.closed:
+            return
+        self.file.write("\n".join(self.pending) + "\n")
+        self.file.flush()
+        if JOURNAL_CONFIG['fsync']:
+            os.fsync(self.file.fileno())
+        self.pending.clear()
+
+    def records(self, unit=None):
+        """流式读取已写入的记录，可按单元过滤"""
+        self.flush()
+        for record in iter_records(self.path):
+            if unit is None or record.get('unit') == unit:
+                yield record
+
+    def close(self):
+        """写入剩余记录并关闭文件"""
+        with self.lock:
+            self._flush_locked()
+            self.file.close()
+
+
+def iter_records(path):
+    """逐行读取结果日志，跳过断电时写了一半的行"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"结果日志 {path} 第{line_num}行不完整，已跳过")
@@ -1,126 +1,277 @@
 import serial
-import time
 import logging
-import re
-from config import SERIAL_CONFIG
+from config import SERIAL_CONFIG, FLEET_CONFIG, READER_CONFIG, CAPTURE_CONFIG, SUPERVISOR_CONFIG, COMMANDS
+from frame_decoder import extract_valid_frame_hex
+from port_reader import PortReader
+from port_supervisor import PortSupervisor
+from traffic_capture import TrafficCapture, TX
+from transactions import TransactionManager
+from telemetry import TelemetryHub, is_response
+import clock
+import metrics
+import protocol
 
 
 class SerialManager:
-    def __init__(self):
-        self.serials = {}  # 存储左右脚串口对象
+    def __init__(self, port_map=None, capture=None, opener=None):
+        # 端口映射: 端口键 -> 串口名，默认使用SERIAL_CONFIG中的左右脚串口
+        if port_map is None:
+            port_map = {'left': SERIAL_CONFIG['left_port'], 'right': SERIAL_CONFIG['right_port']}
+        self.port_map = dict(port_map)
+        self.serials = {}  # 存储各端口的串口对象
+        self.readers = {}  # 各端口的后台读取线程
+        self.marks = {}  # 各端口上次发送时的读取位置
+        self.sent_at = {}  # 各端口上次发送的时间，用于统计响应延迟
+        self.pending = {}  # 各端口已发送但尚未读取响应的命令，重连后重发
+        self.opener = opener  # 打开串口的函数(串口名 -> 串口对象)，默认serial.Serial，可替换为脚本后端
+        # 可选的二进制抓包，记录每个收发数据块
+        if capture is None and CAPTURE_CONFIG['enabled']:
+            capture = TrafficCapture()
+        self.capture = capture
+        # 所有端口的收发通过线程池并发执行（虚拟时钟下在调用线程中执行）
+        self.executor = clock.get_clock().executor(
+            max(1, min(FLEET_CONFIG['max_workers'], len(self.port_map))), thread_name_prefix='serial')
+        # 连接监控: 串口断开后自动重连
+        self.supervisor = PortSupervisor(self) if SUPERVISOR_CONFIG['enabled'] else None
+        # 主动上报帧的订阅和时间序列
+        self.telemetry = TelemetryHub()
+        # 批量命令事务: 按响应操作码关联应答
+        self.transactions = TransactionManager(self)
         self.initialize_ports()
 
     def initialize_ports(self):
-        """初始化串口"""
+        """并发初始化所有串口"""
         try:
-            # 初始化左脚串口
-            self.serials['left'] = serial.Serial(
-                port=SERIAL_CONFIG['left_port'],
-                baudrate=SERIAL_CONFIG['baudrate'],
-                timeout=SERIAL_CONFIG['timeout']
-            )
-
-            # 初始化右脚串口
-            self.serials['right'] = serial.Serial(
-                port=SERIAL_CONFIG['right_port'],
-                baudrate=SERIAL_CONFIG['baudrate'],
-                timeout=SERIAL_CONFIG['timeout']
-            )
-
-            time.sleep(2)  # 等待串口稳定
-            logging.info(f"串口初始化成功: 左脚={SERIAL_CONFIG['left_port']}, 右脚={SERIAL_CONFIG['right_port']}")
+            futures = {key: self.executor.submit(self.open_port, name) for key, name in self.port_map.items()}
+            errors = []
+            for key, future in futures.items():
+                try:
+                    self.serials[key] = future.result()
+                except Exception as e:
+                    errors.append(f"{key}({self.port_map[key]}): {e}")
+            if errors:
+                raise serial.SerialException("; ".join(errors))
+
+            for key, ser in self.serials.items():
+                self.readers[key] = PortReader(key, ser, capture=self.capture, telemetry=self.telemetry)
+                self.readers[key].start()
+
+            # 主动探测代替固定等待: 设备应答即就绪
+            start = clock.monotonic()
+            ready = dict(zip(self.serials, self.executor.map(self.probe, self.serials)))
+            not_ready = [key for key, ok in ready.items() if not ok]
+            if not_ready:
+                logging.warning(f"以下串口在{SUPERVISOR_CONFIG['probe_timeout']}秒内未应答探测: {', '.join(not_ready)}")
+            ports = ", ".join(f"{key}={name}" for key, name in self.port_map.items())
+            logging.info(f"串口初始化成功({clock.monotonic() - start:.2f}秒): {ports}")
+
+            if self.supervisor:
+                for key in self.serials:
+                    self.supervisor.register(key)
+                self.supervisor.start()
 
         except Exception as e:
             logging.error(f"串口初始化失败: {e}")
+            self.close_ports()
             raise
 
+    def open_port(self, port_name):
+        """打开单个串口"""
+        if self.opener is not None:
+            return self.opener(port_name)
+        return serial.Serial(
+            port=port_name,
+            baudrate=SERIAL_CONFIG['baudrate'],
+            timeout=SERIAL_CONFIG['timeout']
+        )
+
+    def probe(self, port):
+        """就绪探测: 发送结果查询命令直到收到任意有效帧，不影响读取位置和待重发命令"""
+        reader = self.readers[port]
+        command = COMMANDS['get_result_left' if port.endswith('left') else 'get_result_right']
+        deadline = clock.monotonic() + SUPERVISOR_CONFIG['probe_timeout']
+        while True:
+            seq, _ = reader.mark()
+            try:
+                self.serials[port].write(command)
+            except Exception as e:
+                logging.warning(f"{port}脚探测失败: {e}", extra={'port': port})
+                return False
+            if self.capture:
+                self.capture.record(port, TX, command)
+            remaining = deadline - clock.monotonic()
+            if remaining <= 0 or not reader.alive:
+                return False
+            if reader.wait_for_frame(after=seq, timeout=min(SUPERVISOR_CONFIG['probe_interval'], remaining)):
+                return True
+
+    def replace_port(self, port, ser, device):
+        """重连后替换串口和读取线程，探测就绪后重发未完成的命令"""
+        old_reader = self.readers.get(port)
+        if old_reader:
+            old_reader.stop()
+        old_ser = self.serials.get(port)
+        if old_ser:
+            try:
+                old_ser.close()
+            except Exception:
+                pass
+
+        self.port_map[port] = device
+        self.serials[port] = ser
+        reader = PortReader(port, ser, capture=self.capture, telemetry=self.telemetry)
+        reader.start()
+        self.readers[port] = reader
+        self.probe(port)
+        self.marks[port] = reader.mark()
+
+        command = self.pending.get(port)
+        if command is not None:
+            logging.info(f"{port}脚重发未完成的命令: {command.hex().upper()}", extra={'port': port})
+            self.send_command(port, command)
+        self.transactions.reattach(port)
+
+    def transact(self, requests, timeout=None):
+        """批量发送命令并返回Future列表，requests为 (端口, 命令[, 期望响应[, 超时]])
+
+        期望响应可以是响应操作码或响应类型(protocol.EnterAgingAck/AgingResult)，默认按命令推断（09→04，41→41）。
+        同一端口的命令合并为一次写入；每个Future的结果为按操作码关联到该请求的响应帧，超时为None。
+        不经过send_command的读取位置，可与send_command/read_response同时使用。
+        """
+        return self.transactions.submit(requests, timeout)
+
+    def subscribe(self, callback, ports=None, opcodes=None):
+        """订阅设备主动上报的帧(操作码不是命令响应的帧)，可按端口和操作码过滤
+
+        callback(端口, 时间, 帧)在读取线程中调用，应尽快返回；返回取消订阅的函数。
+        所有上报帧同时保存在 self.telemetry.store 中，无需订阅即可按时间查询。
+        """
+        return self.telemetry.subscribe(callback, ports, opcodes)
+
     def send_command(self, port, command):
         """发送命令到指定串口"""
         try:
             if port in self.serials:
-                # 清空输入缓冲区，避免读取到旧数据
-                self.serials[port].reset_input_buffer()
+                # 不再清空输入缓冲区: 记录发送前的位置，只等待此后到达的帧，之前的数据保留在环形缓冲区中
+                self.marks[port] = self.readers[port].mark()
+                self.pending[port] = command
 
+                start = clock.monotonic()
                 self.serials[port].write(command)
-                logging.info(f"向{port}脚发送命令: {command.hex().upper()}")
+                self.sent_at[port] = clock.monotonic()
+                metrics.SEND_SECONDS.observe(self.sent_at[port] - start, port)
+                metrics.PORT_PHASE_SECONDS.observe(self.sent_at[port] - start, port, 'send')
+                metrics.COMMANDS_SENT.inc(port)
+                if self.capture:
+                    self.capture.record(port, TX, command)
+                if logging.root.isEnabledFor(logging.DEBUG):
+                    logging.debug(f"向{port}脚发送命令: {command.hex().upper()}", extra={'port': port})
             else:
-                logging.error(f"未知的端口: {port}")
+                logging.error(f"未知的端口: {port}", extra={'port': port})
         except Exception as e:
-            logging.error(f"发送命令到{port}失败: {e}")
+            metrics.SEND_ERRORS.inc(port)
+            logging.error(f"发送命令到{port}失败: {e}", extra={'port': port})
+            if self.supervisor:
+                self.supervisor.wake()
 
-    def read_response(self, port, max_attempts=3):
-        """读取指定串口的响应，尝试从数据中提取有效帧"""
-        try:
-            if port not in self.serials:
-                return None
+    def response_predicate(self, port):
+        """上次发送的命令期望的响应帧: 按命令表的响应操作码匹配，跳过主动上报帧和迟到的其他命令(如就绪探测)的响应；
+        期望操作码未知时接受任意响应帧"""
+        command = self.pending.get(port)
+        opcode = protocol.response_opcode(command) if command is not None else None
+        if opcode is None:
+            return is_response
+        return lambda frame: frame[4] == opcode
 
-            time.sleep(1)  # 等待设备响应
+    def read_response(self, port, max_attempts=3, predicate=None, timeout=None):
+        """等待指定串口上次发送之后的下一个期望的响应帧（见response_predicate，或按predicate过滤），超时返回None"""
+        with metrics.PORT_PHASE_SECONDS.time(port, 'read'):
+            return self._read_response(port, predicate, timeout)
 
-            # 读取所有可用数据
-            response = self.serials[port].read_all()
-
-            if not response:
-                logging.warning(f"{port}脚无响应")
+    def _read_response(self, port, predicate, timeout):
+        try:
+            if port not in self.readers:
                 return None
 
-            hex_str = response.hex().upper()
-            logging.info(f"{port}脚原始响应: {hex_str}")
+            if timeout is None:
+                timeout = READER_CONFIG['response_timeout']
+            if predicate is None:
+                predicate = self.response_predicate(port)
+            while True:
+                reader = self.readers[port]
+                seq, _ = self.marks.get(port, (0, 0))
+                result = reader.wait_for_frame(after=seq, predicate=predicate, timeout=timeout)
+                # 读取线程已退出: 等待重连完成（期间会重发本命令）后在新的读取线程上重新等待
+                if result is not None or reader.alive or not self.wait_reconnected(port, reader):
+                    break
+            return self.finish_read(port, result)
 
-            # 尝试从数据中提取有效的响应帧
-            valid_frame = self.extract_valid_frame(hex_str, port)
+        except Exception as e:
+            logging.error(f"读取{port}响应失败: {e}", extra={'port': port})
+            return None
 
-            if valid_frame:
-                logging.info(f"{port}脚提取的有效帧: {valid_frame}")
-                return bytes.fromhex(valid_frame)
-            else:
-                logging.warning(f"{port}脚未找到有效帧")
-                return None
+    def wait_reconnected(self, port, reader):
+        """读取线程退出后等待重连完成，未启用连接监控或超时返回False"""
+        if self.supervisor is None:
+            return False
+        return self.supervisor.wait_reconnected(port, reader, SUPERVISOR_CONFIG['reconnect_wait'])
 
-        except Exception as e:
-            logging.error(f"读取{port}响应失败: {e}")
+    def finish_read(self, port, result):
+        """处理一次等待结果: 更新读取位置并记录日志，返回帧或None"""
+        reader = self.readers[port]
+        self.pending.pop(port, None)
+        _, received = self.marks.get(port, (0, 0))
+        if result is None:
+            if reader.bytes_received > received:
+                metrics.FRAME_NOT_FOUND.inc(port)
+                logging.warning(f"{port}脚未找到有效帧", extra={'port': port})
+            else:
+                metrics.NO_RESPONSE.inc(port)
+                logging.warning(f"{port}脚无响应", extra={'port': port})
             return None
 
+        seq, frame = result
+        if port in self.sent_at:
+            metrics.RESPONSE_SECONDS.observe(clock.monotonic() - self.sent_at[port], port)
+        self.marks[port] = (seq, reader.bytes_received)
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug(f"{port}脚提取的有效帧: {frame.hex().upper()}", extra={'port': port})
+        return frame
+
     def extract_valid_frame(self, hex_data, port):
-        """从十六进制字符串中提取有效的响应帧"""
-        # 可能的响应帧模式
-        patterns = [
-            r'55BBFF07[0-9A-F]{12}',  # 11字节完整帧
-            r'55BBFF03[0-9A-F]{6}',  # 7字节帧
-        ]
-
-        for pattern in patterns:
-            matches = re.findall(pattern, hex_data)
-            if matches:
-                # 返回最后一个匹配（最新响应）
-                return matches[-1]
-
-        # 如果没有找到完整帧，尝试查找帧头
-        if '55BBFF' in hex_data:
-            # 查找最后一个55BBFF的位置
-            last_index = hex_data.rfind('55BBFF')
-            if last_index != -1:
-                # 尝试提取从帧头开始的22个字符（11字节）
-                if last_index + 22 <= len(hex_data):
-                    potential_frame = hex_data[last_index:last_index + 22]
-                    logging.info(f"{port}脚提取的潜在帧: {potential_frame}")
-                    return potential_frame
-
-        return None
+        """从十六进制字符串中提取有效的响应帧（兼容旧接口，读取路径已改用FrameDecoder）"""
+        return extract_valid_frame_hex(hex_data, port)
 
     def verify_response(self, response, expected_prefix):
         """验证响应是否以预期前缀开头"""
         if not response:
             return False
 
-        # 将响应转换为十六进制字符串进行比较
-        response_hex = response.hex().upper()
-        prefix_hex = expected_prefix.hex().upper()
+        # 直接比较字节，不转换为十六进制字符串
+        return response.startswith(expected_prefix)
+
+    def send_commands(self, commands):
+        """并发向多个端口发送命令，commands为 {端口: 命令}"""
+        futures = [self.executor.submit(self.send_command, port, command) for port, command in commands.items()]
+        for future in futures:
+            future.result()
 
-        return response_hex.startswith(prefix_hex)
+    def read_responses(self, ports):
+        """并发读取多个端口的响应，返回 {端口: 响应}"""
+        futures = {port: self.executor.submit(self.read_response, port) for port in ports}
+        return {port: future.result() for port, future in futures.items()}
 
     def close_ports(self):
         """关闭所有串口"""
+        if self.supervisor:
+            self.supervisor.stop()
+        self.transactions.close()
+        for reader in self.readers.values():
+            reader.stop()
         for port, ser in self.serials.items():
             if ser and ser.is_open:
                 ser.close()
-                logging.info(f"关闭{port}脚串口")
\ No newline at end of file
+                logging.info(f"关闭{port}脚串口", extra={'port': port})
+        self.executor.shutdown(wait=False)
+        if self.capture:
+            self.capture.close()
@@ -0,0 +1,254 @@
+"""链路压力测试: 逐级提高每个串口的命令速率并切换波特率，测量持续吞吐、延迟分位数和帧错误率，找出拐点并推荐链路设置
+
+用法: python stress_test.py [--units units.json | --discover] [--baudrates 9600,19200] [--duration 2]
+      python stress_test.py --simulate 4   # 本地pty模拟器，线路参数见 STRESS_CONFIG['simulator']
+每一级在所有串口上同时按目标速率连续发送结果查询命令(不改变设备状态)，通过SerialManager.transact按操作码关联响应。
+响应与开始时取得的参考帧逐字节比较，不一致计为损坏，期限内未收到计为丢失。
+某个串口出现第一个不健康的级别(见STRESS_CONFIG)后不再向它加压，之前的最高速率为该波特率下的拐点。
+切换波特率只改变主机侧设置，设备需工作在同一波特率(自适应或预先设置)，否则该波特率的第一级即失败。
+"""
+import argparse
+import json
+import logging
+import time
+from concurrent.futures import wait
+from config import STRESS_CONFIG, SERIAL_CONFIG, COMMANDS
+from fleet import DeviceRegistry
+from serial_manager import SerialManager
+
+
+def percentile(ordered, point):
+    """最近秩法，ordered为已排序的列表"""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))]
+
+
+def port_command(port):
+    """端口对应的压力命令"""
+    return COMMANDS[f"{STRESS_CONFIG['command']}_{'left' if port.endswith('left') else 'right'}"]
+
+
+def capture_references(serial_mgr, ports):
+    """取得每个端口的参考响应帧: 设备空闲时结果查询的响应不变，压力下的响应应逐字节相同"""
+    futures = serial_mgr.transact([(port, port_command(port)) for port in ports], STRESS_CONFIG['timeout'])
+    return {port: future.result() for port, future in zip(ports, futures)}
+
+
+def set_baudrate(serial_mgr, ports, baudrate):
+    """切换主机侧波特率"""
+    for port in ports:
+        serial_mgr.serials[port].baudrate = baudrate
+    time.sleep(STRESS_CONFIG['settle'])
+
+
+def run_stage(serial_mgr, ports, references, rate, duration):
+    """以每个端口rate条/秒的速率连续发送duration秒，返回 {端口: 统计}
+
+    按时间表补发应发的命令，同一端口落后的多条命令合并为一次写入，即背靠背发送。
+    """
+    commands = {port: port_command(port) for port in ports}
+    records = {port: [] for port in ports}  # [发送时间, 完成时间, Future]
+    total = max(1, round(rate * duration))
+    sent = 0
+    start = time.monotonic()
+    while sent < total:
+        now = time.monotonic()
+        due = min(total, int((now - start) * rate) + 1)
+        if due > sent:
+            requests = [(port, commands[port]) for port in ports for _ in range(due - sent)]
+            futures = serial_mgr.transact(requests, STRESS_CONFIG['timeout'])
+            for (port, _), future in zip(requests, futures):
+                record = [now, None, future]
+                records[port].append(record)
+                future.add_done_callback(lambda _, record=record: record.__setitem__(1, time.monotonic()))
+            sent = due
+        time.sleep(max(0.0, start + sent / rate - time.monotonic()))
+    wait([record[2] for port in ports for record in records[port]], timeout=STRESS_CONFIG['timeout'] + 1.0)
+    time.sleep(STRESS_CONFIG['settle'])
+    return {port: stage_stats(records[port], references[port], start, total / rate) for port in ports}
+
+
+def stage_stats(records, reference, start, window):
+    """一个端口一级的统计: 吞吐按发送时间表(window秒)和最后一个正确响应的完成时间中较晚者计算，设备跟不上时低于目标速率"""
+    latencies = []
+    corrupt = lost = 0
+    last = start + window
+    for sent_at, done_at, future in records:
+        frame = future.result() if future.done() and not future.cancelled() else None
+        if frame is None:
+            lost += 1
+        elif frame != reference:
+            corrupt += 1
+        else:
+            latencies.append(done_at - sent_at)
+            last = max(last, done_at)
+    latencies.sort()
+    return {
+        'sent': len(records),
+        'ok': len(latencies),
+        'corrupt': corrupt,
+        'lost': lost,
+        'tps': round(len(latencies) / (last - start), 2),
+        'error_rate': round((corrupt + lost) / len(records), 4),
+        'p50': percentile(latencies, 50),
+        'p90': percentile(latencies, 90),
+        'p99': percentile(latencies, 99),
+    }
+
+
+def healthy(stats, rate):
+    """一级是否健康: 错误率、吞吐和延迟都在STRESS_CONFIG的限值内"""
+    return (stats['error_rate'] <= STRESS_CONFIG['max_error_rate']
+            and stats['tps'] >= STRESS_CONFIG['min_efficiency'] * rate
+            and stats['p99'] is not None and stats['p99'] <= STRESS_CONFIG['max_p99'])
+
+
+def sweep_baudrate(serial_mgr, ports, references, baudrate, duration):
+    """在一个波特率下逐级加压，返回 (各级记录, {端口: 拐点信息})"""
+    set_baudrate(serial_mgr, ports, baudrate)
+    stages = []
+    knees = {port: {'knee_rate': None, 'at_knee': None, 'limit_rate': None, 'limit': None, 'error_onset': None}
+             for port in ports}
+    active = list(ports)
+    rate = STRESS_CONFIG['start_rate']
+    while active and rate <= STRESS_CONFIG['max_rate']:
+        results = run_stage(serial_mgr, active, references, rate, duration)
+        stages.append({'baudrate': baudrate, 'rate': round(rate, 2), 'ports': results})
+        for port, stats in results.items():
+            knee = knees[port]
+            if knee['error_onset'] is None and stats['error_rate'] > STRESS_CONFIG['max_error_rate']:
+                knee['error_onset'] = round(rate, 2)
+            if healthy(stats, rate):
+                knee['knee_rate'], knee['at_knee'] = round(rate, 2), stats
+            else:
+                knee['limit_rate'], knee['limit'] = round(rate, 2), stats
+                active.remove(port)
+        worst = max(results.values(), key=lambda stats: stats['error_rate'])
+        print(f"  {baudrate}波特 {rate:7.1f}条/秒: {len(results)}个串口，"
+              f"最低吞吐 {min(stats['tps'] for stats in results.values()):.1f}条/秒，"
+              f"最高错误率 {worst['error_rate']:.2%}，仍在加压 {len(active)}个", flush=True)
+        rate *= STRESS_CONFIG['rate_step']
+    return stages, knees
+
+
+def recommend(knees):
+    """按拐点推荐链路设置: 拐点速率最高的波特率，相同时取较低的波特率(时序余量更大)"""
+    candidates = [(knee['knee_rate'], -baudrate) for baudrate, knee in knees.items() if knee['knee_rate']]
+    if not candidates:
+        return {'baudrate': None, 'max_rate': None, 'knee_rate': None}
+    knee_rate, baudrate = max(candidates)
+    return {'baudrate': -baudrate, 'max_rate': round(knee_rate * STRESS_CONFIG['headroom'], 1), 'knee_rate': knee_rate}
+
+
+def format_report(ports, references, knees, recommendations):
+    """每个端口每个波特率的拐点和推荐设置（文本行列表）"""
+    # 中文表头每字占两列，宽度按显示宽度与数据列对齐
+    lines = [f"{'端口':<20}{'波特率':>7}{'线路上限':>8}{'拐点':>8}{'吞吐':>8}{'p50/p99(ms)':>15}"
+             f"{'出错起点':>9}  受限原因"]
+    for port in ports:
+        for baudrate, port_knees in knees.items():
+            knee = port_knees[port]
+            # 响应帧按每字节10位在线路上传输，是该波特率下每秒响应数的理论上限
+            capacity = baudrate / 10 / len(references[port])
+            at_knee = knee['at_knee']
+            latency = f"{at_knee['p50'] * 1000:.1f}/{at_knee['p99'] * 1000:.1f}" if at_knee else '-'
+            lines.append(f"{port:<22}{baudrate:>10}{capacity:>12.0f}{knee['knee_rate'] or '-':>10}"
+                         f"{at_knee['tps'] if at_knee else '-':>10}{latency:>15}{knee['error_onset'] or '-':>13}  "
+                         f"{limit_reason(knee)}")
+    lines.append("推荐设置:")
+    for port in ports:
+        recommendation = recommendations[port]
+        if recommendation['baudrate'] is None:
+            lines.append(f"  {port}: 所有波特率下第一级即失败，请检查接线和设备波特率")
+        else:
+            lines.append(f"  {port}: 波特率 {recommendation['baudrate']}，命令速率不超过 "
+                         f"{recommendation['max_rate']}条/秒(拐点 {recommendation['knee_rate']}条/秒)")
+    return lines
+
+
+def limit_reason(knee):
+    """第一个不健康级别的原因"""
+    stats = knee['limit']
+    if stats is None:
+        return "达到速率上限"
+    if stats['error_rate'] > STRESS_CONFIG['max_error_rate']:
+        return f"帧错误 {stats['error_rate']:.1%}(损坏{stats['corrupt']}/丢失{stats['lost']})"
+    if stats['p99'] is None or stats['p99'] > STRESS_CONFIG['max_p99']:
+        return "延迟超限"
+    return f"吞吐饱和 {stats['tps']}条/秒"
+
+
+def run_stress(units, baudrates, duration):
+    """对单元列表执行完整的压力测试，返回报告(dict)"""
+    serial_mgr = SerialManager(DeviceRegistry(units).port_map())
+    try:
+        ports = list(serial_mgr.serials)
+        references = capture_references(serial_mgr, ports)
+        missing = [port for port, frame in references.items() if frame is None]
+        if missing:
+            logging.error(f"以下串口没有响应，不参与压力测试: {', '.join(missing)}")
+            ports = [port for port in ports if port not in missing]
+        stages = []
+        knees = {}
+        for baudrate in baudrates:
+            baud_stages, knees[baudrate] = sweep_baudrate(serial_mgr, ports, references, baudrate, duration)
+            stages.extend(baud_stages)
+        recommendations = {port: recommend({baudrate: knees[baudrate][port] for baudrate in baudrates})
+                           for port in ports}
+        set_baudrate(serial_mgr, ports, SERIAL_CONFIG['baudrate'])
+    finally:
+        serial_mgr.close_ports()
+
+    for line in format_report(ports, references, knees, recommendations):
+        print(line)
+    return {
+        'config': {name: value for name, value in STRESS_CONFIG.items() if name != 'simulator'},
+        'ports': ports,
+        'missing': missing,
+        'stages': stages,
+        'knees': {port: {baudrate: knees[baudrate][port] for baudrate in baudrates} for port in ports},
+        'recommendations': recommendations,
+    }
+
+
+def main():
+    from probe import load_units
+
+    parser = argparse.ArgumentParser(description="链路压力测试: 测量每个串口的最大命令速率和出错起点")
+    parser.add_argument('--units', metavar='FILE', help="单元列表JSON文件，- 表示从标准输入读取")
+    parser.add_argument('--discover', action='store_true', help="使用串口自动发现的结果")
+    parser.add_argument('--simulate', type=int, metavar='UNITS', help="启动本地pty模拟器代替真实设备")
+    parser.add_argument('--seed', type=int, default=None, help="模拟器随机种子")
+    parser.add_argument('--baudrates', default=','.join(map(str, STRESS_CONFIG['baudrates'])),
+                        help="逗号分隔的波特率列表")
+    parser.add_argument('--duration', type=float, default=STRESS_CONFIG['duration'], help="每级持续时间(秒)")
+    parser.add_argument('--output', default=STRESS_CONFIG['output'], help="JSON报告路径")
+    parser.add_argument('--verbose', action='store_true', help="输出每条命令的收发日志")
+    args = parser.parse_args()
+
+    # 压力下的无响应是预期结果，默认只输出错误
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.ERROR,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    baudrates = [int(rate) for rate in args.baudrates.split(',')]
+
+    simulator = None
+    if args.simulate:
+        from device_simulator import spawn_simulator
+        simulator, units = spawn_simulator(args.simulate, seed=args.seed, **STRESS_CONFIG['simulator'])
+    else:
+        units = load_units(args)
+    try:
+        report = run_stress(units, baudrates, args.duration)
+    finally:
+        if simulator:
+            simulator.terminate()
+            simulator.wait()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"报告已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
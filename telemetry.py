@@ -0,0 +1,199 @@
+import array
+import logging
+import math
+import threading
+from config import TELEMETRY_CONFIG
+import clock
+import protocol
+
+FIELDS = ('status', 'value1', 'value2')  # 短帧只有状态字节，长帧另有两个16位数据
+SOLICITED_OPCODES = frozenset(protocol.RESPONSE_OPCODES.values())  # 命令响应的操作码，其余为主动上报
+
+
+def is_response(frame):
+    """帧是否为命令响应（操作码属于命令响应），读取响应时跳过主动上报帧"""
+    return frame[4] in SOLICITED_OPCODES
+
+
+class Tier:
+    """一级降采样: 固定宽度时间桶的环形缓冲区，每个桶保存 次数/最小/最大/总和
+
+    桶连续排列，起始时间由最新桶推算，不单独保存；没有数据的桶次数为0。
+    """
+    __slots__ = ('width', 'capacity', 'counts', 'mins', 'maxs', 'sums', 'head', 'head_start', 'size')
+
+    def __init__(self, width, capacity):
+        self.width = width
+        self.capacity = capacity
+        self.counts = array.array('I', bytes(4 * capacity))
+        self.mins = array.array('f', bytes(4 * capacity))
+        self.maxs = array.array('f', bytes(4 * capacity))
+        self.sums = array.array('d', bytes(8 * capacity))
+        self.head = 0  # 最新桶的下标
+        self.head_start = None  # 最新桶的起始时间
+        self.size = 0  # 已使用的桶数
+
+    def add(self, t, value):
+        start = t - t % self.width
+        if self.head_start is None:
+            self.head_start = start
+            self.size = 1
+        elif start > self.head_start:
+            # 前进到新桶，中间没有数据的桶清零
+            steps = min(round((start - self.head_start) / self.width), self.capacity)
+            for _ in range(steps):
+                self.head = (self.head + 1) % self.capacity
+                self.counts[self.head] = 0
+                self.sums[self.head] = 0.0
+            self.head_start = start
+            self.size = min(self.size + steps, self.capacity)
+        # 迟到的数据并入最新桶
+
+        i = self.head
+        if self.counts[i]:
+            self.mins[i] = min(self.mins[i], value)
+            self.maxs[i] = max(self.maxs[i], value)
+        else:
+            self.mins[i] = self.maxs[i] = value
+        self.counts[i] += 1
+        self.sums[i] += value
+
+    @property
+    def oldest(self):
+        """保留的最早时间"""
+        if self.head_start is None:
+            return math.inf
+        return self.head_start - (self.size - 1) * self.width
+
+    def buckets(self, start=None, end=None):
+        """返回 [start, end) 内有数据的桶 [(起始时间, 次数, 最小, 最大, 平均)]，按时间排序"""
+        result = []
+        for back in range(self.size - 1, -1, -1):
+            bucket_start = self.head_start - back * self.width
+            if (start is not None and bucket_start + self.width <= start) or (end is not None and bucket_start >= end):
+                continue
+            i = (self.head - back) % self.capacity
+            count = self.counts[i]
+            if count:
+                result.append((bucket_start, count, self.mins[i], self.maxs[i], self.sums[i] / count))
+        return result
+
+
+class TimeSeries:
+    """单个数值的多级降采样时间序列: 每个点同时计入所有级别，内存由 TELEMETRY_CONFIG['tiers'] 固定"""
+
+    def __init__(self, tiers=None):
+        self.tiers = [Tier(width, capacity) for width, capacity in (tiers or TELEMETRY_CONFIG['tiers'])]
+        self.last = None  # (时间, 值)
+
+    def add(self, t, value):
+        for tier in self.tiers:
+            tier.add(t, value)
+        self.last = (t, value)
+
+    def query(self, start=None, end=None):
+        """返回覆盖start的最细一级的桶，start早于所有级别的保留范围时使用最粗一级"""
+        for tier in self.tiers:
+            if start is not None and start >= tier.oldest:
+                return tier.buckets(start, end)
+        return self.tiers[-1].buckets(start, end)
+
+    def summary(self, start=None, end=None):
+        """时间范围内的 {count, min, max, mean, last}，没有数据返回None"""
+        buckets = self.query(start, end)
+        if not buckets:
+            return None
+        count = sum(bucket[1] for bucket in buckets)
+        return {
+            'count': count,
+            'min': min(bucket[2] for bucket in buckets),
+            'max': max(bucket[3] for bucket in buckets),
+            'mean': round(sum(bucket[1] * bucket[4] for bucket in buckets) / count, 3),
+            'last': self.last[1],
+        }
+
+
+class TelemetryStore:
+    """按 (端口, 操作码, 字段) 保存主动上报数据的时间序列，首次收到时创建"""
+
+    def __init__(self, tiers=None):
+        self.tiers = tiers
+        self.series = {}  # (端口, 操作码, 字段) -> TimeSeries
+        self.lock = threading.Lock()
+
+    def add(self, port, t, frame):
+        """记录一帧: 状态字节和数据分别计入各自的序列"""
+        try:
+            fields = protocol.decode(frame)
+        except protocol.ProtocolError:
+            return
+        with self.lock:
+            for name, value in zip(FIELDS, fields[4:]):
+                key = (port, fields.opcode, name)
+                series = self.series.get(key)
+                if series is None:
+                    series = self.series[key] = TimeSeries(self.tiers)
+                series.add(t, value)
+
+    def keys(self, port=None):
+        """已有的序列键"""
+        with self.lock:
+            return [key for key in self.series if port is None or key[0] == port]
+
+    def query(self, port, opcode, field='status', start=None, end=None):
+        """返回一个序列在时间范围内的桶，参见TimeSeries.query"""
+        series = self.series.get((port, opcode, field))
+        return series.query(start, end) if series else []
+
+    def summary(self, port, start=None, end=None):
+        """端口在时间范围内所有序列的摘要 {'名称.字段': {...}}，用于与老化失败关联"""
+        result = {}
+        with self.lock:
+            for (key_port, opcode, field), series in self.series.items():
+                if key_port != port:
+                    continue
+                stats = series.summary(start, end)
+                if stats:
+                    name = TELEMETRY_CONFIG['names'].get(opcode, f"op{opcode:02X}")
+                    result[f"{name}.{field}"] = stats
+        return result
+
+
+class TelemetryHub:
+    """主动上报帧的发布/订阅: 读取线程收到非命令响应的帧时存入时间序列并通知订阅者
+
+    不发送任何命令，只使用设备自己上报的数据，不增加总线负载。
+    """
+
+    def __init__(self, store=None):
+        self.store = store or TelemetryStore()
+        self.subscribers = []  # (回调, 端口集合或None, 操作码集合或None)
+        self.lock = threading.Lock()
+
+    def subscribe(self, callback, ports=None, opcodes=None):
+        """订阅主动上报帧，callback(端口, 时间, 帧)在读取线程中调用，返回取消订阅的函数"""
+        entry = (callback, None if ports is None else frozenset(ports), None if opcodes is None else frozenset(opcodes))
+        with self.lock:
+            self.subscribers = self.subscribers + [entry]
+
+        def unsubscribe():
+            with self.lock:
+                self.subscribers = [item for item in self.subscribers if item is not entry]
+        return unsubscribe
+
+    def publish(self, port, frames):
+        """读取线程回调: 过滤出主动上报帧，记录并分发"""
+        t = None
+        for frame in frames:
+            opcode = frame[4]
+            if opcode in SOLICITED_OPCODES:
+                continue
+            if t is None:
+                t = clock.get_clock().time()
+            self.store.add(port, t, frame)
+            for callback, ports, opcodes in self.subscribers:
+                if (ports is None or port in ports) and (opcodes is None or opcode in opcodes):
+                    try:
+                        callback(port, t, frame)
+                    except Exception as e:
+                        logging.error(f"{port}脚上报帧订阅回调异常: {e}", extra={'port': port})
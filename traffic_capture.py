@@ -0,0 +1,61 @@
+"""紧凑的二进制串口抓包格式
+
+文件头: MAGIC + <qq>(抓包开始的墙钟时间ns, 对应的单调时钟ns)
+记录:   <qHBH>(单调时钟ns, 端口号, 类型, 数据长度) + 数据
+类型为 PORT 的记录声明端口号对应的端口名(UTF-8)，之后的TX/RX记录只引用端口号。
+"""
+import logging
+import os
+import struct
+import threading
+import time
+from config import CAPTURE_CONFIG
+
+MAGIC = b'BLECAP1\n'
+FILE_HEADER = struct.Struct('<qq')
+RECORD_HEADER = struct.Struct('<qHBH')
+
+TX = 0  # 主机发送
+RX = 1  # 主机接收
+PORT = 2  # 端口声明
+DIRECTIONS = {TX: 'TX', RX: 'RX'}
+
+
+class TrafficCapture:
+    """线程安全的抓包写入器，每个收发数据块一条记录"""
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(CAPTURE_CONFIG['dir'], exist_ok=True)
+            path = os.path.join(CAPTURE_CONFIG['dir'], f"capture_{time.strftime('%Y%m%d_%H%M%S')}.bin")
+        self.path = path
+        self.lock = threading.Lock()
+        self.port_ids = {}
+        self.file = open(path, 'wb', buffering=64 * 1024)
+        self.file.write(MAGIC + FILE_HEADER.pack(time.time_ns(), time.monotonic_ns()))
+        self.last_flush = time.monotonic()
+        logging.info(f"串口抓包文件: {path}")
+
+    def record(self, port, direction, data):
+        """记录一个数据块"""
+        with self.lock:
+            # 在锁内取时间戳，多个读取线程写入的记录在文件中按时间排序（回放按时间范围读取时依赖这一点）
+            timestamp = time.monotonic_ns()
+            if self.file.closed:
+                return
+            port_id = self.port_ids.get(port)
+            if port_id is None:
+                port_id = self.port_ids[port] = len(self.port_ids)
+                name = str(port).encode('utf-8')
+                self.file.write(RECORD_HEADER.pack(timestamp, port_id, PORT, len(name)) + name)
+            self.file.write(RECORD_HEADER.pack(timestamp, port_id, direction, len(data)))
+            self.file.write(data)
+            if time.monotonic() - self.last_flush >= CAPTURE_CONFIG['flush_interval']:
+                self.file.flush()
+                self.last_flush = time.monotonic()
+
+    def close(self):
+        """写入缓冲数据并关闭文件"""
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
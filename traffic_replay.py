@@ -0,0 +1,117 @@
+"""抓包回放与检查工具: 通过内存映射读取抓包文件，可按端口和时间过滤，并将接收数据重新送入帧解码器
+
+用法:
+    python traffic_replay.py capture.bin                      # 各端口统计
+    python traffic_replay.py capture.bin --port left --dump   # 打印left端口的每条记录和解出的帧
+    python traffic_replay.py capture.bin --start 120 --end 180 --frames
+"""
+import argparse
+import mmap
+from collections import defaultdict
+from frame_decoder import FrameDecoder
+from traffic_capture import MAGIC, FILE_HEADER, RECORD_HEADER, PORT, RX, DIRECTIONS
+
+
+class CaptureReader:
+    """只读的抓包文件，记录数据以memoryview形式返回，不复制"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"不是抓包文件: {path}")
+        self.wall_start_ns, self.mono_start_ns = FILE_HEADER.unpack_from(self.map, len(MAGIC))
+        self.ports = {}  # 端口号 -> 端口名
+
+    def records(self, ports=None, start=None, end=None):
+        """遍历记录，返回 (相对开始时间秒, 端口名, 方向, memoryview数据)；start/end为相对秒数"""
+        view = memoryview(self.map)
+        offset = len(MAGIC) + FILE_HEADER.size
+        size = len(self.map)
+        try:
+            while offset + RECORD_HEADER.size <= size:
+                timestamp, port_id, kind, length = RECORD_HEADER.unpack_from(self.map, offset)
+                offset += RECORD_HEADER.size
+                if offset + length > size:
+                    break  # 抓包过程中断电，最后一条记录不完整
+                data = view[offset:offset + length]
+                offset += length
+
+                if kind == PORT:
+                    self.ports[port_id] = bytes(data).decode('utf-8')
+                    continue
+                seconds = (timestamp - self.mono_start_ns) / 1e9
+                if start is not None and seconds < start:
+                    continue
+                if end is not None and seconds > end:
+                    break
+                port = self.ports.get(port_id, str(port_id))
+                if ports and port not in ports:
+                    continue
+                yield seconds, port, kind, data
+        finally:
+            view.release()
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def replay(reader, ports=None, start=None, end=None, on_record=None, on_frame=None):
+    """将接收数据按原顺序重新送入各端口的帧解码器，返回各端口的解码器"""
+    decoders = defaultdict(FrameDecoder)
+    for seconds, port, kind, data in reader.records(ports, start, end):
+        if on_record:
+            on_record(seconds, port, kind, data)
+        if kind == RX:
+            for frame in decoders[port].feed(data):
+                if on_frame:
+                    on_frame(seconds, port, frame)
+        del data
+    return decoders
+
+
+def main():
+    parser = argparse.ArgumentParser(description="串口抓包回放与检查")
+    parser.add_argument('capture', help="抓包文件路径")
+    parser.add_argument('--port', action='append', help="只处理指定端口，可多次指定")
+    parser.add_argument('--start', type=float, help="开始时间(相对抓包开始的秒数)")
+    parser.add_argument('--end', type=float, help="结束时间(相对抓包开始的秒数)")
+    parser.add_argument('--dump', action='store_true', help="打印每条收发记录")
+    parser.add_argument('--frames', action='store_true', help="打印解出的每个帧")
+    args = parser.parse_args()
+
+    stats = defaultdict(lambda: {'TX': 0, 'RX': 0, 'records': 0})
+
+    def on_record(seconds, port, kind, data):
+        stats[port][DIRECTIONS[kind]] += len(data)
+        stats[port]['records'] += 1
+        if args.dump:
+            print(f"{seconds:12.6f} {port:>16} {DIRECTIONS[kind]} {data.hex().upper()}")
+
+    def on_frame(seconds, port, frame):
+        if args.frames:
+            print(f"{seconds:12.6f} {port:>16} FRAME {frame.hex().upper()}")
+
+    with CaptureReader(args.capture) as reader:
+        decoders = replay(reader, set(args.port or ()), args.start, args.end, on_record, on_frame)
+
+    print(f"{'端口':>16} {'记录数':>8} {'发送字节':>10} {'接收字节':>10} {'帧数':>8} {'丢弃字节':>10}")
+    for port in sorted(stats):
+        decoder = decoders.get(port)
+        frames = decoder.frames_decoded if decoder else 0
+        discarded = decoder.bytes_discarded if decoder else 0
+        print(f"{port:>16} {stats[port]['records']:>8} {stats[port]['TX']:>10} {stats[port]['RX']:>10} "
+              f"{frames:>8} {discarded:>10}")
+
+
+if __name__ == "__main__":
+    main()
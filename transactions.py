@@ -0,0 +1,219 @@
+import heapq
+import itertools
+import logging
+import threading
+from concurrent.futures import Future
+from config import READER_CONFIG, SUPERVISOR_CONFIG
+from traffic_capture import TX
+import clock
+import metrics
+import protocol
+
+
+class Request:
+    """一个命令请求: 等待指定操作码的响应帧"""
+    __slots__ = ('port', 'command', 'opcode', 'timeout', 'deadline', 'sent_at', 'extended', 'future')
+
+    def __init__(self, port, command, opcode, timeout):
+        self.port = port
+        self.command = command
+        self.opcode = opcode  # 期望的响应操作码，None时匹配任意帧
+        self.timeout = timeout
+        self.deadline = None  # 写入后才开始计时
+        self.sent_at = None
+        self.extended = False  # 是否已因重连延长过期限
+        self.future = Future()
+
+
+def expected_opcode(command, expected=None):
+    """期望的响应操作码: 可直接给出操作码或响应类型(protocol.EnterAgingAck等)，默认按命令操作码推断"""
+    if expected is None:
+        return protocol.response_opcode(command)
+    if isinstance(expected, type):
+        return protocol.FRAME_OPCODES[expected]
+    return expected
+
+
+class TransactionManager:
+    """命令事务: 批量发送命令，同一端口的命令合并为一次写入，按响应操作码将应答关联到请求
+
+    每个请求对应一个Future，结果为响应帧，超时为None。同一端口上等待相同操作码的请求按发送顺序依次匹配，
+    不同操作码的请求可以同时在途。读取线程收到新帧时在回调中完成匹配；超时通过时钟的call_later
+    在最早的期限到达时统一检查，虚拟时钟(clock.SimulatedClock)下期限按虚拟时间计算。
+    """
+
+    def __init__(self, serial_manager):
+        self.serial_mgr = serial_manager
+        self.lock = threading.Lock()
+        self.waiting = {}  # 端口 -> 按发送顺序排列的在途请求
+        self.seen = {}  # 端口 -> 已处理的最新帧序号
+        self.attached = {}  # 端口 -> 已注册回调的读取线程
+        self.timeouts = []  # (期限, 序号, 请求)
+        self.counter = itertools.count()
+        self.scheduled = None  # 已安排的下一次超时检查时间
+        self.stopped = False
+
+    def submit(self, requests, timeout=None):
+        """提交一批 (端口, 命令[, 期望响应[, 超时]])，返回与之对应的Future列表"""
+        if timeout is None:
+            timeout = READER_CONFIG['response_timeout']
+        batches = {}
+        futures = []
+        for item in requests:
+            port, command, expected, request_timeout = (tuple(item) + (None, None))[:4]
+            request = Request(port, bytes(command), expected_opcode(command, expected),
+                              timeout if request_timeout is None else request_timeout)
+            futures.append(request.future)
+            if port not in self.serial_mgr.serials:
+                logging.error(f"未知的端口: {port}", extra={'port': port})
+                request.future.set_result(None)
+                continue
+            batches.setdefault(port, []).append(request)
+
+        with self.lock:
+            if self.stopped:
+                raise RuntimeError("事务管理器已关闭")
+            for port, batch in batches.items():
+                self.attach(port)
+                waiting = self.waiting.setdefault(port, [])
+                if not waiting:
+                    # 端口空闲: 之前到达的帧都不属于本批请求
+                    self.seen[port] = self.serial_mgr.readers[port].mark()[0]
+                waiting.extend(batch)
+
+        for port, batch in batches.items():
+            self.serial_mgr.executor.submit(self.write, port, batch)
+        return futures
+
+    def attach(self, port):
+        """在端口当前的读取线程上注册回调（重连后读取线程会更换），需持有锁"""
+        reader = self.serial_mgr.readers[port]
+        if self.attached.get(port) is not reader:
+            reader.add_listener(lambda: self.dispatch(port))
+            self.attached[port] = reader
+            self.seen[port] = reader.mark()[0]
+
+    def write(self, port, batch):
+        """将一批命令合并为一次写入，然后开始计时"""
+        data = b''.join(request.command for request in batch)
+        try:
+            start = clock.monotonic()
+            self.serial_mgr.serials[port].write(data)
+            sent_at = clock.monotonic()
+            metrics.SEND_SECONDS.observe(sent_at - start, port)
+            metrics.COMMANDS_SENT.inc(port, amount=len(batch))
+            if self.serial_mgr.capture:
+                self.serial_mgr.capture.record(port, TX, data)
+            if logging.root.isEnabledFor(logging.DEBUG):
+                logging.debug(f"向{port}脚发送命令: {data.hex().upper()}", extra={'port': port})
+        except Exception as e:
+            # 请求保持在途: 连接监控重连后会重发，否则到期后按无响应处理
+            sent_at = clock.monotonic()
+            metrics.SEND_ERRORS.inc(port)
+            logging.error(f"发送命令到{port}失败: {e}", extra={'port': port})
+            if self.serial_mgr.supervisor:
+                self.serial_mgr.supervisor.wake()
+
+        with self.lock:
+            for request in batch:
+                if request.deadline is None:
+                    request.sent_at = sent_at
+                    request.deadline = sent_at + request.timeout
+                    heapq.heappush(self.timeouts, (request.deadline, next(self.counter), request))
+            self.schedule()
+
+    def dispatch(self, port):
+        """读取线程回调: 将新到达的帧按操作码匹配给最早的在途请求"""
+        reader = self.serial_mgr.readers.get(port)
+        if reader is None or not reader.alive:
+            return
+        matched = []
+        with self.lock:
+            waiting = self.waiting.get(port)
+            if not waiting or self.attached.get(port) is not reader:
+                return
+            for seq, frame in reader.frames_after(self.seen[port]):
+                self.seen[port] = seq
+                try:
+                    opcode = protocol.decode(frame).opcode
+                except protocol.ProtocolError:
+                    continue
+                for index, request in enumerate(waiting):
+                    if request.opcode is None or request.opcode == opcode:
+                        matched.append((waiting.pop(index), frame))
+                        break
+                else:
+                    if logging.root.isEnabledFor(logging.DEBUG):
+                        logging.debug(f"{port}脚收到未关联的帧: {frame.hex().upper()}", extra={'port': port})
+
+        now = clock.monotonic()
+        for request, frame in matched:
+            if request.sent_at is not None:
+                metrics.RESPONSE_SECONDS.observe(now - request.sent_at, port)
+            if logging.root.isEnabledFor(logging.DEBUG):
+                logging.debug(f"{port}脚提取的有效帧: {frame.hex().upper()}", extra={'port': port})
+            request.future.set_result(frame)
+
+    def schedule(self):
+        """在最早的未完成请求到期时安排一次超时检查，需持有锁
+
+        已完成的请求先从堆顶移除；已安排的检查不晚于该期限时不重复安排。
+        """
+        while self.timeouts and self.timeouts[0][2] not in self.waiting.get(self.timeouts[0][2].port, []):
+            heapq.heappop(self.timeouts)
+        if self.stopped or not self.timeouts:
+            return
+        deadline = self.timeouts[0][0]
+        if self.scheduled is None or deadline < self.scheduled:
+            self.scheduled = deadline
+            clock.get_clock().call_later(deadline - clock.monotonic(), self.expire, deadline)
+
+    def expire(self, scheduled):
+        """超时检查: 到期的请求按无响应完成；读取线程已退出且启用了连接监控时先延长一次期限等待重连"""
+        expired = []
+        with self.lock:
+            if self.scheduled == scheduled:
+                self.scheduled = None
+            if self.stopped:
+                return
+            now = clock.monotonic()
+            while self.timeouts and self.timeouts[0][0] <= now:
+                _, _, request = heapq.heappop(self.timeouts)
+                waiting = self.waiting.get(request.port, [])
+                if request not in waiting:
+                    continue  # 已完成
+                reader = self.serial_mgr.readers.get(request.port)
+                if self.serial_mgr.supervisor and not request.extended and not (reader and reader.alive):
+                    request.extended = True
+                    request.deadline = now + SUPERVISOR_CONFIG['reconnect_wait']
+                    heapq.heappush(self.timeouts, (request.deadline, next(self.counter), request))
+                    continue
+                waiting.remove(request)
+                expired.append(request)
+            self.schedule()
+
+        for request in expired:
+            metrics.NO_RESPONSE.inc(request.port)
+            logging.warning(f"{request.port}脚无响应", extra={'port': request.port})
+            request.future.set_result(None)
+
+    def reattach(self, port):
+        """重连后在新的读取线程上注册回调并重发在途请求"""
+        with self.lock:
+            if port not in self.serial_mgr.readers:
+                return
+            self.attach(port)
+            batch = list(self.waiting.get(port, []))
+        if batch:
+            logging.info(f"{port}脚重发未完成的命令: {b''.join(r.command for r in batch).hex().upper()}",
+                         extra={'port': port})
+            self.write(port, batch)
+
+    def close(self):
+        """停止超时检查，取消所有在途请求"""
+        with self.lock:
+            self.stopped = True
+            pending = [request for waiting in self.waiting.values() for request in waiting]
+            self.waiting.clear()
+        for request in pending:
+            request.future.cancel()